@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import csv
+import datetime as _dt
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Type
+
+DEFAULT_BATCH_SIZE = 500
+
+
+@dataclass(frozen=True)
+class TransactionRecord:
+    date: _dt.date
+    amount: float
+    description: str
+    currency: str = "EUR"
+
+
+_IMPORTERS: Dict[str, Type["BaseImporter"]] = {}
+
+
+def register_importer(cls: Type["BaseImporter"]) -> Type["BaseImporter"]:
+    """Class decorator adding an importer to the format registry"""
+    _IMPORTERS[cls.name] = cls
+    return cls
+
+
+def get_importer(name: str) -> Type["BaseImporter"]:
+    try:
+        return _IMPORTERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown import format: {name}")
+
+
+def supported_extensions() -> List[str]:
+    extensions = set()
+    for importer_cls in _IMPORTERS.values():
+        extensions.update(importer_cls.extensions)
+    return sorted(extensions)
+
+
+def detect_importer(filename: str, head: str) -> Type["BaseImporter"]:
+    """
+    Pick the importer for an uploaded statement.
+    Only importers claiming the file extension are considered; among those,
+    specific formats are sniffed before the generic fallbacks.
+    """
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    candidates = [cls for cls in _IMPORTERS.values() if extension in cls.extensions]
+    if not candidates:
+        raise ValueError(f"Unsupported file type '.{extension}'. Supported: "
+                         + ', '.join(f'.{ext}' for ext in supported_extensions()))
+
+    candidates.sort(key=lambda cls: cls.fallback)
+    for importer_cls in candidates:
+        if importer_cls.sniff(head):
+            return importer_cls
+    raise ValueError("Could not recognise the statement format")
+
+
+def iter_batches(records: Iterable[TransactionRecord],
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[TransactionRecord]]:
+    batch: List[TransactionRecord] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def transaction_fingerprint(source: str, record: TransactionRecord, occurrence: int = 0) -> str:
+    """
+    Content hash identifying an imported transaction across re-imports.
+    `occurrence` numbers identical transactions within one statement
+    (e.g. two equal coffees on the same day) so they stay distinct.
+    """
+    key = '|'.join((source, record.date.isoformat(), record.description.strip(),
+                    f'{record.amount:.2f}', record.currency, str(occurrence)))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class BaseImporter:
+    """
+    Common streaming interface for statement importers.
+    Subclasses parse a text stream lazily in `iter_records`, so a statement
+    is never held in memory as a whole; callers consume `iter_batches`.
+    """
+    name = ''
+    label = ''
+    extensions: tuple = ()
+    # Fallback importers are only tried after the specific formats
+    fallback = False
+
+    def __init__(self, default_currency: str = 'EUR'):
+        self.default_currency = default_currency
+
+    @classmethod
+    def sniff(cls, head: str) -> bool:
+        """Return True if the start of the file looks like this format"""
+        raise NotImplementedError
+
+    def iter_records(self, stream: TextIO) -> Iterator[TransactionRecord]:
+        raise NotImplementedError
+
+    def iter_batches(self, stream: TextIO,
+                     batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[TransactionRecord]]:
+        return iter_batches(self.iter_records(stream), batch_size)
+
+
+def _parse_amount(value: str, decimal_comma: bool = False) -> float:
+    value = value.strip().replace(' ', '').replace('\u00a0', '')
+    if decimal_comma:
+        value = value.replace('.', '').replace(',', '.')
+    else:
+        value = value.replace(',', '')
+    return float(value)
+
+
+class _DateParser:
+    """
+    Resolves the date format once from the first row and reuses it, so the
+    per-row cost is a single strptime (or fromisoformat) call.
+    """
+    FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y', '%d.%m.%Y',
+               '%Y/%m/%d', '%d/%m/%y', '%m/%d/%y', '%Y%m%d', '%d %b %Y', '%d %B %Y')
+
+    def __init__(self, formats: Optional[tuple] = None):
+        self.formats = formats or self.FORMATS
+        self._format: Optional[str] = None
+
+    def __call__(self, value: str) -> _dt.date:
+        value = value.strip()
+        if len(value) >= 10 and value[4] == '-' and value[7] == '-':
+            # ISO dates, optionally followed by a time component
+            return _dt.date.fromisoformat(value[:10])
+        if self._format:
+            try:
+                return _dt.datetime.strptime(value, self._format).date()
+            except ValueError:
+                pass
+        for fmt in self.formats:
+            try:
+                parsed = _dt.datetime.strptime(value, fmt).date()
+            except ValueError:
+                continue
+            self._format = fmt
+            return parsed
+        raise ValueError(f"Unrecognised date: {value!r}")
+
+
+@register_importer
+class GenericCSVImporter(BaseImporter):
+    """
+    CSV exports from arbitrary banks. Columns are sniffed from the header
+    using common names, and the delimiter from the first line.
+    """
+    name = 'csv'
+    label = 'CSV'
+    extensions = ('csv',)
+    fallback = True
+
+    DATE_COLUMNS = ('date', 'transaction date', 'booking date', 'posting date',
+                    'posted date', 'value date', 'started date', 'completed date')
+    DESCRIPTION_COLUMNS = ('description', 'payee', 'merchant', 'name', 'details',
+                           'narrative', 'memo', 'reference', 'counterparty')
+    AMOUNT_COLUMNS = ('amount', 'value', 'transaction amount', 'amount (eur)')
+    DEBIT_COLUMNS = ('debit', 'debit amount', 'withdrawal', 'money out', 'paid out')
+    CREDIT_COLUMNS = ('credit', 'credit amount', 'deposit', 'money in', 'paid in')
+    CURRENCY_COLUMNS = ('currency', 'ccy', 'currency code')
+
+    @classmethod
+    def sniff(cls, head: str) -> bool:
+        try:
+            header = cls._read_header(head.splitlines()[0] if head else '')
+        except (IndexError, csv.Error):
+            return False
+        try:
+            cls._resolve_columns(header)
+        except ValueError:
+            return False
+        return True
+
+    @staticmethod
+    def _read_header(line: str) -> List[str]:
+        delimiter = ';' if line.count(';') > line.count(',') else ','
+        return [col.strip().lower() for col in next(csv.reader([line], delimiter=delimiter))]
+
+    @classmethod
+    def _resolve_columns(cls, header: List[str]) -> Dict[str, Optional[int]]:
+        def find(names):
+            for name in names:
+                if name in header:
+                    return header.index(name)
+            return None
+
+        columns = {
+            'date': find(cls.DATE_COLUMNS),
+            'description': find(cls.DESCRIPTION_COLUMNS),
+            'amount': find(cls.AMOUNT_COLUMNS),
+            'debit': find(cls.DEBIT_COLUMNS),
+            'credit': find(cls.CREDIT_COLUMNS),
+            'currency': find(cls.CURRENCY_COLUMNS),
+        }
+        has_amount = columns['amount'] is not None or (
+            columns['debit'] is not None and columns['credit'] is not None)
+        if columns['date'] is None or columns['description'] is None or not has_amount:
+            raise ValueError("Missing expected CSV column: need a date, a description "
+                             "and either an amount or debit/credit columns")
+        return columns
+
+    def iter_records(self, stream: TextIO) -> Iterator[TransactionRecord]:
+        first_line = stream.readline()
+        if not first_line:
+            return
+        delimiter = ';' if first_line.count(';') > first_line.count(',') else ','
+        # Semicolon-separated exports use a decimal comma
+        decimal_comma = delimiter == ';'
+        header = [col.strip().lower() for col in next(csv.reader([first_line], delimiter=delimiter))]
+        columns = self._resolve_columns(header)
+
+        date_idx = columns['date']
+        desc_idx = columns['description']
+        amount_idx = columns['amount']
+        debit_idx = columns['debit']
+        credit_idx = columns['credit']
+        currency_idx = columns['currency']
+        parse_date = _DateParser()
+        default_currency = self.default_currency
+
+        for row in csv.reader(stream, delimiter=delimiter):
+            if not row:
+                continue
+            try:
+                if amount_idx is not None:
+                    amount = _parse_amount(row[amount_idx], decimal_comma)
+                else:
+                    credit = row[credit_idx].strip()
+                    debit = row[debit_idx].strip()
+                    amount = (_parse_amount(credit, decimal_comma) if credit else 0.0) - \
+                             (abs(_parse_amount(debit, decimal_comma)) if debit else 0.0)
+                currency = row[currency_idx].strip() if currency_idx is not None else default_currency
+                yield TransactionRecord(date=parse_date(row[date_idx]), amount=amount,
+                                        description=row[desc_idx].strip(),
+                                        currency=currency or default_currency)
+            except (ValueError, IndexError) as e:
+                print(f"Skipping malformed row: {row} - Error: {e}")
+                continue
+
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+@register_importer
+class OFXImporter(BaseImporter):
+    """
+    OFX/QFX statements (both the SGML 1.x and XML 2.x dialects).
+    The file is tokenised in chunks, so memory use does not grow with the
+    number of transactions.
+    """
+    name = 'ofx'
+    label = 'OFX'
+    extensions = ('ofx', 'qfx')
+
+    CHUNK_SIZE = 64 * 1024
+
+    @classmethod
+    def sniff(cls, head: str) -> bool:
+        upper = head.upper()
+        return 'OFXHEADER' in upper or '<OFX>' in upper
+
+    def _iter_tags(self, stream: TextIO) -> Iterator[tuple]:
+        buffer = ''
+        while True:
+            chunk = stream.read(self.CHUNK_SIZE)
+            buffer += chunk
+            # Keep a possibly incomplete trailing tag for the next chunk
+            cut = max(buffer.rfind('<'), 0) if chunk else len(buffer)
+            for match in _OFX_TAG.finditer(buffer, 0, cut):
+                yield match.group(1) == '/', match.group(2).upper(), match.group(3).strip()
+            buffer = buffer[cut:]
+            if not chunk:
+                return
+
+    @staticmethod
+    def _parse_date(value: str) -> _dt.date:
+        # e.g. 20251207, 20251207103000, 20251207103000.000[-5:EST]
+        return _dt.date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+
+    def iter_records(self, stream: TextIO) -> Iterator[TransactionRecord]:
+        currency = self.default_currency
+        fields: Optional[Dict[str, str]] = None
+
+        for closing, tag, value in self._iter_tags(stream):
+            if tag == 'CURDEF' and not closing and value:
+                currency = value
+            elif tag == 'STMTTRN':
+                if not closing:
+                    fields = {}
+                elif fields is not None:
+                    record = self._build_record(fields, currency)
+                    if record:
+                        yield record
+                    fields = None
+            elif fields is not None and not closing and value:
+                fields[tag] = value
+
+    def _build_record(self, fields: Dict[str, str], currency: str) -> Optional[TransactionRecord]:
+        try:
+            description = fields.get('NAME') or fields.get('MEMO') or fields.get('PAYEE') or ''
+            return TransactionRecord(date=self._parse_date(fields['DTPOSTED']),
+                                     amount=_parse_amount(fields['TRNAMT']),
+                                     description=description,
+                                     currency=fields.get('CURRENCY', currency))
+        except (KeyError, ValueError) as e:
+            print(f"Skipping malformed transaction: {fields} - Error: {e}")
+            return None
+
+
+@register_importer
+class QIFImporter(BaseImporter):
+    """Quicken Interchange Format statements. QIF carries no currency."""
+    name = 'qif'
+    label = 'QIF'
+    extensions = ('qif',)
+
+    @classmethod
+    def sniff(cls, head: str) -> bool:
+        return head.lstrip().upper().startswith('!TYPE') or '\n^' in head
+
+    def iter_records(self, stream: TextIO) -> Iterator[TransactionRecord]:
+        parse_date = _DateParser(('%m/%d/%Y', '%d/%m/%Y', '%m/%d/%y', '%d/%m/%y',
+                                  '%Y-%m-%d', '%d.%m.%Y'))
+        fields: Dict[str, str] = {}
+
+        for line in stream:
+            line = line.rstrip('\r\n')
+            if not line or line.startswith('!'):
+                continue
+            code, value = line[0], line[1:].strip()
+            if code != '^':
+                # Keep the first occurrence; split lines (S/E/$) repeat codes
+                fields.setdefault(code, value)
+                continue
+
+            record, fields = fields, {}
+            try:
+                # Quicken writes 2-digit years as 1/2'25
+                date = parse_date(record['D'].replace("'", '/').replace(' ', ''))
+                amount = _parse_amount(record.get('T') or record['U'])
+            except (KeyError, ValueError) as e:
+                print(f"Skipping malformed transaction: {record} - Error: {e}")
+                continue
+            yield TransactionRecord(date=date, amount=amount,
+                                    description=record.get('P') or record.get('M', ''),
+                                    currency=self.default_currency)
+
+
+# Registers the Revolut format; imported last because it builds on the above
+import api.revolut_importer  # noqa: E402,F401
@@ -1,31 +1,37 @@
 from __future__ import annotations
 
 import datetime as _dt
-from dataclasses import dataclass
-from typing import List
+from typing import Iterator, List, TextIO
 import io
 import csv
 
+from api.importers import BaseImporter, TransactionRecord, register_importer
 
-@dataclass(frozen=True)
-class TransactionRecord:
-    date: _dt.date
-    amount: float
-    description: str
-    currency: str = "EUR"
+REQUIRED_COLUMNS = ('Started Date', 'Description', 'Amount', 'Currency')
 
 
-class RevolutImporter:
-    # Removed __init__ and all API-related methods
+@register_importer
+class RevolutImporter(BaseImporter):
+    name = 'revolut'
+    label = 'Revolut'
+    extensions = ('csv',)
+
+    @classmethod
+    def sniff(cls, head: str) -> bool:
+        first_line = head.split('\n', 1)[0]
+        return all(column in first_line for column in REQUIRED_COLUMNS)
 
     @staticmethod
     def parse_csv(csv_content: str) -> List[TransactionRecord]:
-        transactions: List[TransactionRecord] = []
-        f = io.StringIO(csv_content)
-        reader = csv.reader(f)
-        
-        header = next(reader) 
-        
+        return list(RevolutImporter().iter_records(io.StringIO(csv_content)))
+
+    def iter_records(self, stream: TextIO) -> Iterator[TransactionRecord]:
+        reader = csv.reader(stream)
+
+        header = next(reader, None)
+        if header is None:
+            return
+
         try:
             started_date_col_idx = header.index('Started Date')
             description_col_idx = header.index('Description')
@@ -34,6 +40,7 @@ class RevolutImporter:
         except ValueError as e:
             raise ValueError(f"Missing expected CSV column: {e}. Required columns: 'Started Date', 'Description', 'Amount', 'Currency'")
 
+        strptime = _dt.datetime.strptime
         for row in reader:
             if not row:
                 continue
@@ -45,13 +52,10 @@ class RevolutImporter:
                 currency = row[currency_col_idx]
 
                 # Parse date in 'YYYY-MM-DD HH:MM:SS' format
-                date = _dt.datetime.strptime(date_str_with_time, '%Y-%m-%d %H:%M:%S').date()
+                date = strptime(date_str_with_time, '%Y-%m-%d %H:%M:%S').date()
                 amount = float(amount_str)
 
-                transactions.append(TransactionRecord(date=date, amount=amount, description=description, currency=currency))
+                yield TransactionRecord(date=date, amount=amount, description=description, currency=currency)
             except (ValueError, IndexError) as e:
                 print(f"Skipping malformed row: {row} - Error: {e}")
                 continue
-        return transactions
-
-    # Removed import_transactions as it was for API
@@ -1,30 +1,245 @@
-from flask import Flask, render_template, redirect, url_for, request, flash, session
-from models.data_manager import DataManager
+from flask import (Flask, render_template, redirect, url_for, request, flash, session, g, current_app, Response,
+                   before_render_template, template_rendered)
+from flask.cli import with_appcontext
+from models.data_manager import DataManager, recompute_eur_amounts
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import Counter, defaultdict, namedtuple
+from contextlib import ExitStack, nullcontext
 import statistics
-from api.revolut_importer import RevolutImporter
-from merchant_mapper import update_merchant_category, auto_categorize_transaction, ensure_merchant_files_exist
-from currency_converter import format_amount_with_conversion, convert_to_eur
+import sqlite3
+import io
+import threading
+import time
+from api.importers import detect_importer, supported_extensions, transaction_fingerprint
+from merchant_mapper import update_merchant_category, auto_categorize_transaction, categorize_many, init_merchant_store
+from currency_converter import (format_amount_with_conversion, format_converted, format_currency, convert_to_eur, convert_many,
+                                conversion_factors, CurrencySums, CURRENCY_SYMBOLS, start_rate_refresher,
+                                load_rates_file)
 from functools import wraps
+import click
 import database
-
-app = Flask(__name__)
-app.secret_key = 'your_secret_key_please_change_in_production'  # Replace with a secure key
-
-# Initialize database
-database.init_db()
-
-# Ensure merchant category files exist
-ensure_merchant_files_exist()
-
-# Register Jinja2 filter for currency formatting
-@app.template_filter('format_with_conversion')
-def jinja_format_with_conversion(amount, currency):
-    """Format amount with currency conversion"""
-    return format_amount_with_conversion(amount, currency)
-
-data_manager = DataManager()
+import metrics
+import server
+import timing
+import workload
+
+DEFAULT_CONFIG = {
+    'SECRET_KEY': 'your_secret_key_please_change_in_production',  # Replace with a secure key
+    # Database of this app; None uses database.DATABASE_PATH
+    'DATABASE_PATH': None,
+    # Server-Timing header and a JSON log line per request; also switchable
+    # at runtime with timing.enable() / timing.disable()
+    'REQUEST_TIMING': False,
+}
+
+# Views are collected at import and registered on every app built by
+# create_app(), under their function names as endpoints
+_views = []
+
+def route(rule, **options):
+    """Like app.route(), for the apps built by create_app()"""
+    def decorator(view):
+        _views.append((rule, options, view))
+        return view
+    return decorator
+
+def app_database(app):
+    """Context in which database calls use `app`'s database"""
+    path = app.config.get('DATABASE_PATH')
+    return database.use_database(path) if path else nullcontext()
+
+def initialize_app(app):
+    """
+    Create or migrate the app's database, import legacy merchant mappings and
+    backfill stored EUR amounts, once per app. Runs on the first request or
+    CLI command instead of at import, so processes start fast.
+    """
+    state = app.extensions['budget_tracker']
+    if state['initialized']:
+        return
+    with state['lock']:
+        if state['initialized']:
+            return
+        with app_database(app):
+            database.init_db()
+            init_merchant_store()
+            recompute_eur_amounts()
+        state['initialized'] = True
+
+def open_request_database():
+    """before_request: point this request at the app's database, initializing it first"""
+    g.database_context = ExitStack()
+    g.database_context.enter_context(app_database(current_app))
+    initialize_app(current_app)
+
+def close_request_database(exception=None):
+    context = g.pop('database_context', None)
+    if context is not None:
+        context.close()
+
+HTTP_REQUESTS = metrics.counter('http_requests_total', 'Requests by endpoint, method and status code.')
+HTTP_LATENCY = metrics.histogram('http_request_duration_seconds', 'Request latency by endpoint and method.')
+IMPORT_JOBS = metrics.counter('import_jobs_total', 'Statement imports by source format and outcome.')
+IMPORT_TRANSACTIONS = metrics.counter('import_transactions_total',
+                                      'Transactions read from imported statements, imported or skipped as duplicates.')
+IMPORT_DURATION = metrics.histogram('import_duration_seconds', 'Time to import one statement, by source format.',
+                                    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+
+def record_request_metrics(response):
+    """after_request: count the request and observe its latency (also for error responses)"""
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        HTTP_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+def start_request_timer():
+    """before_request: time this request when request timing is on"""
+    g.request_timer = timing.begin()
+
+def finish_request_timer(response):
+    """after_request: report the timed request's spans"""
+    timer = timing.current()
+    if timer is not None:
+        total, spans = timer.result()
+        response.headers['Server-Timing'] = timing.server_timing(total, spans)
+        timing.log_request(total, spans, method=request.method, path=request.path,
+                           endpoint=request.endpoint, status=response.status_code)
+    return response
+
+def stop_request_timer(exception=None):
+    timing.end(g.pop('request_timer', None))
+
+def start_template_span(sender, template, context, **extra):
+    timer = timing.current()
+    if timer is not None:
+        timer.start('template')
+
+def stop_template_span(sender, template, context, **extra):
+    timer = timing.current()
+    if timer is not None:
+        timer.stop()
+
+# Jinja2 filter for currency formatting
+def jinja_format_with_conversion(amount, currency, on_date=None, eur_amount=None):
+    """Format amount with currency conversion at the rate of the transaction date"""
+    return format_amount_with_conversion(amount, currency, on_date, eur_amount)
+
+def jinja_money(amount):
+    """Format an aggregate computed in the user's display currency"""
+    return format_currency(amount, display_currency())
+
+def inject_display_currency():
+    currency = display_currency()
+    return {'display_currency': currency, 'currency_symbol': CURRENCY_SYMBOLS.get(currency, currency)}
+
+@click.command('load-rates')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def load_rates_command(path):
+    """Bulk-load historical EUR exchange rates from a CSV file"""
+    initialize_app(current_app)
+    with app_database(current_app):
+        count = load_rates_file(path)
+    click.echo(f'Loaded {count} exchange rates from {path}')
+
+@click.command('recompute-amounts')
+@click.option('--all', 'recompute_all', is_flag=True,
+              help='Recompute every transaction, not only those without a stored EUR amount.')
+@with_appcontext
+def recompute_amounts_command(recompute_all):
+    """Store the EUR amounts of transactions at the rates of their dates"""
+    initialize_app(current_app)
+    with app_database(current_app):
+        count = recompute_eur_amounts(missing_only=not recompute_all)
+    click.echo(f'Recomputed the EUR amount of {count} transactions')
+
+@click.command('serve')
+@click.option('--bind', default=server.DEFAULT_BIND, show_default=True, help='Address to listen on.')
+@click.option('--workers', type=int, default=None, help='Worker processes  [default: one per CPU core]')
+@click.option('--threads', type=int, default=server.DEFAULT_THREADS, show_default=True,
+              help='Request threads per worker.')
+@click.option('--keepalive', type=int, default=server.DEFAULT_KEEPALIVE, show_default=True,
+              help='Seconds to keep idle connections open.')
+@click.option('--timeout', type=int, default=server.DEFAULT_TIMEOUT, show_default=True,
+              help='Seconds before a stuck worker is restarted.')
+@click.option('--graceful-timeout', type=int, default=server.DEFAULT_GRACEFUL_TIMEOUT, show_default=True,
+              help='Seconds workers get to finish requests on reload or shutdown.')
+@with_appcontext
+def serve_command(bind, workers, threads, keepalive, timeout, graceful_timeout):
+    """Serve the app with a pre-forking production server (gunicorn)"""
+    # Create or migrate the database once, in the master, instead of in
+    # every worker racing on its first request
+    initialize_app(current_app)
+    try:
+        # Workers are forked from within this context, so the rate refresher
+        # each one starts writes to the app's database
+        with app_database(current_app):
+            server.run(current_app._get_current_object(), bind=bind, workers=workers, threads=threads,
+                       keepalive=keepalive, timeout=timeout, graceful_timeout=graceful_timeout)
+    except server.ServerUnavailable as e:
+        raise click.ClickException(str(e))
+
+@click.command('generate-workload')
+@click.option('--users', type=int, default=10, show_default=True, help='Users to create.')
+@click.option('--months', type=int, default=12, show_default=True, help='Months of history per user.')
+@click.option('--per-day', type=float, default=2.0, show_default=True,
+              help='Average card payments per user and day.')
+@click.option('--merchant-skew', type=float, default=1.1, show_default=True,
+              help='Zipf exponent of merchant popularity (0 is uniform).')
+@click.option('--categories', default=None, help='Expense category weights, e.g. "Food & Dining=3,Shopping=1".')
+@click.option('--currencies', default=None, help='Currency weights, e.g. "EUR=8,GBP=1,USD=1".')
+@click.option('--seed', type=int, default=0, show_default=True, help='Random seed; same seed, same data.')
+@click.option('--end', 'end_date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Last day of the history  [default: today]')
+@click.option('--prefix', default='loaduser', show_default=True, help='Username prefix (users get a number).')
+@click.option('--password', default='loadtest', show_default=True, help='Password of every generated user.')
+@click.option('--no-budgets', is_flag=True, help='Do not create budgets.')
+@click.option('--no-mappings', is_flag=True, help='Do not create merchant category mappings.')
+@click.option('--csv-dir', type=click.Path(file_okay=False), default=None,
+              help='Also write one Revolut CSV statement per user into this directory.')
+@click.option('--csv-only', is_flag=True, help='Only write the CSV statements, insert nothing.')
+@with_appcontext
+def generate_workload_command(users, months, per_day, merchant_skew, categories, currencies, seed, end_date,
+                              prefix, password, no_budgets, no_mappings, csv_dir, csv_only):
+    """Create users with synthetic transaction histories for benchmarks"""
+    if csv_only and not csv_dir:
+        raise click.UsageError('--csv-only needs --csv-dir')
+    spec = workload.WorkloadSpec(users=users, months=months, expenses_per_day=per_day, merchant_skew=merchant_skew,
+                                 budgets=not no_budgets, merchant_mappings=not no_mappings,
+                                 username_prefix=prefix, password=password)
+    if categories:
+        spec.categories = workload.parse_weights(categories)
+    if currencies:
+        spec.currencies = workload.parse_weights(currencies)
+    if end_date:
+        spec.end = end_date.date()
+    initialize_app(current_app)
+    try:
+        with app_database(current_app):
+            totals = workload.run(spec, seed=seed, csv_dir=csv_dir, insert=not csv_only)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    except sqlite3.IntegrityError:
+        raise click.ClickException(f'Users named {prefix}N already exist; pick another --prefix')
+    click.echo(f"Generated {totals['users']} users, {totals['incomes']} incomes, {totals['expenses']} expenses, "
+               f"{totals['budgets']} budgets, {totals['merchants']} merchant mappings")
+    if csv_dir:
+        click.echo(f"Wrote {totals['csv_rows']} statement rows to {csv_dir}")
+
+def user_data():
+    """The signed-in user's DataManager for this request, loaded on first use"""
+    if 'user_data' not in g:
+        g.user_data = DataManager(session['user_id'])
+        g.user_data.load()
+    return g.user_data
+
+# Characters read from an uploaded statement to detect its format
+IMPORT_SNIFF_CHARS = 4096
 
 
 def linear_regression(x_values, y_values):
@@ -54,21 +269,18 @@ def login_required(f):
         if 'user_id' not in session:
             flash('Please log in to access this page.')
             return redirect(url_for('login'))
-        # Load user data for the current session
-        if data_manager.user_id != session['user_id']:
-            data_manager.set_user(session['user_id'])
         return f(*args, **kwargs)
     return decorated_function
 
 
-@app.route('/')
+@route('/')
 def index():
     if 'user_id' in session:
         return redirect(url_for('dashboard'))
     return redirect(url_for('login'))
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -83,7 +295,6 @@ def login():
             session['user_id'] = user_id
             session['username'] = username
             session['currency'] = session.get('currency', 'EUR')
-            data_manager.set_user(user_id)
             flash(f'Welcome back, {username}!')
             return redirect(url_for('dashboard'))
         else:
@@ -93,7 +304,7 @@ def login():
     return render_template('login.html')
 
 
-@app.route('/signup', methods=['GET', 'POST'])
+@route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -120,7 +331,6 @@ def signup():
         if user_id:
             session['user_id'] = user_id
             session['username'] = username
-            data_manager.set_user(user_id)
             flash(f'Account created successfully! Welcome, {username}!')
             return redirect(url_for('dashboard'))
         else:
@@ -130,7 +340,7 @@ def signup():
     return render_template('signup.html')
 
 
-@app.route('/logout')
+@route('/logout')
 def logout():
     username = session.get('username', 'User')
     session.clear()
@@ -138,7 +348,7 @@ def logout():
     return redirect(url_for('login'))
 
 
-@app.route('/set_currency/<currency>', methods=['POST'])
+@route('/set_currency/<currency>', methods=['POST'])
 @login_required
 def set_currency(currency):
     if currency in ['EUR', 'GBP', 'USD']:
@@ -146,7 +356,7 @@ def set_currency(currency):
     return redirect(request.referrer or url_for('dashboard'))
 
 
-@app.route('/set_timeframe/<int:months>', methods=['POST'])
+@route('/set_timeframe/<int:months>', methods=['POST'])
 @login_required
 def set_timeframe(months):
     """Set the timeframe filter in session"""
@@ -172,6 +382,58 @@ def filter_by_timeframe(items):
                 pass
     return filtered_items
 
+def display_currency():
+    """Currency chosen with set_currency for totals and charts (EUR by default)"""
+    return session.get('currency', 'EUR')
+
+def request_conversion_factors(pairs, target):
+    """conversion_factors() memoized for the current request, shared by all its aggregates"""
+    matrix = g.setdefault('conversion_matrix', {})
+    missing = {pair for pair in pairs if (target,) + pair not in matrix}
+    if missing:
+        for pair, factor in conversion_factors(missing, target).items():
+            matrix[(target,) + pair] = factor
+    return {pair: matrix[(target,) + pair] for pair in pairs}
+
+def display_sums():
+    """CurrencySums totalling in the display currency"""
+    return CurrencySums(display_currency(), request_conversion_factors)
+
+def amount_parts(item):
+    """
+    (amount, currency, date) of a transaction (object or dict), as taken by
+    CurrencySums.add: its stored EUR amount when it has one, so only EUR to
+    display currency conversions are left, and none for EUR
+    """
+    def field(name):
+        return item.get(name) if isinstance(item, dict) else getattr(item, name, None)
+    amount_eur = field('amount_eur')
+    if amount_eur is not None:
+        return amount_eur, 'EUR', field('date') or None
+    return float(field('amount') or 0), field('currency') or 'EUR', field('date') or None
+
+def converted_amounts(items, target='EUR'):
+    """Amounts of transactions in `target` at their dates, converted in one batch"""
+    amounts, currencies, dates = zip(*map(amount_parts, items)) if items else ((), (), ())
+    return convert_many(amounts, currencies, target, dates=dates, factors=request_conversion_factors)
+
+# A row of the income and expenses listings. The amount text is formatted
+# in the route, from the stored EUR amounts, instead of by a filter call per
+# row while rendering.
+TransactionRow = namedtuple('TransactionRow', 'date description category amount currency formatted_amount')
+
+@timing.timed('conversion')
+def transaction_rows(items):
+    """Listing rows of transactions, amounts formatted with their display currency equivalent"""
+    target = display_currency()
+    rows = []
+    for item, converted in zip(items, converted_amounts(items, target)):
+        currency = getattr(item, 'currency', None) or 'EUR'
+        amount = float(item.amount)
+        rows.append(TransactionRow(item.date, getattr(item, 'description', None), item.category, amount, currency,
+                                   format_converted(amount, currency, converted, target)))
+    return rows
+
 def predict_value(slope, intercept, x):
     """Predict a value using linear regression"""
     if slope is None or intercept is None:
@@ -179,7 +441,7 @@ def predict_value(slope, intercept, x):
     return slope * x + intercept
 
 
-@app.route('/dashboard')
+@route('/dashboard')
 @login_required
 def dashboard():
     try:
@@ -187,16 +449,19 @@ def dashboard():
         timeframe_months = session.get('timeframe_months', 12)
         
         # Get all data and filter by timeframe
-        all_incomes = data_manager.get_incomes()
-        all_expenses = data_manager.get_expenses()
+        all_incomes = user_data().get_incomes()
+        all_expenses = user_data().get_expenses()
         
         incomes = filter_by_timeframe(all_incomes)
         expenses = filter_by_timeframe(all_expenses)
 
-        # Calculate totals
-        total_income = sum([float(getattr(t, 'amount', 0.0)) for t in incomes])
-        total_expenses = sum([float(getattr(t, 'amount', 0.0)) for t in expenses])
-        balance = total_income - total_expenses
+        # All aggregates are in the display currency: amounts are summed per
+        # currency and day, and only those partial sums get converted
+        sums = display_sums()
+        for income in incomes:
+            sums.add('income', *amount_parts(income))
+        for expense in expenses:
+            sums.add('expenses', *amount_parts(expense))
 
         # Get current date info
         now = datetime.now()
@@ -208,24 +473,16 @@ def dashboard():
         else:
             last_month = f"{now.year}-{str(now.month - 1).zfill(2)}"
 
-        # Calculate current month totals
-        current_month_income = 0
-        current_month_expenses = 0
-        last_month_income = 0
-        last_month_expenses = 0
-
+        # Calculate current and last month totals
         for income in incomes:
             date_str = getattr(income, 'date', '')
             if date_str:
                 try:
                     date_obj = datetime.strptime(date_str, '%Y-%m-%d')
                     month_key = date_obj.strftime('%Y-%m')
-                    amount = float(getattr(income, 'amount', 0))
 
-                    if month_key == current_month:
-                        current_month_income += amount
-                    elif month_key == last_month:
-                        last_month_income += amount
+                    if month_key in (current_month, last_month):
+                        sums.add(('income', month_key), *amount_parts(income))
                 except:
                     pass
 
@@ -235,15 +492,28 @@ def dashboard():
                 try:
                     date_obj = datetime.strptime(date_str, '%Y-%m-%d')
                     month_key = date_obj.strftime('%Y-%m')
-                    amount = float(getattr(expense, 'amount', 0))
 
-                    if month_key == current_month:
-                        current_month_expenses += amount
-                    elif month_key == last_month:
-                        last_month_expenses += amount
+                    if month_key in (current_month, last_month):
+                        sums.add(('expenses', month_key), *amount_parts(expense))
                 except:
                     pass
 
+        # Calculate expenses by category for chart
+        for expense in expenses:
+            category = getattr(expense, 'category', 'Other')
+            sums.add(('category', category), *amount_parts(expense))
+
+        totals = sums.totals()
+        total_income = totals.get('income', 0.0)
+        total_expenses = totals.get('expenses', 0.0)
+        balance = total_income - total_expenses
+        current_month_income = totals.get(('income', current_month), 0)
+        current_month_expenses = totals.get(('expenses', current_month), 0)
+        last_month_income = totals.get(('income', last_month), 0)
+        last_month_expenses = totals.get(('expenses', last_month), 0)
+        expense_by_category = {bucket[1]: total for bucket, total in totals.items()
+                               if isinstance(bucket, tuple) and bucket[0] == 'category'}
+
         # Calculate trends
         income_trend = None
         income_trend_direction = 'neutral'
@@ -275,7 +545,8 @@ def dashboard():
                 'description': getattr(income, 'description', ''),
                 'category': getattr(income, 'category', ''),
                 'amount': float(getattr(income, 'amount', 0)),
-                'currency': getattr(income, 'currency', 'EUR')
+                'currency': getattr(income, 'currency', 'EUR'),
+                'amount_eur': getattr(income, 'amount_eur', None)
             })
 
         for expense in expenses:
@@ -285,7 +556,8 @@ def dashboard():
                 'description': getattr(expense, 'description', ''),
                 'category': getattr(expense, 'category', ''),
                 'amount': float(getattr(expense, 'amount', 0)),
-                'currency': getattr(expense, 'currency', 'EUR')
+                'currency': getattr(expense, 'currency', 'EUR'),
+                'amount_eur': getattr(expense, 'amount_eur', None)
             })
 
         # Sort by date (most recent first) and get last 5
@@ -293,20 +565,16 @@ def dashboard():
         recent_transactions = recent_transactions[:5]
 
         # Format dates for display
-        for trans in recent_transactions:
+        target = display_currency()
+        for trans, converted in zip(recent_transactions, converted_amounts(recent_transactions, target)):
+            trans['formatted_amount'] = format_converted(trans['amount'], trans['currency'] or 'EUR', converted,
+                                                         target)
             try:
                 date_obj = datetime.strptime(trans['date'], '%Y-%m-%d')
                 trans['formatted_date'] = date_obj.strftime('%B %d, %Y')
             except:
                 trans['formatted_date'] = trans['date']
 
-        # Calculate expenses by category for chart
-        expense_by_category = defaultdict(float)
-        for expense in expenses:
-            category = getattr(expense, 'category', 'Other')
-            amount = float(getattr(expense, 'amount', 0))
-            expense_by_category[category] += amount
-
         category_labels = list(expense_by_category.keys())
         category_values = list(expense_by_category.values())
 
@@ -331,7 +599,7 @@ def dashboard():
                            category_values=category_values,
                            timeframe_months=timeframe_months)
 
-@app.route('/income', methods=['GET', 'POST'])
+@route('/income', methods=['GET', 'POST'])
 @login_required
 def income():
     if request.method == 'POST':
@@ -353,7 +621,7 @@ def income():
             flash('Invalid amount!')
             return redirect(url_for('income'))
 
-        auto_category = auto_categorize_transaction(description, transaction_type='income')
+        auto_category = auto_categorize_transaction(description, transaction_type='income', user_id=session['user_id'])
         category = auto_category if auto_category else user_category
 
         income_entry = {
@@ -364,22 +632,25 @@ def income():
             'currency': currency
         }
 
-        data_manager._incomes.append(type('Income', (), income_entry)())
-        data_manager.save()
+        user_data().add_transactions(incomes=[income_entry], reload=False)
 
         flash('Income added successfully!')
         return redirect(url_for('income'))
 
     timeframe_months = session.get('timeframe_months', 12)
-    all_incomes = data_manager.get_incomes()
+    all_incomes = user_data().get_incomes()
     incomes = filter_by_timeframe(all_incomes)
     # Sort by date descending (most recent first)
     incomes = sorted(incomes, key=lambda x: x.date, reverse=True)
-    total_income = sum([float(getattr(t, 'amount', 0.0)) for t in incomes])
-    return render_template('income.html', incomes=incomes, total_income=total_income, timeframe_months=timeframe_months)
+    sums = display_sums()
+    for item in incomes:
+        sums.add('income', *amount_parts(item))
+    total_income = sums.totals().get('income', 0.0)
+    return render_template('income.html', incomes=transaction_rows(incomes),
+                           total_income=total_income, timeframe_months=timeframe_months)
 
 
-@app.route('/expenses', methods=['GET', 'POST'])
+@route('/expenses', methods=['GET', 'POST'])
 @login_required
 def expenses():
     if request.method == 'POST':
@@ -401,7 +672,7 @@ def expenses():
             flash('Invalid amount!')
             return redirect(url_for('expenses'))
 
-        auto_category = auto_categorize_transaction(description, transaction_type='expenses')
+        auto_category = auto_categorize_transaction(description, transaction_type='expenses', user_id=session['user_id'])
         category = auto_category if auto_category else user_category
 
         expense_entry = {
@@ -412,22 +683,94 @@ def expenses():
             'currency': currency
         }
 
-        data_manager._expenses.append(type('Expense', (), expense_entry)())
-        data_manager.save()
+        user_data().add_transactions(expenses=[expense_entry], reload=False)
 
         flash('Expense added successfully!')
         return redirect(url_for('expenses'))
 
     timeframe_months = session.get('timeframe_months', 12)
-    all_expenses = data_manager.get_expenses()
+    all_expenses = user_data().get_expenses()
     expenses = filter_by_timeframe(all_expenses)
     # Sort by date descending (most recent first)
     expenses = sorted(expenses, key=lambda x: x.date, reverse=True)
-    total_expenses = sum([float(getattr(t, 'amount', 0.0)) for t in expenses])
-    return render_template('expenses.html', expenses=expenses, total_expenses=total_expenses, timeframe_months=timeframe_months)
-
-
-@app.route('/revolut_import', methods=['GET', 'POST'])
+    sums = display_sums()
+    for item in expenses:
+        sums.add('expenses', *amount_parts(item))
+    total_expenses = sums.totals().get('expenses', 0.0)
+    return render_template('expenses.html', expenses=transaction_rows(expenses),
+                           total_expenses=total_expenses, timeframe_months=timeframe_months)
+
+
+def import_transaction_batches(batches, source):
+    """
+    Categorize and bulk-insert batches of imported TransactionRecords from `source`.
+    Each record carries a content fingerprint, so re-importing an overlapping
+    statement is idempotent: SQLite drops rows whose fingerprint already exists.
+    Returns (imported_count, skipped_count).
+    """
+    data = user_data()
+    user_id = data.user_id
+    # Transactions without a fingerprint (added by hand, or imported before
+    # fingerprints existed) still match on date, description and amount;
+    # each one absorbs at most one imported row
+    legacy_incomes = Counter(_legacy_key(r) for r in data.get_incomes() if not getattr(r, 'fingerprint', None))
+    legacy_expenses = Counter(_legacy_key(r) for r in data.get_expenses() if not getattr(r, 'fingerprint', None))
+    occurrences = Counter()
+
+    imported_count = 0
+    skipped_count = 0
+
+    for batch in batches:
+        new_incomes = []
+        new_expenses = []
+
+        # Look up categories from merchant mappings, one snapshot per batch
+        income_categories = iter(categorize_many(
+            [t.description for t in batch if t.amount >= 0], transaction_type='income', user_id=user_id))
+        expense_categories = iter(categorize_many(
+            [t.description for t in batch if t.amount < 0], transaction_type='expenses', user_id=user_id))
+
+        for t in batch:
+            is_income = t.amount >= 0
+            # Default to "Other" when no mapping matched
+            category = next(income_categories if is_income else expense_categories) or "Other"
+
+            occurrence_key = (t.date, t.description, t.amount, t.currency)
+            occurrence = occurrences[occurrence_key]
+            occurrences[occurrence_key] += 1
+
+            record_to_add = {
+                'date': t.date.strftime('%Y-%m-%d'),
+                'description': t.description,
+                'category': category,
+                'amount': abs(t.amount),
+                'currency': t.currency,
+                'fingerprint': transaction_fingerprint(source, t, occurrence)
+            }
+
+            legacy = legacy_incomes if is_income else legacy_expenses
+            key = (record_to_add['date'], record_to_add['description'], float(record_to_add['amount']))
+            if legacy[key] > 0:
+                legacy[key] -= 1
+                skipped_count += 1
+                continue
+
+            (new_incomes if is_income else new_expenses).append(record_to_add)
+
+        inserted = data.add_transactions(incomes=new_incomes, expenses=new_expenses, reload=False)
+        imported_count += inserted
+        skipped_count += len(new_incomes) + len(new_expenses) - inserted
+
+    if imported_count:
+        data.load()
+    return imported_count, skipped_count
+
+
+def _legacy_key(record):
+    return (getattr(record, 'date'), getattr(record, 'description', None), float(getattr(record, 'amount')))
+
+
+@route('/revolut_import', methods=['GET', 'POST'])
 @login_required
 def revolut_import():
     if request.method == 'POST':
@@ -441,74 +784,50 @@ def revolut_import():
             flash('No selected file', 'error')
             return redirect(request.url)
         
-        if file and file.filename.endswith('.csv'):
-            try:
-                csv_content = file.stream.read().decode('utf-8')
-                transactions = RevolutImporter.parse_csv(csv_content)
-                
-                imported_count = 0
-                skipped_count = 0
-                
-                for t in transactions:
-                    is_income = t.amount >= 0
-                    transaction_type = 'income' if is_income else 'expenses'
-                    # Look up category from merchant mappings
-                    category = auto_categorize_transaction(t.description, transaction_type=transaction_type)
-                    
-                    # If no category found in mappings, default to "Other"
-                    if not category:
-                        category = "Other"
-
-                    record_to_add = {
-                        'date': t.date.strftime('%Y-%m-%d'),
-                        'description': t.description,
-                        'category': category,
-                        'amount': abs(t.amount),
-                        'currency': t.currency
-                    }
-
-                    # Use a more robust duplicate check based on original description
-                    is_duplicate = False
-                    target_list = data_manager.get_incomes() if is_income else data_manager.get_expenses()
-                    for existing_record in target_list:
-                        if (getattr(existing_record, 'date') == record_to_add['date'] and
-                            getattr(existing_record, 'description', None) == record_to_add['description'] and
-                            float(getattr(existing_record, 'amount')) == float(record_to_add['amount'])):
-                            is_duplicate = True
-                            break
-
-                    if not is_duplicate:
-                        if is_income:
-                            # Adjust amount for income
-                            record_to_add['amount'] = t.amount
-                            data_manager._incomes.append(type('Income', (), record_to_add))
-                        else:
-                            data_manager._expenses.append(type('Expense', (), record_to_add))
-                        imported_count += 1
-                    else:
-                        skipped_count += 1
-
-                data_manager.save()
-                flash(f'Successfully imported {imported_count} Revolut transactions! Skipped {skipped_count} duplicate transactions.', 'success')
-                return redirect(url_for('dashboard'))
-            except Exception as e:
-                flash(f'Error importing transactions: {e}', 'error')
-                return redirect(request.url)
-        else:
-            flash('Invalid file type. Please upload a CSV file.', 'error')
+        if file.filename.rsplit('.', 1)[-1].lower() not in supported_extensions():
+            flash('Invalid file type. Please upload a CSV, OFX or QIF statement.', 'error')
             return redirect(request.url)
+
+        started = time.perf_counter()
+        source = 'unknown'
+        try:
+            stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+            importer_cls = detect_importer(file.filename, stream.read(IMPORT_SNIFF_CHARS))
+            source = importer_cls.name
+            stream.seek(0)
+            batches = importer_cls().iter_batches(stream)
+
+            imported_count, skipped_count = import_transaction_batches(batches, importer_cls.name)
+            IMPORT_JOBS.inc(source=source, outcome='success')
+            IMPORT_TRANSACTIONS.inc(imported_count, source=source, result='imported')
+            IMPORT_TRANSACTIONS.inc(skipped_count, source=source, result='skipped')
+            flash(f'Successfully imported {imported_count} {importer_cls.label} transactions! Skipped {skipped_count} duplicate transactions.', 'success')
+            return redirect(url_for('dashboard'))
+        except Exception as e:
+            IMPORT_JOBS.inc(source=source, outcome='error')
+            flash(f'Error importing transactions: {e}', 'error')
+            return redirect(request.url)
+        finally:
+            IMPORT_DURATION.observe(time.perf_counter() - started, source=source)
             
     timeframe_months = session.get('timeframe_months', 12)
     return render_template('revolut_import.html', timeframe_months=timeframe_months)
 
 
-@app.route('/delete_income/<date_str>/<float:amount>/<desc>', methods=['POST'])
+@route('/metrics')
+def metrics_endpoint():
+    """Counters of this process in the Prometheus text format, for scraping"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@route('/delete_income/<date_str>/<float:amount>/<desc>', methods=['POST'])
 @login_required
 def delete_income(date_str, amount, desc):
     try:
         # Find the income by matching date, description, and amount
+        data = user_data()
         target_income = None
-        for inc in data_manager._incomes:
+        for inc in data.get_incomes():
             inc_date = getattr(inc, 'date', '')
             inc_desc = getattr(inc, 'description', '')
             inc_amount = float(getattr(inc, 'amount', 0))
@@ -518,8 +837,7 @@ def delete_income(date_str, amount, desc):
                 break
         
         if target_income:
-            data_manager._incomes.remove(target_income)
-            data_manager.save()
+            data.delete_transaction('incomes', target_income.id)
             flash('Income deleted successfully!')
         else:
             flash('Income not found!')
@@ -528,7 +846,7 @@ def delete_income(date_str, amount, desc):
     return redirect(url_for('income'))
 
 
-@app.route('/change_income_category/<date_str>/<float:amount>/<desc>', methods=['POST'])
+@route('/change_income_category/<date_str>/<float:amount>/<desc>', methods=['POST'])
 @login_required
 def change_income_category(date_str, amount, desc):
     try:
@@ -539,8 +857,9 @@ def change_income_category(date_str, amount, desc):
         
         # Find the income by matching date, description, and amount
         # This avoids index mismatch issues with filtered/sorted lists
+        data = user_data()
         target_income = None
-        for inc in data_manager._incomes:
+        for inc in data.get_incomes():
             inc_date = getattr(inc, 'date', '')
             inc_desc = getattr(inc, 'description', '')
             inc_amount = float(getattr(inc, 'amount', 0))
@@ -555,20 +874,11 @@ def change_income_category(date_str, amount, desc):
         
         merchant = getattr(target_income, 'description', None)
         
-        # Update this income
-        target_income.category = new_category
-        
-        # Update all incomes with the same merchant/description
-        updated_count = 0
-        for inc in data_manager._incomes:
-            if getattr(inc, 'description', None) == merchant:
-                inc.category = new_category
-                updated_count += 1
-        
-        data_manager.save()
+        # Update this income and all incomes with the same merchant/description
+        updated_count = data.set_category('incomes', merchant, new_category)
         
         # Save merchant-category mapping for auto-categorization of future transactions
-        update_merchant_category(merchant, new_category, transaction_type='income')
+        update_merchant_category(merchant, new_category, transaction_type='income', user_id=session['user_id'])
         
         flash(f'Category updated to "{new_category}" for {updated_count} transaction(s) from the same merchant!')
     except Exception as e:
@@ -576,13 +886,14 @@ def change_income_category(date_str, amount, desc):
     return redirect(url_for('income'))
 
 
-@app.route('/delete_expense/<date_str>/<float:amount>/<desc>', methods=['POST'])
+@route('/delete_expense/<date_str>/<float:amount>/<desc>', methods=['POST'])
 @login_required
 def delete_expense(date_str, amount, desc):
     try:
         # Find the expense by matching date, description, and amount
+        data = user_data()
         target_expense = None
-        for exp in data_manager._expenses:
+        for exp in data.get_expenses():
             exp_date = getattr(exp, 'date', '')
             exp_desc = getattr(exp, 'description', '')
             exp_amount = float(getattr(exp, 'amount', 0))
@@ -592,8 +903,7 @@ def delete_expense(date_str, amount, desc):
                 break
         
         if target_expense:
-            data_manager._expenses.remove(target_expense)
-            data_manager.save()
+            data.delete_transaction('expenses', target_expense.id)
             flash('Expense deleted successfully!')
         else:
             flash('Expense not found!')
@@ -602,7 +912,7 @@ def delete_expense(date_str, amount, desc):
     return redirect(url_for('expenses'))
 
 
-@app.route('/change_expense_category/<date_str>/<float:amount>/<desc>', methods=['POST'])
+@route('/change_expense_category/<date_str>/<float:amount>/<desc>', methods=['POST'])
 @login_required
 def change_expense_category(date_str, amount, desc):
     try:
@@ -613,8 +923,9 @@ def change_expense_category(date_str, amount, desc):
         
         # Find the expense by matching date, description, and amount
         # This avoids index mismatch issues with filtered/sorted lists
+        data = user_data()
         target_expense = None
-        for exp in data_manager._expenses:
+        for exp in data.get_expenses():
             exp_date = getattr(exp, 'date', '')
             exp_desc = getattr(exp, 'description', '')
             exp_amount = float(getattr(exp, 'amount', 0))
@@ -629,20 +940,11 @@ def change_expense_category(date_str, amount, desc):
         
         merchant = getattr(target_expense, 'description', None)
         
-        # Update this expense
-        target_expense.category = new_category
-        
-        # Update all expenses with the same merchant/description
-        updated_count = 0
-        for exp in data_manager._expenses:
-            if getattr(exp, 'description', None) == merchant:
-                exp.category = new_category
-                updated_count += 1
-        
-        data_manager.save()
+        # Update this expense and all expenses with the same merchant/description
+        updated_count = data.set_category('expenses', merchant, new_category)
         
         # Save merchant-category mapping for auto-categorization of future transactions
-        update_merchant_category(merchant, new_category, transaction_type='expenses')
+        update_merchant_category(merchant, new_category, transaction_type='expenses', user_id=session['user_id'])
         
         flash(f'Category updated to "{new_category}" for {updated_count} transaction(s) from the same merchant!')
     except Exception as e:
@@ -650,7 +952,7 @@ def change_expense_category(date_str, amount, desc):
     return redirect(url_for('expenses'))
 
 
-@app.route('/budgets', methods=['GET', 'POST'])
+@route('/budgets', methods=['GET', 'POST'])
 @login_required
 def budgets():
     if request.method == 'POST':
@@ -669,43 +971,30 @@ def budgets():
             flash('Invalid limit amount!')
             return redirect(url_for('budgets'))
 
-        # Create budget entry
-        budget_entry = {
-            'category': category,
-            'limit': limit
-        }
-
-        # Check if budget already exists for this category
-        existing = False
-        for i, b in enumerate(data_manager._budgets):
-            if getattr(b, 'category', None) == category:
-                data_manager._budgets[i] = type('Budget', (), budget_entry)
-                existing = True
-                break
-
-        if not existing:
-            data_manager._budgets.append(type('Budget', (), budget_entry))
-
-        data_manager.save()
+        # Create the budget, or update the limit of an existing one
+        user_data().set_budget(category, limit)
         flash('Budget limit set successfully!')
         return redirect(url_for('budgets'))
 
     # Calculate spending per category with timeframe filtering
     timeframe_months = session.get('timeframe_months', 12)
-    all_expenses = data_manager.get_expenses()
+    all_expenses = user_data().get_expenses()
     expenses = filter_by_timeframe(all_expenses)
-    category_spending = {}
+    sums = display_sums()
 
     for expense in expenses:
-        cat = getattr(expense, 'category', 'Other')
-        amount = float(getattr(expense, 'amount', 0))
-        category_spending[cat] = category_spending.get(cat, 0) + amount
+        sums.add(getattr(expense, 'category', 'Other'), *amount_parts(expense))
+    category_spending = sums.totals()
+
+    # Limits are entered in EUR and shown in the display currency
+    user_budgets = user_data().get_budgets()
+    limits = convert_many([float(getattr(budget, 'limit', 0)) for budget in user_budgets],
+                          ['EUR'] * len(user_budgets), display_currency(), factors=request_conversion_factors)
 
     # Prepare budget data with spending info
     budget_list = []
-    for budget in data_manager.get_budgets():
+    for budget, limit in zip(user_budgets, limits):
         cat = getattr(budget, 'category', '')
-        limit = float(getattr(budget, 'limit', 0))
         spent = category_spending.get(cat, 0)
         remaining = limit - spent
         percentage = (spent / limit * 100) if limit > 0 else 0
@@ -721,54 +1010,37 @@ def budgets():
     return render_template('budgets.html', budgets=budget_list, timeframe_months=timeframe_months)
 
 
-@app.route('/delete_budget/<int:budget_id>', methods=['POST'])
+@route('/delete_budget/<int:budget_id>', methods=['POST'])
 @login_required
 def delete_budget(budget_id):
-    try:
-        del data_manager._budgets[budget_id]
-        data_manager.save()
+    budgets = user_data().get_budgets()
+    if budget_id < len(budgets):
+        user_data().delete_budget(budgets[budget_id].category)
         flash('Budget deleted successfully!')
-    except IndexError:
+    else:
         flash('Budget not found!')
     return redirect(url_for('budgets'))
 
 
-@app.route('/reports')
+@route('/reports')
 @login_required
 def reports():
     timeframe_months = session.get('timeframe_months', 12)
     
     # Get all transactions and filter by timeframe
-    all_incomes = data_manager.get_incomes()
-    all_expenses = data_manager.get_expenses()
+    all_incomes = user_data().get_incomes()
+    all_expenses = user_data().get_expenses()
     incomes = filter_by_timeframe(all_incomes)
     expenses = filter_by_timeframe(all_expenses)
 
-    # Calculate totals
-    total_income = sum([float(getattr(t, 'amount', 0)) for t in incomes])
-    total_expenses = sum([float(getattr(t, 'amount', 0)) for t in expenses])
-    balance = total_income - total_expenses
-
-    # Expenses by category
-    category_totals = defaultdict(float)
+    # Totals, categories and months in the display currency, from partial sums
+    # per currency and day
+    sums = display_sums()
+    for income in incomes:
+        sums.add('income', *amount_parts(income))
     for expense in expenses:
-        cat = getattr(expense, 'category', 'Other')
-        amount = float(getattr(expense, 'amount', 0))
-        category_totals[cat] += amount
-
-    expense_by_category = []
-    category_labels = []
-    category_values = []
-
-    for cat, amount in category_totals.items():
-        percentage = (amount / total_expenses * 100) if total_expenses > 0 else 0
-        expense_by_category.append({
-            'category': cat,
-            'amount': amount,
-            'percentage': percentage
-        })
-        category_labels.append(cat)
-        category_values.append(amount)
+        sums.add('expenses', *amount_parts(expense))
+        sums.add(('category', getattr(expense, 'category', 'Other')), *amount_parts(expense))
 
     # Monthly trends
     income_by_month = {}
@@ -782,11 +1054,10 @@ def reports():
                 # Use YYYY-MM as key for grouping, but store date object for sorting
                 month_key = date_obj.strftime('%Y-%m')
                 month_label = date_obj.strftime('%b %Y')
-                amount = float(getattr(income, 'amount', 0))
 
                 if month_key not in income_by_month:
                     income_by_month[month_key] = {'date': date_obj, 'label': month_label, 'amount': 0}
-                income_by_month[month_key]['amount'] += amount
+                sums.add(('income', month_key), *amount_parts(income))
             except:
                 pass
 
@@ -797,14 +1068,38 @@ def reports():
                 date_obj = datetime.strptime(date_str, '%Y-%m-%d')
                 month_key = date_obj.strftime('%Y-%m')
                 month_label = date_obj.strftime('%b %Y')
-                amount = float(getattr(expense, 'amount', 0))
 
                 if month_key not in expense_by_month:
                     expense_by_month[month_key] = {'date': date_obj, 'label': month_label, 'amount': 0}
-                expense_by_month[month_key]['amount'] += amount
+                sums.add(('expenses', month_key), *amount_parts(expense))
             except:
                 pass
 
+    totals = sums.totals()
+    total_income = totals.get('income', 0.0)
+    total_expenses = totals.get('expenses', 0.0)
+    balance = total_income - total_expenses
+    category_totals = {bucket[1]: total for bucket, total in totals.items()
+                       if isinstance(bucket, tuple) and bucket[0] == 'category'}
+    for month_key, month in income_by_month.items():
+        month['amount'] = totals.get(('income', month_key), 0)
+    for month_key, month in expense_by_month.items():
+        month['amount'] = totals.get(('expenses', month_key), 0)
+
+    expense_by_category = []
+    category_labels = []
+    category_values = []
+
+    for cat, amount in category_totals.items():
+        percentage = (amount / total_expenses * 100) if total_expenses > 0 else 0
+        expense_by_category.append({
+            'category': cat,
+            'amount': amount,
+            'percentage': percentage
+        })
+        category_labels.append(cat)
+        category_values.append(amount)
+
     # Get all unique months and sort them
     all_month_keys = set(list(income_by_month.keys()) + list(expense_by_month.keys()))
 
@@ -841,7 +1136,9 @@ def reports():
             'type': 'Income',
             'description': getattr(income, 'description', ''),
             'category': getattr(income, 'category', ''),
-            'amount': float(getattr(income, 'amount', 0))
+            'amount': float(getattr(income, 'amount', 0)),
+            'currency': getattr(income, 'currency', 'EUR'),
+            'amount_eur': getattr(income, 'amount_eur', None)
         })
 
     for expense in expenses:
@@ -850,12 +1147,16 @@ def reports():
             'type': 'Expense',
             'description': getattr(expense, 'description', ''),
             'category': getattr(expense, 'category', ''),
-            'amount': float(getattr(expense, 'amount', 0))
+            'amount': float(getattr(expense, 'amount', 0)),
+            'currency': getattr(expense, 'currency', 'EUR'),
+            'amount_eur': getattr(expense, 'amount_eur', None)
         })
 
     # Sort by date and get last 10
     recent_transactions.sort(key=lambda x: x['date'], reverse=True)
     recent_transactions = recent_transactions[:10]
+    for trans, amount in zip(recent_transactions, converted_amounts(recent_transactions, display_currency())):
+        trans['display_amount'] = amount
 
     return render_template('reports.html',
                            total_income=total_income,
@@ -873,28 +1174,32 @@ def reports():
 
 
 
-@app.route('/graphs-stats')
+@route('/graphs-stats')
 @login_required
 def graphs_stats():
     """Comprehensive analytics and visualization dashboard with predictions"""
     try:
         timeframe_months = session.get('timeframe_months', 12)
-        all_incomes = data_manager.get_incomes()
-        all_expenses = data_manager.get_expenses()
+        all_incomes = user_data().get_incomes()
+        all_expenses = user_data().get_expenses()
         incomes = filter_by_timeframe(all_incomes)
         expenses = filter_by_timeframe(all_expenses)
 
+        # Amounts in the display currency at each transaction's date, converted
+        # in one batch per list (averages and extremes need every row)
+        income_amounts = converted_amounts(incomes, display_currency())
+        expense_amounts = converted_amounts(expenses, display_currency())
+
         # Calculate totals
-        total_income = sum([float(getattr(t, 'amount', 0)) for t in incomes])
-        total_expenses = sum([float(getattr(t, 'amount', 0)) for t in expenses])
+        total_income = sum(income_amounts)
+        total_expenses = sum(expense_amounts)
         balance = total_income - total_expenses
 
         # ===== SPENDING BY CATEGORY =====
         category_totals = defaultdict(float)
         category_counts = defaultdict(int)
-        for expense in expenses:
+        for expense, amount in zip(expenses, expense_amounts):
             cat = getattr(expense, 'category', 'Other')
-            amount = float(getattr(expense, 'amount', 0))
             category_totals[cat] += amount
             category_counts[cat] += 1
 
@@ -911,13 +1216,12 @@ def graphs_stats():
         day_transaction_counts = defaultdict(int)
         day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
         
-        for expense in expenses:
+        for expense, amount in zip(expenses, expense_amounts):
             date_str = getattr(expense, 'date', '')
             if date_str:
                 try:
                     date_obj = datetime.strptime(date_str, '%Y-%m-%d')
                     day_name = day_order[date_obj.weekday()]
-                    amount = float(getattr(expense, 'amount', 0))
                     day_spending[day_name] += amount
                     day_transaction_counts[day_name] += 1
                 except:
@@ -938,14 +1242,13 @@ def graphs_stats():
         income_by_month = {}
         expense_by_month = {}
 
-        for income in incomes:
+        for income, amount in zip(incomes, income_amounts):
             date_str = getattr(income, 'date', '')
             if date_str:
                 try:
                     date_obj = datetime.strptime(date_str, '%Y-%m-%d')
                     month_key = date_obj.strftime('%Y-%m')
                     month_label = date_obj.strftime('%b %Y')
-                    amount = float(getattr(income, 'amount', 0))
 
                     if month_key not in income_by_month:
                         income_by_month[month_key] = {'date': date_obj, 'label': month_label, 'amount': 0}
@@ -953,14 +1256,13 @@ def graphs_stats():
                 except:
                     pass
 
-        for expense in expenses:
+        for expense, amount in zip(expenses, expense_amounts):
             date_str = getattr(expense, 'date', '')
             if date_str:
                 try:
                     date_obj = datetime.strptime(date_str, '%Y-%m-%d')
                     month_key = date_obj.strftime('%Y-%m')
                     month_label = date_obj.strftime('%b %Y')
-                    amount = float(getattr(expense, 'amount', 0))
 
                     if month_key not in expense_by_month:
                         expense_by_month[month_key] = {'date': date_obj, 'label': month_label, 'amount': 0}
@@ -990,10 +1292,9 @@ def graphs_stats():
 
         # ===== DAILY SPENDING THROUGHOUT MONTH =====
         date_spending = defaultdict(float)
-        for expense in expenses:
+        for expense, amount in zip(expenses, expense_amounts):
             date_str = getattr(expense, 'date', '')
             if date_str:
-                amount = float(getattr(expense, 'amount', 0))
                 date_spending[date_str] += amount
 
         sorted_dates = sorted(date_spending.keys())
@@ -1001,12 +1302,12 @@ def graphs_stats():
         date_values = [date_spending[date] for date in sorted_dates]
 
         # ===== STATISTICS =====
-        all_amounts = [float(getattr(e, 'amount', 0)) for e in expenses]
+        all_amounts = expense_amounts
         avg_expense = sum(all_amounts) / len(all_amounts) if all_amounts else 0
         max_expense = max(all_amounts) if all_amounts else 0
         min_expense = min(all_amounts) if all_amounts else 0
 
-        all_income_amounts = [float(getattr(i, 'amount', 0)) for i in incomes]
+        all_income_amounts = income_amounts
         avg_income = sum(all_income_amounts) / len(all_income_amounts) if all_income_amounts else 0
 
         # Calculate average daily spending
@@ -1075,14 +1376,12 @@ def graphs_stats():
             predicted_yearly_balance = balance + ((avg_income - avg_expense) * 12)
 
         # 4. Category-specific predictions (next year spending)
+        # from the per-category sums above, already in the display currency
         category_predictions = {}
-        for category in category_totals.keys():
-            cat_expenses = [float(getattr(e, 'amount', 0)) for e in expenses 
-                           if getattr(e, 'category', 'Other') == category]
-            if cat_expenses:
-                avg_cat_spending = sum(cat_expenses) / len(cat_expenses)
-                yearly_prediction = avg_cat_spending * 12
-                category_predictions[category] = yearly_prediction
+        for category, cat_total in category_totals.items():
+            avg_cat_spending = cat_total / category_counts[category]
+            yearly_prediction = avg_cat_spending * 12
+            category_predictions[category] = yearly_prediction
         
         # Sort by predicted spending (descending)
         sorted_predictions = sorted(category_predictions.items(), key=lambda x: x[1], reverse=True)
@@ -1147,6 +1446,46 @@ def graphs_stats():
 
 
 
+def create_app(config=None):
+    """
+    Build the budget tracker app. `config` overrides DEFAULT_CONFIG, e.g.
+    {'DATABASE_PATH': ...} for an app on its own database; several apps can
+    live in one process. The database is not touched until the first
+    request or CLI command (see initialize_app).
+    """
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.update(config or {})
+    app.extensions['budget_tracker'] = {'initialized': False, 'lock': threading.Lock()}
+
+    for rule, options, view in _views:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.add_template_filter(jinja_format_with_conversion, 'format_with_conversion')
+    app.add_template_filter(jinja_money, 'money')
+    app.context_processor(inject_display_currency)
+    # The timer starts first, so database initialization counts as well
+    app.before_request(start_request_timer)
+    app.before_request(start_request_metrics)
+    app.before_request(open_request_database)
+    app.after_request(finish_request_timer)
+    app.after_request(record_request_metrics)
+    app.teardown_request(close_request_database)
+    app.teardown_request(stop_request_timer)
+    before_render_template.connect(start_template_span, app)
+    template_rendered.connect(stop_template_span, app)
+    if app.config['REQUEST_TIMING']:
+        timing.enable()
+    app.cli.add_command(load_rates_command)
+    app.cli.add_command(recompute_amounts_command)
+    app.cli.add_command(serve_command)
+    app.cli.add_command(generate_workload_command)
+    return app
+
+
+app = create_app()
+
+
 if __name__ == '__main__':
+    start_rate_refresher()
     app.run(debug=True, port=5002)
     app.run(debug=True, port=5002)
\ No newline at end of file
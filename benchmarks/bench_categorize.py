@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-row auto_categorize_transaction vs batch categorize_many
+on a synthetic statement (default 10k rows, 300 distinct merchants),
+plus fuzzy MerchantIndex lookup latency.
+
+    python benchmarks/bench_categorize.py --rows 10000 --merchants 300
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import database
+import merchant_mapper
+from merchant_matcher import MerchantIndex
+
+
+def build_statement(rows, merchants, seed):
+    rng = random.Random(seed)
+    names = [f"MERCHANT {i:04d}" for i in range(merchants)]
+    # Skewed like real statements: a few merchants account for most rows
+    weights = [1.0 / (rank + 1) for rank in range(merchants)]
+    return names, rng.choices(names, weights=weights, k=rows)
+
+
+def time_call(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_fuzzy(merchants, lookups, seed):
+    """Average MerchantIndex lookup time for unseen, misspelt store-number variants"""
+    rng = random.Random(seed)
+    words = ['STORES', 'MARKET', 'CAFE', 'PHARMACY', 'FUEL', 'BAKERY', 'BOOKS', 'TAXI']
+    known = {f"{rng.choice(words)} {i:04d}{chr(65 + i % 26)} {rng.choice(words)} {rng.randint(1, 9999)}": 'Shopping'
+             for i in range(merchants)}
+    index = MerchantIndex(known)
+    names = list(known)
+    # Drop the first letter so lookups go through the trigram index, not the exact path
+    queries = [name[1:].rsplit(' ', 1)[0] + f" {rng.randint(1, 9999)}" for name in rng.choices(names, k=lookups)]
+    start = time.perf_counter()
+    hits = sum(1 for query in queries if index.match(query))
+    return (time.perf_counter() - start) / lookups, hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--merchants', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+
+        names, descriptions = build_statement(args.rows, args.merchants, args.seed)
+        # Map two thirds of the merchants, so misses are exercised too
+        merchant_mapper.save_merchant_categories(
+            {name: 'Shopping' for name in names[: args.merchants * 2 // 3]}, 'expenses')
+
+        per_row = time_call(
+            lambda: [merchant_mapper.auto_categorize_transaction(d, 'expenses') for d in descriptions],
+            args.repeat)
+        batch = time_call(
+            lambda: merchant_mapper.categorize_many(descriptions, 'expenses'),
+            args.repeat)
+
+        assert merchant_mapper.categorize_many(descriptions, 'expenses') == \
+            [merchant_mapper.auto_categorize_transaction(d, 'expenses') for d in descriptions]
+
+    print(f"{args.rows} rows, {args.merchants} distinct merchants")
+    print(f"  auto_categorize_transaction per row: {per_row * 1000:9.2f} ms")
+    print(f"  categorize_many:                     {batch * 1000:9.2f} ms")
+    print(f"  speedup:                             {per_row / batch:9.1f}x")
+
+    for size in (args.merchants, 5000):
+        per_lookup, hits = bench_fuzzy(size, 2000, args.seed)
+        print(f"  fuzzy lookup, {size:5d} known merchants:  {per_lookup * 1e6:7.1f} us/lookup ({hits}/2000 matched)")
+
+
+if __name__ == '__main__':
+    main()
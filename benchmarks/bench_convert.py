@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-row convert_to_eur vs batch convert_many on mixed-currency
+rows (default 100k), with current rates and with dated historical rates.
+
+    python benchmarks/bench_convert.py --rows 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import currency_converter
+import database
+
+CURRENCIES = ['EUR', 'EUR', 'EUR', 'GBP', 'USD', 'CHF', 'SEK']
+CURRENT_RATES = {'EUR': 1.0, 'GBP': 0.86, 'USD': 1.08, 'CHF': 0.95, 'SEK': 11.4}
+
+
+def time_call(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=730, help='days of rate history and transaction dates')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start_day = date.today() - timedelta(days=args.days)
+    days = [(start_day + timedelta(days=i)).isoformat() for i in range(args.days)]
+    amounts = [round(rng.uniform(1, 500), 2) for _ in range(args.rows)]
+    currencies = [rng.choice(CURRENCIES) for _ in range(args.rows)]
+    dates = [rng.choice(days) for _ in range(args.rows)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        currency_converter.fetch_exchange_rates = lambda: CURRENT_RATES
+        currency_converter.refresh_exchange_rates()
+        # Business-day history, so many lookups resolve to an earlier day
+        for day in days:
+            if date.fromisoformat(day).weekday() < 5:
+                currency_converter.store_dated_rates(
+                    {code: rate * rng.uniform(0.95, 1.05) for code, rate in CURRENT_RATES.items() if code != 'EUR'},
+                    day)
+
+        per_row = time_call(lambda: [currency_converter.convert_to_eur(a, c) for a, c in zip(amounts, currencies)],
+                            args.repeat)
+        batch = time_call(lambda: currency_converter.convert_many(amounts, currencies), args.repeat)
+
+        def per_row_dated():
+            currency_converter._dated_rate_cache.clear()
+            currency_converter._dated_rate_revisions.clear()
+            return [currency_converter.convert_to_eur(a, c, d) for a, c, d in zip(amounts, currencies, dates)]
+        per_row_dated_time = time_call(per_row_dated, args.repeat)
+        batch_dated = time_call(lambda: currency_converter.convert_many(amounts, currencies, dates=dates), args.repeat)
+
+        assert currency_converter.convert_many(amounts, currencies, dates=dates) == per_row_dated()
+
+    print(f"{args.rows} rows, {len(set(currencies))} currencies, {args.days} days of history")
+    print(f"  current rates: convert_to_eur per row {per_row * 1000:8.1f} ms, "
+          f"convert_many {batch * 1000:7.1f} ms, speedup {per_row / batch:5.1f}x")
+    print(f"  dated rates:   convert_to_eur per row {per_row_dated_time * 1000:8.1f} ms, "
+          f"convert_many {batch_dated * 1000:7.1f} ms, speedup {per_row_dated_time / batch_dated:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
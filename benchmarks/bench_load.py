@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Load harness: simulated users in a thread pool driving one app in-process
+through the test client, each with its own session and a weighted mix of
+actions (login, dashboard, expenses listing, adding an expense, importing a
+statement). Reports throughput, latency percentiles per action, SQLite busy
+errors, and cross-user leaks: every description a user writes carries a
+[u<n>] tag, and any page showing another user's tag counts as a leak, as
+does a listing missing the user's own latest expense. Exits non-zero when
+leaks or errors occurred.
+
+    python benchmarks/bench_load.py --users 16 --seconds 20 --mix "dashboard=6,expenses=2,add_expense=2,import=1,login=1"
+"""
+import argparse
+import io
+import os
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import currency_converter
+import workload
+
+CURRENT_RATES = {'EUR': 1.0, 'GBP': 0.86, 'USD': 1.08}
+PASSWORD = 'loadpass'
+DEFAULT_MIX = 'dashboard=6,expenses=2,add_expense=2,import=1,login=1'
+TAG = re.compile(r'\[u(\d+)\]')
+BUSY_MESSAGES = ('database is locked', 'database is busy', 'database table is locked')
+
+
+def is_busy(error):
+    return isinstance(error, sqlite3.OperationalError) and any(m in str(error) for m in BUSY_MESSAGES)
+
+
+class Stats:
+    """Results shared by all simulated users"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.counts = Counter()
+
+    def record(self, action, seconds):
+        with self.lock:
+            self.latencies[action].append(seconds * 1000)
+
+    def count(self, what, n=1):
+        with self.lock:
+            self.counts[what] += n
+
+
+class SimulatedUser:
+    def __init__(self, number, flask_app, statements, stats, seed):
+        self.number = number
+        self.username = f'load{number}'
+        self.client = flask_app.test_client()
+        self.statements = statements
+        self.stats = stats
+        self.rng = random.Random(seed * 1000 + number)
+        self.added = 0
+        self.latest = None
+
+    def check_page(self, response):
+        """Count leaks: another user's tags on a page of this user"""
+        foreign = {int(n) for n in TAG.findall(response.get_data(as_text=True))} - {self.number}
+        if foreign:
+            self.stats.count('leaks', len(foreign))
+        return response
+
+    def login(self):
+        return self.client.post('/login', data={'username': self.username, 'password': PASSWORD})
+
+    def dashboard(self):
+        return self.check_page(self.client.get('/dashboard'))
+
+    def expenses(self):
+        response = self.check_page(self.client.get('/expenses'))
+        if self.latest and self.latest not in response.get_data(as_text=True):
+            self.stats.count('missing own writes')
+        return response
+
+    def add_expense(self):
+        self.added += 1
+        description = f'Load probe {self.added} [u{self.number}]'
+        response = self.client.post('/expenses', data={
+            'date': date.today().isoformat(), 'category': 'Other', 'description': description,
+            'amount': f'{self.rng.uniform(1, 50):.2f}', 'currency': 'EUR'})
+        self.latest = description
+        return response
+
+    def import_statement(self):
+        statement = self.rng.choice(self.statements)
+        response = self.client.post('/revolut_import', data={
+            'revolut_csv': (io.BytesIO(statement), 'statement.csv')}, content_type='multipart/form-data')
+        if not response.headers.get('Location', '').endswith('/dashboard'):
+            # The route turns failures into a flash message on the import page
+            message = self.client.get('/revolut_import').get_data(as_text=True)
+            self.stats.count('busy errors' if any(m in message for m in BUSY_MESSAGES) else 'import errors')
+        return response
+
+    ACTIONS = {'login': login, 'dashboard': dashboard, 'expenses': expenses, 'add_expense': add_expense,
+               'import': import_statement}
+
+    def run(self, mix, deadline):
+        actions, weights = list(mix), list(mix.values())
+        self.login()
+        while time.perf_counter() < deadline:
+            action = self.rng.choices(actions, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = self.ACTIONS[action](self)
+            except Exception as e:
+                self.stats.count('busy errors' if is_busy(e) else f'errors ({type(e).__name__})')
+                continue
+            self.stats.record(action, time.perf_counter() - start)
+            if response.status_code >= 400:
+                self.stats.count(f'HTTP {response.status_code}')
+
+
+def tagged_statements(number, count, rows, seed):
+    """Revolut statements of one user, every description tagged with the user"""
+    spec = workload.WorkloadSpec(users=count, months=1, expenses_per_day=rows / 31, budgets=False,
+                                 merchant_mappings=False)
+    statements = []
+    for user in workload.generate(spec, seed=seed * 1000 + number):
+        lines = [','.join(workload.REVOLUT_COLUMNS)]
+        for row in workload.revolut_rows(user):
+            row[4] = f'{row[4]} [u{number}]'
+            lines.append(','.join(row))
+        statements.append(('\n'.join(lines) + '\n').encode())
+    return statements
+
+
+def percentile(samples, q):
+    if len(samples) < 2:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[q - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=16, help='simulated users, one thread each')
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='action weights: login, dashboard, expenses, '
+                                                          'add_expense, import')
+    parser.add_argument('--months', type=int, default=2, help='generated history per user')
+    parser.add_argument('--import-rows', type=int, default=50, help='rows per imported statement')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    mix = workload.parse_weights(args.mix)
+    unknown = set(mix) - set(SimulatedUser.ACTIONS)
+    if unknown:
+        parser.error(f"unknown actions: {', '.join(sorted(unknown))}")
+
+    currency_converter.fetch_exchange_rates = lambda: CURRENT_RATES
+    import app as budget_app
+    stats = Stats()
+    with tempfile.TemporaryDirectory() as tmp:
+        flask_app = budget_app.create_app({'DATABASE_PATH': os.path.join(tmp, 'load.db'), 'TESTING': True})
+        budget_app.initialize_app(flask_app)
+        with budget_app.app_database(flask_app):
+            currency_converter.refresh_exchange_rates()
+            spec = workload.WorkloadSpec(users=args.users, months=args.months, username_prefix='load',
+                                         password=PASSWORD)
+            workload.run(spec, seed=args.seed)
+
+        users = [SimulatedUser(n, flask_app, tagged_statements(n, 3, args.import_rows, args.seed), stats, args.seed)
+                 for n in range(args.users)]
+        start = time.perf_counter()
+        deadline = start + args.seconds
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            for future in [pool.submit(user.run, mix, deadline) for user in users]:
+                future.result()
+        elapsed = time.perf_counter() - start
+
+    total = sum(len(samples) for samples in stats.latencies.values())
+    print(f"{args.users} users, {elapsed:.1f} s, mix {args.mix}, {os.cpu_count()} CPU cores")
+    print(f"  throughput {total / elapsed:8.1f} req/s ({total} requests)")
+    for action, samples in sorted(stats.latencies.items()):
+        print(f"  {action:12s} {len(samples):6d}  p50 {statistics.median(samples):8.1f} ms  "
+              f"p95 {percentile(samples, 95):8.1f} ms  p99 {percentile(samples, 99):8.1f} ms  "
+              f"max {max(samples):8.1f} ms")
+    for what in ('busy errors', 'leaks', 'missing own writes'):
+        print(f"  {what:18s} {stats.counts[what]}")
+    for what, count in sorted(stats.counts.items()):
+        if what not in ('busy errors', 'leaks', 'missing own writes'):
+            print(f"  {what:18s} {count}")
+
+    if any(stats.counts.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
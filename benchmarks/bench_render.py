@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: rendering the expenses page (default 5k rows) with the amount
+formatted by a template filter per row vs pre-formatted listing view rows,
+for the amount column alone and for the whole page (where the per-row
+url_for calls weigh in as well).
+
+    python benchmarks/bench_render.py --rows 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import currency_converter
+import database
+
+CURRENCIES = ['EUR', 'EUR', 'EUR', 'GBP', 'USD']
+CURRENT_RATES = {'EUR': 1.0, 'GBP': 0.86, 'USD': 1.08}
+CATEGORIES = ['Food & Dining', 'Transportation', 'Shopping', 'Bills & Utilities', 'Entertainment']
+# Recurring amounts (rent, subscriptions) next to one-off ones
+RECURRING = [9.99, 12.5, 45.0, 850.0]
+
+# The amount cell as rendered before listings got pre-formatted view rows
+FILTER_CELL = '{{ expense.amount|format_with_conversion(expense.currency, expense.date, eur_amounts[loop.index0]) }}'
+ROWS_CELL = '{{ expense.formatted_amount }}'
+
+
+def time_call(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    today = date.today()
+    expenses = [type('Expense', (), {
+        'date': (today - timedelta(days=rng.randrange(365))).isoformat(),
+        'description': f'Merchant {rng.randrange(200)}',
+        'category': rng.choice(CATEGORIES),
+        'amount': rng.choice(RECURRING) if rng.random() < 0.5 else round(rng.uniform(1, 300), 2),
+        'currency': rng.choice(CURRENCIES),
+    }) for _ in range(args.rows)]
+    expenses.sort(key=lambda e: e.date, reverse=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+        currency_converter.fetch_exchange_rates = lambda: CURRENT_RATES
+        import app as expense_app
+        from models.data_manager import eur_columns
+        flask_app = expense_app.app
+        expense_app.initialize_app(flask_app)
+        currency_converter.refresh_exchange_rates()
+        # As loaded from the database: with the EUR amount stored at write time
+        for expense, (amount_eur, rate) in zip(expenses, eur_columns(
+                [(e.amount, e.currency, e.date) for e in expenses])):
+            expense.amount_eur, expense.eur_rate = amount_eur, rate
+
+        source = flask_app.jinja_env.loader.get_source(flask_app.jinja_env, 'expenses.html')[0]
+        templates = {
+            'page': (flask_app.jinja_env.from_string(source.replace(ROWS_CELL, FILTER_CELL)),
+                     flask_app.jinja_env.get_template('expenses.html')),
+            'amount column': tuple(flask_app.jinja_env.from_string(f'{{% for expense in expenses %}}{cell}{{% endfor %}}')
+                                   for cell in (FILTER_CELL, ROWS_CELL)),
+        }
+
+        def render_with_filter(template):
+            with flask_app.test_request_context('/expenses'):
+                return expense_app.render_template(
+                    template, expenses=expenses, eur_amounts=expense_app.converted_amounts(expenses),
+                    total_expenses=0.0, timeframe_months=12)
+
+        def render_view_rows(template, cold=True):
+            if cold:
+                currency_converter.format_converted.cache_clear()
+            with flask_app.test_request_context('/expenses'):
+                return expense_app.render_template(
+                    template, expenses=expense_app.transaction_rows(expenses),
+                    total_expenses=0.0, timeframe_months=12)
+
+        results = []
+        for name, (filter_template, rows_template) in templates.items():
+            assert render_with_filter(filter_template) == render_view_rows(rows_template)
+            results.append((name,
+                            time_call(lambda: render_with_filter(filter_template), args.repeat),
+                            time_call(lambda: render_view_rows(rows_template), args.repeat),
+                            time_call(lambda: render_view_rows(rows_template, cold=False), args.repeat)))
+
+    print(f"{args.rows} expense rows, {len(set(CURRENCIES))} currencies")
+    for name, with_filter, cold, warm in results:
+        print(f"  {name:14s} per-row filter {with_filter * 1000:7.1f} ms, view rows {cold * 1000:7.1f} ms "
+              f"({with_filter / cold:4.2f}x), with warm memo {warm * 1000:7.1f} ms ({with_filter / warm:4.2f}x)")
+
+if __name__ == '__main__':
+    main()
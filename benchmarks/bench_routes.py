@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Route benchmarks: p50/p95 latency and peak allocations of the main pages
+and of a statement import, through the Flask test client, for a user with
+1k, 10k and 100k generated transactions. Results are compared against a
+JSON baseline; exits non-zero when a route regresses beyond the tolerance.
+
+    python benchmarks/bench_routes.py --update-baseline    # record
+    python benchmarks/bench_routes.py --tolerance 0.25     # compare
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import currency_converter
+import workload
+
+DEFAULT_BASELINE = Path(__file__).parent / 'baseline_routes.json'
+CURRENT_RATES = {'EUR': 1.0, 'GBP': 0.86, 'USD': 1.08}
+PASSWORD = 'benchpass'
+# Endpoint -> page; revolut_import is timed on POSTs of fresh statements
+PAGES = {
+    'dashboard': '/dashboard',
+    'reports': '/reports',
+    'graphs_stats': '/graphs-stats',
+    'budgets': '/budgets',
+    'income': '/income',
+    'expenses': '/expenses',
+}
+METRICS = ('p50_ms', 'p95_ms', 'alloc_peak_kib')
+
+
+def percentile(samples, q):
+    return statistics.quantiles(samples, n=100, method='inclusive')[q - 1]
+
+
+def build_dataset(path, transactions, seed):
+    """An app on its own database with one generated user holding about `transactions` rows"""
+    import app as budget_app
+    flask_app = budget_app.create_app({'DATABASE_PATH': path, 'TESTING': True})
+    budget_app.initialize_app(flask_app)
+    spec = workload.WorkloadSpec(users=1, months=12, expenses_per_day=transactions / 366,
+                                 username_prefix='bench', password=PASSWORD)
+    with budget_app.app_database(flask_app):
+        currency_converter.refresh_exchange_rates()
+        totals = workload.run(spec, seed=seed)
+    client = flask_app.test_client()
+    client.post('/login', data={'username': 'bench0', 'password': PASSWORD})
+    return client, totals['incomes'] + totals['expenses']
+
+
+def statements(count, rows, seed):
+    """`count` distinct Revolut statements of about `rows` rows each, for import samples"""
+    spec = workload.WorkloadSpec(users=count, months=1, expenses_per_day=rows / 31, budgets=False,
+                                 merchant_mappings=False, end=date.today())
+    result = []
+    for user in workload.generate(spec, seed=seed):
+        buffer = io.StringIO()
+        buffer.write(','.join(workload.REVOLUT_COLUMNS) + '\n')
+        for row in workload.revolut_rows(user):
+            buffer.write(','.join(row) + '\n')
+        result.append(buffer.getvalue().encode())
+    return result
+
+
+def measure(request, samples, warmup=2):
+    """Latency percentiles over `samples` calls and the peak allocations of one more"""
+    for _ in range(warmup):
+        request()
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        response = request()
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code in (200, 302), response.status_code
+    # Traced separately: tracemalloc slows every allocation down
+    tracemalloc.start()
+    request()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'p50_ms': round(statistics.median(timings), 3), 'p95_ms': round(percentile(timings, 95), 3),
+            'alloc_peak_kib': round(peak / 1024, 1)}
+
+
+def run_size(tmp, size, args):
+    client, transactions = build_dataset(os.path.join(tmp, f'routes-{size}.db'), size, args.seed)
+    results = {}
+    for endpoint, path in PAGES.items():
+        results[endpoint] = measure(lambda: client.get(path), args.samples)
+
+    uploads = iter(statements(args.samples + 3, args.import_rows, args.seed + size))
+    results['revolut_import'] = measure(lambda: client.post(
+        '/revolut_import', data={'revolut_csv': (io.BytesIO(next(uploads)), 'statement.csv')},
+        content_type='multipart/form-data'), args.samples)
+    return transactions, results
+
+
+def regressions(results, baseline, tolerance, min_delta_ms):
+    """(size, endpoint, metric, baseline, current) for every metric beyond the tolerance"""
+    found = []
+    for size, routes in results.items():
+        for endpoint, metrics in routes.items():
+            previous = baseline.get(size, {}).get(endpoint)
+            if not previous:
+                continue
+            for metric in METRICS:
+                before, now = previous.get(metric), metrics[metric]
+                if before is None:
+                    continue
+                # Sub-millisecond jitter is not a regression
+                slack = min_delta_ms if metric.endswith('_ms') else 0
+                if now > before * (1 + tolerance) + slack:
+                    found.append((size, endpoint, metric, before, now))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000', help='transactions per dataset, comma-separated')
+    parser.add_argument('--samples', type=int, default=20, help='timed requests per route')
+    parser.add_argument('--import-rows', type=int, default=200, help='rows per imported statement')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown or growth')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='latency change always tolerated')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args()
+
+    currency_converter.fetch_exchange_rates = lambda: CURRENT_RATES
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(size) for size in args.sizes.split(',')):
+            transactions, results[str(size)] = run_size(tmp, size, args)
+            print(f"{transactions} transactions ({size} requested), {args.samples} samples")
+            for endpoint, metrics in results[str(size)].items():
+                print(f"  {endpoint:15s} p50 {metrics['p50_ms']:9.2f} ms  p95 {metrics['p95_ms']:9.2f} ms  "
+                      f"peak {metrics['alloc_peak_kib']:10.1f} KiB")
+
+    if args.update_baseline:
+        baseline = {'machine': {'python': platform.python_version(), 'cpus': os.cpu_count(),
+                                'platform': platform.platform()},
+                    'samples': args.samples, 'import_rows': args.import_rows, 'results': results}
+        args.baseline.write_text(json.dumps(baseline, indent=2) + '\n')
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}: run with --update-baseline first")
+        return
+
+    found = regressions(results, json.loads(args.baseline.read_text())['results'], args.tolerance,
+                        args.min_delta_ms)
+    for size, endpoint, metric, before, now in found:
+        print(f"REGRESSION {size:>7s} {endpoint:15s} {metric:15s} {before:10.2f} -> {now:10.2f}")
+    if found:
+        sys.exit(1)
+    print(f"No route regressed beyond {args.tolerance:.0%} of {args.baseline.name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Aho-Corasick KeywordAutomaton vs a naive substring loop over
+keyword rules, for growing rule counts.
+
+    python benchmarks/bench_rules.py --descriptions 5000
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from merchant_matcher import KeywordAutomaton
+
+
+def random_word(rng, low=4, high=9):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(low, high)))
+
+
+def naive_match(rules, description):
+    """Reference implementation: test every keyword against the description"""
+    text = description.casefold()
+    best = None
+    for keyword, category, priority in rules:
+        if keyword in text:
+            key = (priority, len(keyword))
+            if best is None or key > best[0]:
+                best = (key, category)
+    return best[1] if best else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--descriptions', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{args.descriptions} descriptions")
+    for rule_count in (10, 100, 1000, 5000):
+        rules = [(random_word(rng), f"Category {i % 20}", rng.randint(0, 3)) for i in range(rule_count)]
+        keywords = [keyword for keyword, _, _ in rules]
+        descriptions = [
+            ' '.join([random_word(rng).upper(), rng.choice(keywords).upper(), str(rng.randint(100, 9999))])
+            if rng.random() < 0.5 else ' '.join(random_word(rng).upper() for _ in range(3))
+            for _ in range(args.descriptions)
+        ]
+
+        start = time.perf_counter()
+        automaton = KeywordAutomaton(rules)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast = [automaton.match(d) for d in descriptions]
+        automaton_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        slow = [naive_match(rules, d) for d in descriptions]
+        naive_time = time.perf_counter() - start
+
+        assert fast == slow
+        print(f"  {rule_count:5d} rules: automaton {automaton_time * 1000:8.1f} ms "
+              f"(build {build * 1000:6.1f} ms), naive {naive_time * 1000:8.1f} ms, "
+              f"speedup {naive_time / automaton_time:6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Load test: requests per second on the dashboard of a signed-in user, served
+by Werkzeug's development server vs the pre-forking production server
+(`flask serve`, needs gunicorn), with concurrent keep-alive clients.
+
+    python benchmarks/bench_serve.py --clients 16 --seconds 10
+"""
+import argparse
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+DEV_SERVER = '''
+import sys
+import app
+app.create_app({'DATABASE_PATH': sys.argv[1]}).run(port=int(sys.argv[2]), threaded=True)
+'''
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_listening(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start listening')
+
+
+def sign_up(port, username):
+    """Create a user and return its session cookie"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    body = urllib.parse.urlencode({'username': username, 'password': 'benchpass', 'confirm_password': 'benchpass'})
+    conn.request('POST', '/signup', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.getheader('Set-Cookie').split(';', 1)[0]
+
+
+def load(port, clients, seconds, path):
+    """Hammer `path` from `clients` threads (one user and connection each); returns requests/second"""
+    cookies = [sign_up(port, f'bench{n}') for n in range(clients)]
+    counts = [0] * clients
+    errors = [0] * clients
+    stop = time.perf_counter() + seconds
+
+    def client(n):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.perf_counter() < stop:
+            try:
+                conn.request('GET', path, headers={'Cookie': cookies[n]})
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    counts[n] += 1
+                else:
+                    errors[n] += 1
+                if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                    conn.close()
+                    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            except (OSError, http.client.HTTPException):
+                errors[n] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return sum(counts) / elapsed, sum(errors)
+
+
+def run_server(command, port, args):
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_listening(port, process)
+        return load(port, args.clients, args.seconds, args.path)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--path', default='/dashboard')
+    parser.add_argument('--workers', type=int, default=None, help='production workers (default: one per core)')
+    parser.add_argument('--threads', type=int, default=None, help='threads per production worker')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        results['development server'] = run_server(
+            [sys.executable, '-c', DEV_SERVER, os.path.join(tmp, 'dev.db'), str(port)], port, args)
+
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            print('gunicorn is not installed: skipping the production server (pip install gunicorn)')
+        else:
+            port = free_port()
+            factory = f"app:create_app({{'DATABASE_PATH': {os.path.join(tmp, 'prod.db')!r}}})"
+            command = [shutil.which('flask') or 'flask', '--app', factory, 'serve', '--bind', f'127.0.0.1:{port}']
+            if args.workers:
+                command += ['--workers', str(args.workers)]
+            if args.threads:
+                command += ['--threads', str(args.threads)]
+            results['production server'] = run_server(command, port, args)
+
+    print(f"GET {args.path}, {args.clients} clients, {args.seconds:g} s, {os.cpu_count()} CPU cores")
+    baseline = results['development server'][0]
+    for name, (throughput, errors) in results.items():
+        print(f"  {name:18s} {throughput:8.1f} req/s ({throughput / baseline:4.2f}x), {errors} errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark: time to import the app module, build an app with create_app()
+and serve the first request (which initializes the database), each in a
+fresh interpreter. Exits non-zero when import plus create_app() exceed the
+startup budget.
+
+    python benchmarks/bench_startup.py --budget-ms 500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Run in a child process so every sample pays the full import cost
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app as budget_app
+imported = time.perf_counter()
+instance = budget_app.create_app({'DATABASE_PATH': sys.argv[1], 'TESTING': True})
+created = time.perf_counter()
+instance.test_client().get('/login')
+served = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported, 'first_request': served - created}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=500.0,
+                        help='limit for import plus create_app(), median over the runs')
+    args = parser.parse_args()
+
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(args.runs):
+            result = subprocess.run(
+                [sys.executable, '-c', PROBE, os.path.join(tmp, f'startup-{run}.db')],
+                cwd=ROOT, capture_output=True, text=True, check=True
+            )
+            samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    medians = {phase: statistics.median(sample[phase] for sample in samples) * 1000 for phase in samples[0]}
+    startup = medians['import'] + medians['create_app']
+    print(f"median of {args.runs} runs")
+    for phase, ms in medians.items():
+        print(f"  {phase:14s} {ms:8.1f} ms")
+    print(f"  startup        {startup:8.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if startup > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a while instead of paying its
+    timeout on every attempt.
+
+    Closed: calls go through; `failure_threshold` consecutive failures open
+    the circuit. Open: calls are rejected until the open delay has passed,
+    then a single probe call is let through (half-open). A successful probe
+    closes the circuit; a failed one re-opens it with the delay doubled, up
+    to `max_delay`.
+    """
+
+    def __init__(self, failure_threshold=3, base_delay=30.0, max_delay=3600.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._opened_at = 0.0
+            self._open_delay = self.base_delay
+            self._successes = 0
+            self._failures = 0
+            self._rejected = 0
+            self._trips = 0
+
+    def after_fork(self):
+        """In a forked child: replace the lock, which a thread of the parent may have held"""
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self._state
+
+    def available(self):
+        """True if a call would currently be allowed (does not claim the probe)"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                return self._clock() - self._opened_at >= self._open_delay
+            return False
+
+    def allow(self):
+        """Claim permission for one call; False means fail fast"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self._clock() - self._opened_at >= self._open_delay:
+                self._state = HALF_OPEN
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._successes += 1
+            self._consecutive_failures = 0
+            self._state = CLOSED
+            self._open_delay = self.base_delay
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN:
+                self._open(min(self._open_delay * 2, self.max_delay))
+            elif self._state == CLOSED and self._consecutive_failures >= self.failure_threshold:
+                self._open(self.base_delay)
+
+    def _open(self, delay):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._open_delay = delay
+        self._trips += 1
+
+    def metrics(self):
+        """Counters and current state, for logging and monitoring"""
+        with self._lock:
+            retry_in = 0.0
+            if self._state == OPEN:
+                retry_in = max(0.0, self._opened_at + self._open_delay - self._clock())
+            return {
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'successes': self._successes,
+                'failures': self._failures,
+                'rejected': self._rejected,
+                'trips': self._trips,
+                'open_delay': self._open_delay,
+                'retry_in': retry_in,
+            }
@@ -1,48 +1,620 @@
-import requests
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict
+from datetime import date
 from functools import lru_cache
 
-EXCHANGE_RATES_URL = "https://api.exchangerate-api.com/v4/latest/EUR"
+import database
+import metrics
+import timing
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from database import get_db
 
-@lru_cache(maxsize=32)
-def get_exchange_rates():
+DEFAULT_EXCHANGE_RATES_URL = "https://api.exchangerate-api.com/v4/latest/EUR"
+# Provider endpoint returning {"rates": {...}} relative to EUR; overridable so
+# deployments and tests can point at a mirror or a local stub server
+EXCHANGE_RATES_URL = os.environ.get('EXCHANGE_RATES_URL', DEFAULT_EXCHANGE_RATES_URL)
+RATES_BASE = 'EUR'
+
+# Cached rates are served as fresh for this long. Older rates are still
+# served while a background fetch replaces them (stale-while-revalidate).
+RATES_TTL_SECONDS = 6 * 60 * 60
+# While rates are stale, the shared cache is re-read at most this often
+RATES_RETRY_SECONDS = 5 * 60
+RATES_FETCH_TIMEOUT = 5
+# How often the background refresher checks whether the rates need refreshing
+RATES_REFRESH_CHECK_SECONDS = 60
+
+# Consecutive failed fetches after which the provider is left alone, first
+# for RATES_BREAKER_BASE_DELAY seconds, doubling while probes keep failing
+RATES_BREAKER_THRESHOLD = 3
+RATES_BREAKER_BASE_DELAY = 60
+RATES_BREAKER_MAX_DELAY = 6 * 60 * 60
+
+# Served when no rates were ever fetched: amounts stay in their own currency
+IDENTITY_RATES = {'EUR': 1.0}
+
+# Last-known-good rates of this process: (rates, fetched_at) or None
+_rates = None
+_rates_lock = threading.Lock()
+_checked_at = 0.0
+_refresh_thread = None
+
+rate_breaker = CircuitBreaker(
+    failure_threshold=RATES_BREAKER_THRESHOLD,
+    base_delay=RATES_BREAKER_BASE_DELAY,
+    max_delay=RATES_BREAKER_MAX_DELAY
+)
+RATE_FETCHES = metrics.counter('exchange_rate_fetches_total',
+                               'Exchange rate fetches by outcome: success, failure, or rejected by the open circuit.')
+
+# The refresh currently in flight; concurrent callers wait for it instead of
+# fetching again
+_flight = None
+
+# Scheduled background refresher (see start_rate_refresher)
+_refresher_thread = None
+_refresher_stop = threading.Event()
+
+# (database, currency, day) -> (revision, rate) of get_rate_on, least recently
+# used first
+DATED_RATE_CACHE_SIZE = 4096
+_dated_rate_cache = OrderedDict()
+_dated_rate_cache_lock = threading.Lock()
+# A currency's revision token is re-read from the database at most this
+# often, so rates written by other processes show up within that time
+DATED_RATE_CHECK_SECONDS = 5
+# (database, currency) -> (revision, monotonic time it was read)
+_dated_rate_revisions = {}
+
+def _reset_after_fork():
+    """
+    In a forked child (a gunicorn worker): the parent's threads do not exist
+    here, so forget its in-flight fetch and refresher, whose waiters would
+    never be woken, and replace the locks they may have held at the fork
+    """
+    global _rates_lock, _dated_rate_cache_lock, _flight, _refresh_thread, _refresher_thread, _refresher_stop
+    _rates_lock = threading.Lock()
+    _dated_rate_cache_lock = threading.Lock()
+    _flight = None
+    _refresh_thread = None
+    _refresher_thread = None
+    _refresher_stop = threading.Event()
+    rate_breaker.after_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = False
+
+def fetch_exchange_rates():
+    """Fetch current rates from the provider (blocking); raises on failure"""
+    # Imported on first use: it is a large share of the app's import time and
+    # only the refresh thread needs it
+    import requests
+    response = requests.get(EXCHANGE_RATES_URL, timeout=RATES_FETCH_TIMEOUT)
+    response.raise_for_status()
+    rates = response.json().get('rates')
+    if not rates:
+        raise ValueError("Exchange rate response contains no rates")
+    return rates
+
+def _load_stored_rates():
+    """Read the rates shared by all processes, or None if there are none yet"""
     try:
-        response = requests.get(EXCHANGE_RATES_URL, timeout=5)
-        response.raise_for_status()
-        return response.json().get('rates', {})
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT rates, fetched_at FROM exchange_rate_cache WHERE base = ?', (RATES_BASE,))
+            row = cursor.fetchone()
+    except sqlite3.OperationalError:
+        return None
+    if row is None:
+        return None
+    return json.loads(row['rates']), row['fetched_at']
+
+def _store_rates(rates, fetched_at):
+    """Store fetched rates as the shared last-known-good and as today's history"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''INSERT INTO exchange_rate_cache (base, rates, fetched_at) VALUES (?, ?, ?)
+               ON CONFLICT (base) DO UPDATE SET rates = excluded.rates, fetched_at = excluded.fetched_at''',
+            (RATES_BASE, json.dumps(rates), fetched_at)
+        )
+        _insert_dated_rates(cursor, [
+            (date.today().isoformat(), currency, rate) for currency, rate in rates.items()
+        ])
+    _dated_rate_revisions.clear()
+
+def _insert_dated_rates(cursor, rows):
+    cursor.executemany(
+        '''INSERT INTO exchange_rates (date, currency, rate) VALUES (?, ?, ?)
+           ON CONFLICT (currency, date) DO UPDATE SET rate = excluded.rate''',
+        rows
+    )
+
+def store_dated_rates(rates, on_date):
+    """Record {currency: rate per EUR} as the rates of `on_date` (YYYY-MM-DD)"""
+    with get_db() as conn:
+        _insert_dated_rates(conn.cursor(), [(on_date, currency, rate) for currency, rate in rates.items()])
+    # Committed: this process sees its own rates at once
+    _dated_rate_revisions.clear()
+
+def _parse_rate(value):
+    try:
+        rate = float(value)
+    except (TypeError, ValueError):
+        return None
+    return rate if rate > 0 else None
+
+def load_rates_file(path):
+    """
+    Bulk-load historical EUR rates from a CSV file, either one rate per row
+    (header "date,currency,rate") or one date per row with a column per
+    currency, as in the ECB reference rate history ("Date,USD,JPY,...";
+    missing rates as "N/A"). Returns the number of rates stored.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = [column.strip() for column in next(reader, [])]
+        if not header:
+            return 0
+
+        if [column.lower() for column in header[:3]] == ['date', 'currency', 'rate']:
+            rows = [(row[0].strip(), row[1].strip().upper(), _parse_rate(row[2]))
+                    for row in reader if len(row) >= 3]
+        else:
+            currencies = [column.upper() for column in header[1:]]
+            rows = [(row[0].strip(), currency, _parse_rate(value))
+                    for row in reader if row
+                    for currency, value in zip(currencies, row[1:]) if currency]
+
+    rows = [row for row in rows if row[0] and row[2] is not None]
+    with get_db() as conn:
+        _insert_dated_rates(conn.cursor(), rows)
+    _dated_rate_revisions.clear()
+    return len(rows)
+
+def _dated_rate_revision(path, currency):
+    """Revision token of `currency`'s rates, re-read at most every DATED_RATE_CHECK_SECONDS"""
+    now = time.monotonic()
+    checked = _dated_rate_revisions.get((path, currency))
+    if checked is not None and now - checked[1] < DATED_RATE_CHECK_SECONDS:
+        return checked[0]
+    with get_db() as conn:
+        row = conn.execute('SELECT revision FROM exchange_rate_revisions WHERE currency = ?', (currency,)).fetchone()
+    revision = row['revision'] if row else 0
+    _dated_rate_revisions[(path, currency)] = (revision, now)
+    return revision
+
+def _lookup_dated_rate(currency, day):
+    """
+    Cached lookups are reused while the currency's revision token is
+    unchanged; any write to its rates, by any process, replaces the token,
+    so rates stored later (today's, a backfilled history) are picked up:
+    at once when written by this process, within DATED_RATE_CHECK_SECONDS
+    otherwise
+    """
+    path = database.database_path()
+    cache_key = (path, currency, day)
+    try:
+        revision = _dated_rate_revision(path, currency)
+        with _dated_rate_cache_lock:
+            cached = _dated_rate_cache.get(cache_key)
+            if cached is not None and cached[0] == revision:
+                _dated_rate_cache.move_to_end(cache_key)
+                metrics.CACHE_HITS.inc(cache='dated_rates')
+                return cached[1]
+        metrics.CACHE_MISSES.inc(cache='dated_rates')
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''SELECT rate FROM exchange_rates
+                   WHERE currency = ? AND date <= ?
+                   ORDER BY date DESC LIMIT 1''',
+                (currency, day)
+            )
+            row = cursor.fetchone()
+    except sqlite3.OperationalError:
+        return None
+    rate = row['rate'] if row else None
+    with _dated_rate_cache_lock:
+        _dated_rate_cache[cache_key] = (revision, rate)
+        _dated_rate_cache.move_to_end(cache_key)
+        while len(_dated_rate_cache) > DATED_RATE_CACHE_SIZE:
+            _dated_rate_cache.popitem(last=False)
+            metrics.CACHE_EVICTIONS.inc(cache='dated_rates')
+    return rate
+
+def get_rate_on(currency, on_date):
+    """
+    Rate of `currency` per EUR in effect on `on_date`: the latest recorded
+    rate on or before that day, or None if the history does not go back that far
+    """
+    if currency == RATES_BASE:
+        return 1.0
+    if not on_date:
+        return None
+    return _lookup_dated_rate(currency, str(on_date)[:10])
+
+def _set_rates(snapshot):
+    global _rates
+    with _rates_lock:
+        if _rates is None or snapshot[1] >= _rates[1]:
+            _rates = snapshot
+        return _rates
+
+def refresh_exchange_rates():
+    """
+    Fetch rates from the provider and store them as the new last-known-good.
+    A failed fetch leaves the current rates in place. Callers arriving while a
+    fetch is in flight share its outcome instead of starting another one.
+    Returns True on success.
+    """
+    global _flight
+    with _rates_lock:
+        flight = _flight
+        leader = flight is None
+        if leader:
+            flight = _flight = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        return flight.result
+
+    try:
+        flight.result = _fetch_and_store()
+    finally:
+        with _rates_lock:
+            _flight = None
+        flight.done.set()
+    return flight.result
+
+def _fetch_and_store():
+    breaker = rate_breaker
+    if not breaker.allow():
+        RATE_FETCHES.inc(outcome='rejected')
+        return False
+    try:
+        rates = fetch_exchange_rates()
     except Exception as e:
-        print(f"Error fetching exchange rates: {e}")
-        return {}
+        breaker.record_failure()
+        RATE_FETCHES.inc(outcome='failure')
+        print(f"Error fetching exchange rates ({breaker.state} circuit): {e}")
+        return False
+    breaker.record_success()
+    RATE_FETCHES.inc(outcome='success')
+
+    snapshot = (rates, time.time())
+    try:
+        _store_rates(*snapshot)
+    except sqlite3.Error as e:
+        print(f"Error storing exchange rates: {e}")
+    _set_rates(snapshot)
+    return True
 
-def convert_to_eur(amount, from_currency):
+def _in_current_database(target):
+    """
+    `target` bound to the database of the calling context: threads do not
+    inherit ContextVars, so a thread started for an app on its own database
+    would otherwise write to the default one
+    """
+    path = database.database_path()
+
+    def run(*args):
+        with database.use_database(path):
+            return target(*args)
+    return run
+
+def _revalidate_in_background():
+    """Start a refresh in a daemon thread unless one is in flight or the circuit is open"""
+    global _refresh_thread
+    with _rates_lock:
+        if _flight is not None or _refresh_thread is not None and _refresh_thread.is_alive():
+            return
+        if not rate_breaker.available():
+            return
+        _refresh_thread = threading.Thread(target=_in_current_database(refresh_exchange_rates),
+                                           name='exchange-rate-refresh', daemon=True)
+        _refresh_thread.start()
+
+def get_exchange_rates():
+    """
+    Return the current EUR-based exchange rates without waiting on the provider.
+    Fresh rates come from memory; stale ones are served while a background
+    fetch replaces them; with no rates at all, identity rates are returned.
+    """
+    global _checked_at
+    now = time.time()
+    snapshot = _rates
+    if snapshot is not None and now - snapshot[1] < RATES_TTL_SECONDS:
+        return snapshot[0]
+
+    if now - _checked_at >= RATES_RETRY_SECONDS:
+        # Another process may already have refreshed the shared cache
+        _checked_at = now
+        stored = _load_stored_rates()
+        if stored is not None:
+            snapshot = _set_rates(stored)
+
+    if snapshot is None or now - snapshot[1] >= RATES_TTL_SECONDS:
+        _revalidate_in_background()
+    return snapshot[0] if snapshot is not None else IDENTITY_RATES
+
+def _refresh_due():
+    """True if neither this process nor another one refreshed the rates recently"""
+    if not rate_breaker.available():
+        return False
+    now = time.time()
+    snapshot = _rates
+    if snapshot is None or now - snapshot[1] >= RATES_TTL_SECONDS:
+        stored = _load_stored_rates()
+        if stored is not None:
+            snapshot = _set_rates(stored)
+    return snapshot is None or now - snapshot[1] >= RATES_TTL_SECONDS
+
+def _run_refresher(interval):
+    while True:
+        try:
+            if _refresh_due():
+                refresh_exchange_rates()
+        except Exception as e:
+            print(f"Exchange rate refresher error: {e}")
+        if _refresher_stop.wait(interval):
+            return
+
+def start_rate_refresher(interval=None):
+    """
+    Keep the rates fresh from a daemon thread, so requests find fresh rates
+    instead of triggering revalidation themselves. Each process runs its own
+    refresher; they skip the fetch when another process already stored fresh
+    rates. The refresher writes to the database of the calling context.
+    Returns the refresher thread (starting it only once).
+    """
+    global _refresher_thread
+    with _rates_lock:
+        if _refresher_thread is not None and _refresher_thread.is_alive():
+            return _refresher_thread
+        _refresher_stop.clear()
+        _refresher_thread = threading.Thread(
+            target=_in_current_database(_run_refresher),
+            args=(interval or RATES_REFRESH_CHECK_SECONDS,),
+            name='exchange-rate-refresher',
+            daemon=True
+        )
+        _refresher_thread.start()
+        return _refresher_thread
+
+def stop_rate_refresher(timeout=None):
+    """Stop the background refresher started by start_rate_refresher()"""
+    global _refresher_thread
+    _refresher_stop.set()
+    thread = _refresher_thread
+    if thread is not None:
+        thread.join(timeout)
+    _refresher_thread = None
+
+def clear_exchange_rate_cache():
+    """Forget the rates held in memory (the shared cache is re-read on next use)"""
+    global _rates, _checked_at
+    with _rates_lock:
+        _rates = None
+        _checked_at = 0.0
+
+def exchange_rate_metrics():
+    """Age of the rates in use and the provider circuit breaker state"""
+    snapshot = _rates
+    return {
+        'rates_age_seconds': time.time() - snapshot[1] if snapshot is not None else None,
+        'currencies': len(snapshot[0]) if snapshot is not None else 0,
+        'breaker': rate_breaker.metrics(),
+    }
+
+def _exchange_rate_collector():
+    current = exchange_rate_metrics()
+    breaker = current['breaker']
+    age = current['rates_age_seconds']
+    return [
+        ('exchange_rates_age_seconds', 'gauge', 'Age of the exchange rates in use (NaN before the first fetch).',
+         [({}, age)]),
+        ('exchange_rates_currencies', 'gauge', 'Currencies with a current exchange rate.',
+         [({}, current['currencies'])]),
+        ('exchange_rate_breaker_state', 'gauge', 'Rate provider circuit breaker state (1 for the current one).',
+         [({'state': state}, int(breaker['state'] == state)) for state in (CLOSED, HALF_OPEN, OPEN)]),
+        ('exchange_rate_breaker_trips_total', 'counter', 'Times the rate provider circuit opened.',
+         [({}, breaker['trips'])]),
+        ('exchange_rate_breaker_retry_seconds', 'gauge', 'Seconds until the open circuit lets a probe through.',
+         [({}, breaker['retry_in'])]),
+        ('cache_entries', 'gauge', 'Entries held by a cache.', [({'cache': 'dated_rates'}, len(_dated_rate_cache))]),
+    ]
+
+metrics.register_collector(_exchange_rate_collector)
+
+def _dated_rate_series(cursor, currency, first_day, last_day):
+    """
+    (dates, rates) of `currency` covering first_day..last_day, starting at the
+    latest rate on or before first_day, for bisecting many days at once
+    """
+    cursor.execute(
+        '''SELECT date, rate FROM exchange_rates
+           WHERE currency = ? AND date <= ? AND date >= COALESCE(
+               (SELECT MAX(date) FROM exchange_rates WHERE currency = ? AND date <= ?), ?)
+           ORDER BY date''',
+        (currency, last_day, currency, first_day, first_day)
+    )
+    rows = cursor.fetchall()
+    return [row['date'] for row in rows], [row['rate'] for row in rows]
+
+def _dated_rate_vectors(days_by_currency):
+    """{(currency, day): rate} for the requested days, None where there is no history"""
+    vectors = {}
+    try:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            for currency, days in days_by_currency.items():
+                dates, rates = _dated_rate_series(cursor, currency, min(days), max(days))
+                for day in days:
+                    position = bisect_right(dates, day)
+                    vectors[(currency, day)] = rates[position - 1] if position else None
+    except sqlite3.OperationalError:
+        pass
+    return vectors
+
+@timing.timed('conversion')
+def conversion_factors(pairs, target='EUR'):
+    """
+    Conversion matrix for distinct (currency, day) pairs:
+    {(currency, day): (divisor, multiplier)} such that amount / divisor *
+    multiplier is the amount in `target`. Days are YYYY-MM-DD, or None for the
+    current rates; dated rates are read with one query per currency. Follows
+    convert_to_eur(): dated rates fall back to the current ones, and unknown
+    currencies are left unconverted.
+    """
+    current = get_exchange_rates()
+
+    def current_rate(currency):
+        return 1.0 if currency == RATES_BASE else current.get(currency) or 1.0
+
+    days_by_currency = defaultdict(set)
+    for currency, day in pairs:
+        if day and currency != target:
+            for code in (currency, target):
+                if code != RATES_BASE:
+                    days_by_currency[code].add(day)
+    dated = _dated_rate_vectors(days_by_currency) if days_by_currency else {}
+
+    def rate(currency, day):
+        if currency == RATES_BASE:
+            return 1.0
+        return dated.get((currency, day)) or current_rate(currency)
+
+    # amount / source rate * target rate is, for EUR targets, exactly
+    # convert_to_eur()'s amount / rate
+    return {(currency, day): (1.0, 1.0) if currency == target else (rate(currency, day), rate(target, day))
+            for currency, day in pairs}
+
+@timing.timed('conversion')
+def eur_rates(pairs):
+    """
+    Rate per EUR that convert_to_eur() applies to each distinct (currency,
+    day) pair, resolved in one batch: the dated rate, else the current one,
+    else None for a currency without any known rate
+    """
+    foreign = [(currency, day) for currency, day in pairs if currency != RATES_BASE]
+    current = get_exchange_rates() if foreign else {}
+    days_by_currency = defaultdict(set)
+    for currency, day in foreign:
+        if day:
+            days_by_currency[currency].add(day)
+    dated = _dated_rate_vectors(days_by_currency) if days_by_currency else {}
+    return {(currency, day): 1.0 if currency == RATES_BASE else dated.get((currency, day)) or current.get(currency)
+            for currency, day in pairs}
+
+@timing.timed('conversion')
+def convert_many(amounts, currencies, target='EUR', dates=None, factors=None):
+    """
+    Convert a whole column of amounts to `target` in one pass: the rates of
+    each distinct currency (and day, when `dates` are given) are resolved up
+    front by `factors` (default conversion_factors) and applied to every row.
+    """
+    factors = factors or conversion_factors
+    currencies = list(currencies)
+    if dates is None:
+        matrix = factors({(currency, None) for currency in currencies}, target)
+        vector = {currency: factor for (currency, _), factor in matrix.items()}
+        keys = currencies
+    else:
+        keys = list(zip(currencies, [str(day)[:10] if day else None for day in dates]))
+        vector = factors(set(keys), target)
+    return [amount / divisor * multiplier
+            for amount, (divisor, multiplier) in zip(amounts, map(vector.__getitem__, keys))]
+
+class CurrencySums:
+    """
+    Sums of mixed-currency amounts per bucket, in `target` currency. Amounts
+    are accumulated as partial sums per (bucket, currency, day) and only those
+    are converted when the totals are read, so conversion cost grows with the
+    distinct currencies and days rather than the rows. Amounts already in the
+    target currency are kept in a single undated partial sum.
+    """
+
+    def __init__(self, target='EUR', factors=None):
+        self.target = target
+        self._factors = factors or conversion_factors
+        self._partials = defaultdict(float)
+
+    def add(self, bucket, amount, currency='EUR', on_date=None):
+        currency = currency or 'EUR'
+        day = str(on_date)[:10] if on_date and currency != self.target else None
+        self._partials[(bucket, currency, day)] += amount
+
+    def totals(self):
+        """{bucket: total in the target currency}, buckets in first-added order"""
+        matrix = self._factors({(currency, day) for _, currency, day in self._partials}, self.target)
+        totals = {}
+        for (bucket, currency, day), amount in self._partials.items():
+            divisor, multiplier = matrix[(currency, day)]
+            totals[bucket] = totals.get(bucket, 0.0) + amount / divisor * multiplier
+        return totals
+
+@timing.timed('conversion')
+def convert_to_eur(amount, from_currency, on_date=None):
+    """
+    Convert to EUR at the rate in effect on `on_date` (a transaction date);
+    without a date, or without history that far back, at the current rate
+    """
     if from_currency == 'EUR':
         return amount
     
     if not amount:
         return 0
     
-    rates = get_exchange_rates()
-    if from_currency not in rates:
-        return amount
+    rate = get_rate_on(from_currency, on_date)
+    if rate is None:
+        rates = get_exchange_rates()
+        if from_currency not in rates:
+            return amount
+        rate = rates[from_currency]
     
-    rate = rates[from_currency]
     return amount / rate
 
+CURRENCY_SYMBOLS = {'EUR': '€', 'GBP': '£', 'USD': '$'}
+
+# Distinct (amount, currency, converted amount) strings kept by format_converted
+FORMAT_CACHE_SIZE = 4096
+
 def format_currency(amount, currency='EUR'):
-    if currency == 'EUR':
-        return f'€{amount:.2f}'
-    elif currency == 'GBP':
-        return f'£{amount:.2f}'
-    elif currency == 'USD':
-        return f'${amount:.2f}'
+    symbol = CURRENCY_SYMBOLS.get(currency)
+    if symbol:
+        return f'{symbol}{amount:.2f}'
     else:
         return f'{amount:.2f} {currency}'
 
-def format_amount_with_conversion(amount, original_currency):
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def format_converted(amount, currency, converted, display_currency='EUR'):
+    """
+    Format as "(original) converted" for an amount already converted to
+    display_currency, or just the amount when it is in that currency.
+    Memoized: listings repeat the same amounts (rent, subscriptions) a lot.
+    """
+    if currency == display_currency:
+        return format_currency(amount, display_currency)
+    return f'({format_currency(amount, currency)}) {format_currency(converted, display_currency)}'
+
+@timing.timed('conversion')
+def format_amount_with_conversion(amount, original_currency, on_date=None, eur_amount=None):
+    """Format as "(original) EUR"; pass eur_amount when it was already converted"""
     if original_currency == 'EUR':
         return format_currency(amount, 'EUR')
     
-    eur_amount = convert_to_eur(amount, original_currency)
-    original_formatted = format_currency(amount, original_currency)
-    eur_formatted = format_currency(eur_amount, 'EUR')
-    
-    return f'({original_formatted}) {eur_formatted}'
+    if eur_amount is None:
+        eur_amount = convert_to_eur(amount, original_currency, on_date)
+    return format_converted(amount, original_currency, eur_amount, 'EUR')
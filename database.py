@@ -3,35 +3,222 @@ import hashlib
 import os
 from pathlib import Path
 from contextlib import contextmanager
+from contextvars import ContextVar
+
+import metrics
+import timing
 
 DATABASE_PATH = 'data/budget_tracker.db'
 
+# Database of the current context (an app built with its own DATABASE_PATH),
+# overriding DATABASE_PATH; see use_database()
+_database_path = ContextVar('database_path', default=None)
+
+# Writes are appended to the write-ahead log and folded back into the main
+# database file by a checkpoint once the log reaches this many pages
+WAL_AUTOCHECKPOINT_PAGES = 1000
+
+def database_path():
+    """Path of the database used in the current context"""
+    return _database_path.get() or DATABASE_PATH
+
+@contextmanager
+def use_database(path):
+    """Use the database at `path` in this context (thread or request) only"""
+    token = _database_path.set(path)
+    try:
+        yield
+    finally:
+        _database_path.reset(token)
+
+SQLITE_CONNECTIONS = metrics.counter('sqlite_connections_total', 'SQLite connections opened.')
+SQLITE_QUERIES = metrics.counter('sqlite_queries_total', 'SQL statements executed (executemany counts once).')
+
+class _CountingCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        SQLITE_QUERIES.inc()
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        SQLITE_QUERIES.inc()
+        return super().executemany(sql, parameters)
+
+class _CountingConnection(sqlite3.Connection):
+    """Connection counting the statements run through it"""
+
+    def cursor(self, factory=_CountingCursor):
+        return super().cursor(factory)
+
+    # Connection.execute() does not go through cursor().execute()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+def connect():
+    """Open a connection to the current database"""
+    SQLITE_CONNECTIONS.inc()
+    return sqlite3.connect(database_path(), timeout=10.0, factory=_CountingConnection)
+
 def ensure_data_directory_exists():
-    """Ensure data directory exists"""
-    os.makedirs('data', exist_ok=True)
+    """Ensure the database directory exists"""
+    os.makedirs(os.path.dirname(database_path()) or '.', exist_ok=True)
 
 @contextmanager
 def get_db():
     """Context manager for database connections"""
-    ensure_data_directory_exists()
-    conn = sqlite3.connect(DATABASE_PATH, timeout=10.0)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
+    with timing.span('db'):
+        ensure_data_directory_exists()
+        conn = connect()
+        conn.row_factory = sqlite3.Row
+        # In WAL mode NORMAL only syncs at checkpoints and stays crash-safe
+        conn.execute('PRAGMA synchronous=NORMAL')
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+# Merchant mappings and keyword rules stored under this user id form the
+# shared layer every user falls back to
+GLOBAL_USER_ID = 0
+
+_REVISION_KEY_TYPES = {'user_id': 'INTEGER', 'transaction_type': 'TEXT', 'currency': 'TEXT'}
+
+def _init_revision_tracking(cursor, table, revision_table, key_columns=('user_id', 'transaction_type')):
+    """
+    Keep a random token per key (by default (user_id, transaction_type)) in
+    `revision_table`, replaced by triggers on every change to `table`, so
+    processes can validate a cached copy of one user's rows with a
+    primary-key lookup. A missing row means the user never had any rows
+    (revision 0).
+    """
+    cursor.execute(f"PRAGMA table_info({revision_table})")
+    if not set(key_columns) <= {col[1] for col in cursor.fetchall()}:
+        # Tokens from before per-user mappings; caches simply reload once
+        cursor.execute(f'DROP TABLE IF EXISTS {revision_table}')
+    key_definitions = ''.join(f'{column} {_REVISION_KEY_TYPES[column]} NOT NULL,\n' for column in key_columns)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {revision_table} (
+            {key_definitions}revision INTEGER NOT NULL,
+            PRIMARY KEY ({', '.join(key_columns)})
+        )
+    ''')
+    key_list = ', '.join(key_columns)
+    for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+        matches = ' AND '.join(f'{column} = {row}.{column}' for column in key_columns)
+        values = ', '.join(f'{row}.{column}' for column in key_columns)
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE {revision_table} SET revision = random()
+                WHERE {matches};
+                -- Not INSERT OR REPLACE: an outer upsert would override its conflict policy
+                INSERT INTO {revision_table} ({key_list}, revision)
+                SELECT {values}, random()
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {revision_table}
+                    WHERE {matches}
+                );
+            END
+        ''')
+
+def _create_user_scoped_table(cursor, table, create_sql):
+    """
+    Run `create_sql` for `table`. A table from before per-user mappings (no
+    user_id column) is rebuilt first, its rows becoming the shared layer.
+    """
+    cursor.execute(f"PRAGMA table_info({table})")
+    columns = [col[1] for col in cursor.fetchall()]
+    if not columns or 'user_id' in columns:
+        cursor.execute(create_sql)
+        return
+
+    # The old triggers move with the renamed table and are dropped with it
+    cursor.execute(f'ALTER TABLE {table} RENAME TO {table}_unscoped')
+    cursor.execute(create_sql)
+    column_list = ', '.join(columns)
+    cursor.execute(
+        f'INSERT INTO {table} (user_id, {column_list}) SELECT ?, {column_list} FROM {table}_unscoped',
+        (GLOBAL_USER_ID,)
+    )
+    cursor.execute(f'DROP TABLE {table}_unscoped')
+
+def init_merchant_categories_table(cursor):
+    """Create the merchant category store (idempotent)"""
+    _create_user_scoped_table(cursor, 'merchant_categories', '''
+        CREATE TABLE IF NOT EXISTS merchant_categories (
+            user_id INTEGER NOT NULL DEFAULT 0,
+            transaction_type TEXT NOT NULL,
+            merchant TEXT NOT NULL,
+            category TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, transaction_type, merchant)
+        )
+    ''')
+    _init_revision_tracking(cursor, 'merchant_categories', 'merchant_category_revisions')
+
+def init_merchant_rules_table(cursor):
+    """Create the keyword rule store for auto-categorization (idempotent)"""
+    _create_user_scoped_table(cursor, 'merchant_rules', '''
+        CREATE TABLE IF NOT EXISTS merchant_rules (
+            user_id INTEGER NOT NULL DEFAULT 0,
+            transaction_type TEXT NOT NULL,
+            keyword TEXT NOT NULL,
+            category TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, transaction_type, keyword)
+        )
+    ''')
+    _init_revision_tracking(cursor, 'merchant_rules', 'merchant_rule_revisions')
+
+def init_exchange_rate_cache_table(cursor):
+    """Create the last-known-good exchange rate store (idempotent)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exchange_rate_cache (
+            base TEXT PRIMARY KEY,
+            rates TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+    ''')
+
+def init_exchange_rates_table(cursor):
+    """
+    Create the dated exchange rate history (idempotent). Rates are units of
+    `currency` per EUR; the (currency, date) key serves nearest-earlier lookups.
+    A revision token per currency validates the lookups cached by
+    currency_converter, whichever process wrote the rates.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exchange_rates (
+            date TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            rate REAL NOT NULL,
+            PRIMARY KEY (currency, date)
+        ) WITHOUT ROWID
+    ''')
+    _init_revision_tracking(cursor, 'exchange_rates', 'exchange_rate_revisions', key_columns=('currency',))
 
 def init_db():
     """Initialize the database with required tables"""
     ensure_data_directory_exists()
-    conn = sqlite3.connect(DATABASE_PATH, timeout=10.0)
+    conn = connect()
     cursor = conn.cursor()
     
     try:
+        # Write-ahead logging: a commit is a small append to the -wal file
+        # instead of a rewrite of database pages, readers never block the
+        # writer, and a crash mid-write leaves the last committed state intact.
+        # The mode is persistent, so it only needs setting here.
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA wal_autocheckpoint={WAL_AUTOCHECKPOINT_PAGES}')
+        
         # Users table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -52,6 +239,9 @@ def init_db():
                 category TEXT NOT NULL,
                 amount REAL NOT NULL,
                 currency TEXT DEFAULT 'EUR',
+                fingerprint TEXT,
+                amount_eur REAL,
+                eur_rate REAL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
@@ -67,6 +257,9 @@ def init_db():
                 category TEXT NOT NULL,
                 amount REAL NOT NULL,
                 currency TEXT DEFAULT 'EUR',
+                fingerprint TEXT,
+                amount_eur REAL,
+                eur_rate REAL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
@@ -85,6 +278,14 @@ def init_db():
             )
         ''')
         
+        # Merchant category mappings and keyword rules
+        init_merchant_categories_table(cursor)
+        init_merchant_rules_table(cursor)
+        
+        # Exchange rates shared by all processes
+        init_exchange_rate_cache_table(cursor)
+        init_exchange_rates_table(cursor)
+        
         # Migration: Add currency column to expenses and incomes tables if it doesn't exist
         cursor.execute("PRAGMA table_info(expenses)")
         expenses_columns = [col[1] for col in cursor.fetchall()]
@@ -96,6 +297,29 @@ def init_db():
         if 'currency' not in incomes_columns:
             cursor.execute('ALTER TABLE incomes ADD COLUMN currency TEXT DEFAULT "EUR"')
         
+        # Migration: Add content fingerprint of imported transactions. Manually added
+        # transactions have no fingerprint (NULLs never conflict in a UNIQUE index).
+        if 'fingerprint' not in expenses_columns:
+            cursor.execute('ALTER TABLE expenses ADD COLUMN fingerprint TEXT')
+        if 'fingerprint' not in incomes_columns:
+            cursor.execute('ALTER TABLE incomes ADD COLUMN fingerprint TEXT')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_expenses_fingerprint ON expenses (user_id, fingerprint)')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_incomes_fingerprint ON incomes (user_id, fingerprint)')
+        
+        # One revision token per user for their incomes, expenses and budgets,
+        # validating the read snapshots cached by DataManager
+        for table in ('incomes', 'expenses', 'budgets'):
+            _init_revision_tracking(cursor, table, 'user_data_revisions', key_columns=('user_id',))
+        
+        # Migration: EUR equivalent of the amount and the rate per EUR it was
+        # converted at, stored when the transaction is written. Existing rows
+        # start out NULL and are backfilled by recompute_eur_amounts().
+        for table, columns in (('expenses', expenses_columns), ('incomes', incomes_columns)):
+            if 'amount_eur' not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN amount_eur REAL')
+            if 'eur_rate' not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN eur_rate REAL')
+        
         conn.commit()
     except sqlite3.Error as e:
         conn.rollback()
@@ -104,6 +328,14 @@ def init_db():
         cursor.close()
         conn.close()
 
+def checkpoint():
+    """Fold the write-ahead log into the main database file and truncate it"""
+    conn = connect()
+    try:
+        return conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+    finally:
+        conn.close()
+
 def hash_password(password):
     """Hash a password using SHA-256"""
     return hashlib.sha256(password.encode()).hexdigest()
@@ -148,12 +380,14 @@ def get_user_by_id(user_id):
 
 def drop_all_users_and_data():
     """Drop all users and their associated data from the database"""
-    conn = sqlite3.connect(DATABASE_PATH, timeout=10.0)
+    conn = connect()
     cursor = conn.cursor()
     
     try:
         # Delete all data from all tables (order matters due to foreign keys)
         cursor.execute('DELETE FROM budgets')
+        cursor.execute('DELETE FROM merchant_categories')
+        cursor.execute('DELETE FROM merchant_rules')
         cursor.execute('DELETE FROM incomes')
         cursor.execute('DELETE FROM expenses')
         cursor.execute('DELETE FROM users')
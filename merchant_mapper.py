@@ -1,100 +1,400 @@
 import json
 import os
-from pathlib import Path
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 
+import database
+import metrics
+from database import get_db
+from merchant_matcher import KeywordAutomaton, MerchantIndex
+
+# Legacy JSON mapping files, imported into the database once by init_merchant_store()
 MERCHANT_CATEGORY_FILE_INCOME = 'data/merchant_category_income.json'
 MERCHANT_CATEGORY_FILE_EXPENSES = 'data/merchant_category_expenses.json'
 
+# Mappings and rules are layered: each user has their own rows, and rows under
+# GLOBAL_USER_ID are a shared layer consulted when the user's own layer has no match
+GLOBAL_USER_ID = database.GLOBAL_USER_ID
+
+# Process-level LRU cache of per-user layers:
+# (database, kind, user_id, transaction_type) -> (revision, value), kind being 'merchants'
+# (dict) or 'rules' (compiled KeywordAutomaton). Revision tokens change on every
+# write to that user's rows, from any process, so a cached layer is reused
+# until the underlying rows actually change.
+MERCHANT_CACHE_SIZE = 1024
+_merchant_cache = OrderedDict()
+_merchant_cache_lock = threading.Lock()
+
+# The revision tokens are re-read from the database at most this often, so
+# mappings written by other processes show up within that time; writes in
+# this process drop the held tokens at once
+MERCHANT_REVISION_CHECK_SECONDS = 5
+# (database, transaction_type, layer ids) -> ({(kind, user_id): revision}, monotonic time read)
+_revision_checks = {}
+
+# Fuzzy-match indexes built from a cached mapping snapshot, evicted with it:
+# (database, 'merchants', user_id, transaction_type) -> (merchants snapshot, MerchantIndex)
+_index_cache = {}
+
+_REVISION_TABLES = {
+    'merchants': 'merchant_category_revisions',
+    'rules': 'merchant_rule_revisions',
+}
+
+def _normalize_type(transaction_type):
+    return 'income' if transaction_type == 'income' else 'expenses'
+
+def _layer_id(user_id):
+    return GLOBAL_USER_ID if user_id is None else int(user_id)
+
 def _get_merchant_file(transaction_type):
-    """Get the appropriate merchant file path based on transaction type"""
+    """Get the legacy merchant file path based on transaction type"""
     if transaction_type == 'income':
         return MERCHANT_CATEGORY_FILE_INCOME
     else:
         return MERCHANT_CATEGORY_FILE_EXPENSES
 
-def _ensure_merchant_file_exists(transaction_type='expenses'):
+def _get_revisions(cursor, transaction_type, layer_ids):
+    """Return {(kind, user_id): revision} for the given layers"""
+    placeholders = ', '.join('?' * len(layer_ids))
+    queries = [
+        f"SELECT '{kind}' AS kind, user_id, revision FROM {table} "
+        f"WHERE transaction_type = ? AND user_id IN ({placeholders})"
+        for kind, table in _REVISION_TABLES.items()
+    ]
+    params = [transaction_type, *layer_ids] * len(queries)
+    cursor.execute(' UNION ALL '.join(queries), params)
+    return {(row['kind'], row['user_id']): row['revision'] for row in cursor.fetchall()}
+
+def _load_merchants(cursor, layer_id, transaction_type):
+    cursor.execute(
+        'SELECT merchant, category FROM merchant_categories WHERE user_id = ? AND transaction_type = ?',
+        (layer_id, transaction_type)
+    )
+    return {row['merchant']: row['category'] for row in cursor.fetchall()}
+
+def _load_rules(cursor, layer_id, transaction_type):
+    cursor.execute(
+        'SELECT keyword, category, priority FROM merchant_rules WHERE user_id = ? AND transaction_type = ?',
+        (layer_id, transaction_type)
+    )
+    return KeywordAutomaton((row['keyword'], row['category'], row['priority']) for row in cursor.fetchall())
+
+_LOADERS = {'merchants': _load_merchants, 'rules': _load_rules}
+
+def _cache_key(kind, layer_id, transaction_type):
+    return (database.database_path(), kind, layer_id, transaction_type)
+
+def _cache_get(cache_key, revision):
+    with _merchant_cache_lock:
+        cached = _merchant_cache.get(cache_key)
+        if cached is None or cached[0] != revision:
+            metrics.CACHE_MISSES.inc(cache='merchant_mappings')
+            return None
+        _merchant_cache.move_to_end(cache_key)
+    metrics.CACHE_HITS.inc(cache='merchant_mappings')
+    return cached[1]
+
+def _cache_put(cache_key, revision, value):
+    with _merchant_cache_lock:
+        _merchant_cache[cache_key] = (revision, value)
+        _merchant_cache.move_to_end(cache_key)
+        while len(_merchant_cache) > MERCHANT_CACHE_SIZE:
+            evicted, _ = _merchant_cache.popitem(last=False)
+            _index_cache.pop(evicted, None)
+            metrics.CACHE_EVICTIONS.inc(cache='merchant_mappings')
+
+def _cache_metrics():
+    return [('cache_entries', 'gauge', 'Entries held by a cache.', [
+        ({'cache': 'merchant_mappings'}, len(_merchant_cache)),
+        ({'cache': 'merchant_indexes'}, len(_index_cache)),
+    ])]
+
+metrics.register_collector(_cache_metrics)
+
+def _held_layers(transaction_type, layer_ids, revisions):
+    """The cached layers if all of them match `revisions`, else None"""
+    layers = []
+    with _merchant_cache_lock:
+        for layer in layer_ids:
+            values = {}
+            for kind in _LOADERS:
+                cached = _merchant_cache.get(_cache_key(kind, layer, transaction_type))
+                if cached is None or cached[0] != revisions.get((kind, layer), 0):
+                    return None
+                values[kind] = cached[1]
+            layers.append((values['merchants'], values['rules'], _cache_key('merchants', layer, transaction_type)))
+    metrics.CACHE_HITS.inc(len(layer_ids) * len(_LOADERS), cache='merchant_mappings')
+    return layers
+
+def _get_layers(transaction_type, user_id=None):
     """
-    Ensure merchant category file exists. If not, create it with empty dict.
-    This is called automatically when files are needed.
+    Return the (merchants, rules, index_key) layers to match against, the
+    user's own first and the shared layer last. Layers come from the cache
+    unless their revision token changed; the tokens are re-read at most every
+    MERCHANT_REVISION_CHECK_SECONDS, and layers to load are all read over one
+    connection. The merchant dicts are shared snapshots and must not be
+    mutated by callers.
     """
-    merchant_file = _get_merchant_file(transaction_type)
-    
-    # If file already exists, nothing to do
-    if os.path.exists(merchant_file):
-        return
-    
-    # Create directory if it doesn't exist
-    os.makedirs(os.path.dirname(merchant_file), exist_ok=True)
-    
-    # Create empty merchant categories file
+    transaction_type = _normalize_type(transaction_type)
+    layer_id = _layer_id(user_id)
+    layer_ids = (layer_id,) if layer_id == GLOBAL_USER_ID else (layer_id, GLOBAL_USER_ID)
+
+    check_key = (database.database_path(), transaction_type, layer_ids)
+    now = time.monotonic()
+    checked = _revision_checks.get(check_key)
+    if checked is not None and now - checked[1] < MERCHANT_REVISION_CHECK_SECONDS:
+        layers = _held_layers(transaction_type, layer_ids, checked[0])
+        if layers is not None:
+            return layers
+
+    layers = []
     try:
-        with open(merchant_file, 'w') as f:
-            json.dump({}, f, indent=4)
-    except IOError as e:
-        print(f"Error creating merchant categories file {merchant_file}: {e}")
+        with get_db() as conn:
+            cursor = conn.cursor()
+            revisions = _get_revisions(cursor, transaction_type, layer_ids)
+            _revision_checks[check_key] = (revisions, now)
+            for layer in layer_ids:
+                values = {}
+                for kind, load in _LOADERS.items():
+                    cache_key = _cache_key(kind, layer, transaction_type)
+                    revision = revisions.get((kind, layer), 0)
+                    value = _cache_get(cache_key, revision)
+                    if value is None:
+                        value = load(cursor, layer, transaction_type)
+                        _cache_put(cache_key, revision, value)
+                    values[kind] = value
+                layers.append((values['merchants'], values['rules'], _cache_key('merchants', layer, transaction_type)))
+    except sqlite3.OperationalError:
+        return []
+    return layers
 
-def load_merchant_categories(transaction_type='expenses'):
+def _get_cached_merchants(transaction_type, user_id=None):
+    """Return the cached merchant dict of one layer (shared snapshot, do not mutate)"""
+    layers = _get_layers(transaction_type, user_id)
+    return layers[0][0] if layers else {}
+
+def _get_merchant_index(index_key, merchants):
+    """Return the fuzzy-match index for a mapping snapshot, building it once"""
+    cached = _index_cache.get(index_key)
+    if cached is not None and cached[0] is merchants:
+        return cached[1]
+    index = MerchantIndex(merchants)
+    with _merchant_cache_lock:
+        if index_key in _merchant_cache:
+            _index_cache[index_key] = (merchants, index)
+    return index
+
+def _match(description, layers):
     """
-    Load merchant category mappings from JSON file.
-    If file doesn't exist, it will be created automatically.
+    Resolve a description layer by layer (the user's own, then the shared
+    one): exact merchant mapping first, then keyword rules, then the
+    normalized/fuzzy merchant index
+    """
+    if not description:
+        return None
+    for merchants, rules, index_key in layers:
+        category = merchants.get(description)
+        if category is None and rules:
+            category = rules.match(description)
+        if category is None and merchants:
+            category = _get_merchant_index(index_key, merchants).match(description)
+        if category is not None:
+            return category
+    return None
+
+def clear_merchant_cache():
+    """Drop all cached merchant mappings (they are re-read on next use)"""
+    with _merchant_cache_lock:
+        _merchant_cache.clear()
+        _index_cache.clear()
+        _revision_checks.clear()
+
+def _invalidate(cache_key):
+    with _merchant_cache_lock:
+        _merchant_cache.pop(cache_key, None)
+        _index_cache.pop(cache_key, None)
+        _revision_checks.clear()
+
+def load_merchant_categories(transaction_type='expenses', user_id=None):
     """
+    Load the merchant category mappings of one layer: the user's own, or the
+    shared layer if user_id is None.
+    Returns a copy of the cached mappings that the caller may modify.
+    """
+    return dict(_get_cached_merchants(transaction_type, user_id))
+
+def save_merchant_categories(merchant_dict, transaction_type='expenses', user_id=None):
+    """Replace all merchant category mappings of a transaction type in one layer"""
+    transaction_type = _normalize_type(transaction_type)
+    layer_id = _layer_id(user_id)
+    try:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'DELETE FROM merchant_categories WHERE user_id = ? AND transaction_type = ?',
+                (layer_id, transaction_type)
+            )
+            cursor.executemany(
+                'INSERT INTO merchant_categories (user_id, transaction_type, merchant, category) VALUES (?, ?, ?, ?)',
+                [(layer_id, transaction_type, merchant, category) for merchant, category in merchant_dict.items()]
+            )
+    except sqlite3.Error as e:
+        print(f"Error saving merchant categories: {e}")
+    finally:
+        _invalidate(_cache_key('merchants', layer_id, transaction_type))
+
+def _import_json_file(cursor, transaction_type):
+    """Import a legacy JSON mapping file once, then rename it out of the way"""
     merchant_file = _get_merchant_file(transaction_type)
-    
-    # Ensure file exists before trying to load
-    _ensure_merchant_file_exists(transaction_type)
-    
     if not os.path.exists(merchant_file):
-        return {}
-    
+        return 0
+
     try:
         with open(merchant_file, 'r') as f:
             data = json.load(f)
-            return data if isinstance(data, dict) else {}
-    except (json.JSONDecodeError, IOError):
-        # If file is corrupted, return empty dict
-        return {}
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Skipping unreadable merchant categories file {merchant_file}: {e}")
+        os.replace(merchant_file, merchant_file + '.invalid')
+        return 0
 
-def save_merchant_categories(merchant_dict, transaction_type='expenses'):
-    """Save merchant category mappings to JSON file"""
-    merchant_file = _get_merchant_file(transaction_type)
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(merchant_file), exist_ok=True)
-    
-    try:
-        with open(merchant_file, 'w') as f:
-            json.dump(merchant_dict, f, indent=4)
-    except IOError as e:
-        print(f"Error saving merchant categories: {e}")
+    rows = [(GLOBAL_USER_ID, transaction_type, merchant, category)
+            for merchant, category in (data.items() if isinstance(data, dict) else [])
+            if merchant and category]
+    # The files were shared by all users, so they become the shared layer.
+    # Mappings already in the database are newer than the file, so they win
+    cursor.executemany(
+        '''INSERT INTO merchant_categories (user_id, transaction_type, merchant, category) VALUES (?, ?, ?, ?)
+           ON CONFLICT (user_id, transaction_type, merchant) DO NOTHING''',
+        rows
+    )
+    os.replace(merchant_file, merchant_file + '.migrated')
+    return len(rows)
 
-def ensure_merchant_files_exist():
+def init_merchant_store():
     """
-    Ensure both merchant category files exist.
-    Called during app initialization.
+    Ensure the merchant category and keyword rule tables exist and import any
+    legacy JSON mapping files. Called during app initialization.
     """
-    _ensure_merchant_file_exists('expenses')
-    _ensure_merchant_file_exists('income')
+    with get_db() as conn:
+        cursor = conn.cursor()
+        database.init_merchant_categories_table(cursor)
+        database.init_merchant_rules_table(cursor)
+        for transaction_type in ('expenses', 'income'):
+            _import_json_file(cursor, transaction_type)
+    clear_merchant_cache()
 
-def update_merchant_category(merchant_name, category, transaction_type='expenses'):
-    """Update or add a merchant category mapping"""
+# Kept for callers written against the JSON-file store
+ensure_merchant_files_exist = init_merchant_store
+
+def update_merchant_category(merchant_name, category, transaction_type='expenses', user_id=None):
+    """Update or add a merchant category mapping in the user's layer"""
     if not merchant_name or not category:
         return
-    
-    merchants = load_merchant_categories(transaction_type)
-    merchants[merchant_name] = category
-    save_merchant_categories(merchants, transaction_type)
 
-def get_category_for_merchant(merchant_name, transaction_type='expenses'):
-    """Get the category for a merchant, returns None if not found"""
+    transaction_type = _normalize_type(transaction_type)
+    layer_id = _layer_id(user_id)
+    try:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''INSERT INTO merchant_categories (user_id, transaction_type, merchant, category) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (user_id, transaction_type, merchant)
+                   DO UPDATE SET category = excluded.category, updated_at = CURRENT_TIMESTAMP''',
+                (layer_id, transaction_type, merchant_name, category)
+            )
+    finally:
+        _invalidate(_cache_key('merchants', layer_id, transaction_type))
+
+def get_category_for_merchant(merchant_name, transaction_type='expenses', user_id=None):
+    """
+    Get the category for a merchant from the user's mappings, falling back to
+    the shared ones; returns None if not found
+    """
     if not merchant_name:
         return None
-    
-    merchants = load_merchant_categories(transaction_type)
-    return merchants.get(merchant_name)
 
-def auto_categorize_transaction(description, transaction_type='expenses'):
+    for merchants, _, _ in _get_layers(transaction_type, user_id):
+        category = merchants.get(merchant_name)
+        if category is not None:
+            return category
+    return None
+
+def add_keyword_rule(keyword, category, transaction_type='expenses', priority=0, user_id=None):
+    """
+    Add or update a rule categorizing every description that contains
+    `keyword` (case-insensitive). Higher priorities win when several match.
+    """
+    if not keyword or not category:
+        return
+
+    transaction_type = _normalize_type(transaction_type)
+    layer_id = _layer_id(user_id)
+    try:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''INSERT INTO merchant_rules (user_id, transaction_type, keyword, category, priority)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (user_id, transaction_type, keyword)
+                   DO UPDATE SET category = excluded.category, priority = excluded.priority''',
+                (layer_id, transaction_type, keyword.casefold(), category, priority)
+            )
+    finally:
+        _invalidate(_cache_key('rules', layer_id, transaction_type))
+
+def remove_keyword_rule(keyword, transaction_type='expenses', user_id=None):
+    """Delete a keyword rule; returns True if it existed"""
+    transaction_type = _normalize_type(transaction_type)
+    layer_id = _layer_id(user_id)
+    try:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'DELETE FROM merchant_rules WHERE user_id = ? AND transaction_type = ? AND keyword = ?',
+                (layer_id, transaction_type, (keyword or '').casefold())
+            )
+            return cursor.rowcount > 0
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        _invalidate(_cache_key('rules', layer_id, transaction_type))
+
+def load_keyword_rules(transaction_type='expenses', user_id=None):
+    """Return the keyword rules of one layer as dicts, highest priority first"""
+    try:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''SELECT keyword, category, priority FROM merchant_rules
+                   WHERE user_id = ? AND transaction_type = ?
+                   ORDER BY priority DESC, keyword''',
+                (_layer_id(user_id), _normalize_type(transaction_type))
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    except sqlite3.OperationalError:
+        return []
+
+def categorize_many(descriptions, transaction_type='expenses', user_id=None):
+    """
+    Categorize a batch of transaction descriptions against one snapshot of
+    the user's and the shared mappings. Repeated merchants are resolved once.
+    Returns a list of categories (None where no mapping matched) in input order.
+    """
+    layers = _get_layers(transaction_type, user_id)
+    resolved = {description: _match(description, layers) for description in set(descriptions)}
+    return [resolved[description] for description in descriptions]
+
+def auto_categorize_transaction(description, transaction_type='expenses', user_id=None):
     """
     Auto-categorize a transaction based on merchant name.
+    Descriptions without an exact mapping are matched against the keyword
+    rules (e.g. "contains UBER"), then fall back to the closest known
+    merchant after normalization (e.g. "TESCO STORES 4410" matches a
+    mapping for "TESCO STORES 2231"). The user's own mappings and rules are
+    tried first, then the shared ones.
     Returns the category if found, None otherwise.
     """
-    return get_category_for_merchant(description, transaction_type)
+    return _match(description, _get_layers(transaction_type, user_id))
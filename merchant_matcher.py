@@ -0,0 +1,187 @@
+import math
+import re
+from collections import defaultdict, deque
+
+# Minimum trigram similarity (Dice coefficient, 0..1) for a fuzzy match
+MATCH_THRESHOLD = 0.7
+
+# Payment processor prefixes, e.g. "SQ *BLUE BOTTLE" or "PAYPAL *SPOTIFY"
+_PROCESSOR_PREFIX = re.compile(r'^(?:sq|sumup|zettle|izettle|paypal|pp|crv|tst|sp)\s*\*\s*')
+_DATE = re.compile(r'(?<!\w)\d{1,4}[./-]\d{1,2}(?:[./-]\d{2,4})?(?!\w)')
+# Masked card numbers: "CARD 1234", "****1234", "XXXX1234"
+_CARD = re.compile(r'(?:\bcard\b|\*{2,}|\bx{4,})\s*\d{4}\b')
+# Store, terminal and reference numbers standing on their own ("#2231", "2231")
+_NUMBER = re.compile(r'(?<![\w-])#?\d+(?![\w-])')
+_SEPARATORS = re.compile(r'[^\w&]+')
+
+
+def normalize_merchant(description):
+    """
+    Reduce a transaction description to a canonical merchant name:
+    case-folded, without processor prefixes, dates, card suffixes and store
+    numbers, so "TESCO STORES 2231" and "Tesco Stores #4410" both become
+    "tesco stores".
+    """
+    if not description:
+        return ''
+    text = description.casefold().strip()
+    text = _PROCESSOR_PREFIX.sub('', text)
+    text = _DATE.sub(' ', text)
+    text = _CARD.sub(' ', text)
+    text = _NUMBER.sub(' ', text)
+    text = ' '.join(_SEPARATORS.sub(' ', text).split())
+    return text or description.casefold().strip()
+
+
+def _trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MerchantIndex:
+    """
+    Immutable lookup structure over known merchant mappings.
+    Normalized names are matched exactly first; otherwise candidates are
+    drawn from a trigram inverted index using prefix filtering: a merchant
+    that can reach the threshold must share one of the query's rarest
+    trigrams, so the long posting lists of common trigrams are never walked.
+    """
+
+    def __init__(self, merchants, threshold=MATCH_THRESHOLD):
+        self.threshold = threshold
+        self._exact = {}
+        self._names = []
+        self._categories = []
+        self._grams = []
+        self._postings = defaultdict(list)
+
+        for merchant, category in merchants.items():
+            name = normalize_merchant(merchant)
+            if not name or name in self._exact:
+                continue
+            self._exact[name] = category
+            entry = len(self._names)
+            grams = _trigrams(name)
+            self._names.append(name)
+            self._categories.append(category)
+            self._grams.append(frozenset(grams))
+            for gram in grams:
+                self._postings[gram].append(entry)
+
+    def __len__(self):
+        return len(self._names)
+
+    def best_match(self, description):
+        """Return (merchant_name, category, score) of the best match, or None"""
+        name = normalize_merchant(description)
+        if not name:
+            return None
+        category = self._exact.get(name)
+        if category is not None:
+            return name, category, 1.0
+
+        grams = _trigrams(name)
+        postings = self._postings
+        query_size = len(grams)
+        # Dice >= t needs an overlap of at least t * |q| / (2 - t) trigrams
+        min_overlap = max(1, math.ceil(self.threshold * query_size / (2 - self.threshold)))
+        rarest = sorted(grams, key=lambda gram: len(postings.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:query_size - min_overlap + 1]:
+            candidates.update(postings.get(gram, ()))
+        if not candidates:
+            return None
+
+        # Merchants whose length alone rules out reaching the threshold are skipped
+        max_size = query_size * (2 - self.threshold) / self.threshold
+        entry_grams = self._grams
+        best_entry, best_score = None, 0.0
+        for entry in candidates:
+            other = entry_grams[entry]
+            if not min_overlap <= len(other) <= max_size:
+                continue
+            score = 2.0 * len(grams & other) / (query_size + len(other))
+            if score > best_score:
+                best_entry, best_score = entry, score
+
+        if best_score < self.threshold:
+            return None
+        return self._names[best_entry], self._categories[best_entry], best_score
+
+    def match(self, description):
+        """Return the category of the best match above the threshold, or None"""
+        result = self.best_match(description)
+        return result[1] if result else None
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over keyword rules (keyword, category, priority).
+    A description is scanned once, character by character, whatever the
+    number of keywords. Matching is case-insensitive substring matching;
+    among matching rules the highest priority wins, then the longest
+    keyword, then the earliest occurrence.
+    """
+
+    def __init__(self, rules=()):
+        self._goto = [{}]
+        self._fail = [0]
+        # Best rule ending at each state, including those reachable through
+        # failure links: ((priority, keyword length), category)
+        self._best = [None]
+
+        for keyword, category, priority in rules:
+            keyword = (keyword or '').casefold()
+            if not keyword or not category:
+                continue
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                    self._goto[state][char] = next_state
+                state = next_state
+            candidate = ((priority, len(keyword)), category)
+            if self._best[state] is None or candidate[0] > self._best[state][0]:
+                self._best[state] = candidate
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        goto, fail, best = self._goto, self._fail, self._best
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in goto[state].items():
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(char, 0)
+                # States are visited breadth-first, so the failure target
+                # already carries the best rule of its own suffixes
+                inherited = best[fail[child]]
+                if inherited is not None and (best[child] is None or inherited[0] > best[child][0]):
+                    best[child] = inherited
+                queue.append(child)
+
+    def __bool__(self):
+        return len(self._goto) > 1
+
+    def match(self, text):
+        """Return the category of the winning rule found in text, or None"""
+        if not text or len(self._goto) == 1:
+            return None
+        goto, fail, states_best = self._goto, self._fail, self._best
+        state = 0
+        best = None
+        for char in text.casefold():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            candidate = states_best[state]
+            if candidate is not None and (best is None or candidate[0] > best[0]):
+                best = candidate
+        return best[1] if best else None
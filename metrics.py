@@ -0,0 +1,169 @@
+"""
+In-process metrics, served in the Prometheus text format by /metrics.
+Counters and histograms are updated without locks: each thread adds to its
+own shard and a scrape sums the shards (a finished thread's counts are
+folded into a shared total). Gauges are read from their modules by
+collectors at scrape time. Every process, e.g. each gunicorn worker,
+reports its own counts.
+"""
+import math
+import threading
+import weakref
+from bisect import bisect_left
+from collections import defaultdict
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PREFIX = 'budget_tracker_'
+# Upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = {}
+_collectors = []
+
+_local = threading.local()
+_shards = []
+_retired = defaultdict(float)
+_shards_lock = threading.Lock()
+
+
+def _retire(shard):
+    with _shards_lock:
+        _shards[:] = [s for s in _shards if s is not shard]
+        for key, value in shard.items():
+            _retired[key] += value
+
+
+def _shard():
+    """This thread's counts, created and registered on first use"""
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = defaultdict(float)
+        with _shards_lock:
+            _shards.append(shard)
+        weakref.finalize(threading.current_thread(), _retire, shard)
+        return shard
+
+
+def _totals():
+    with _shards_lock:
+        # dict.copy() is atomic, so a shard can be read while its thread writes
+        shards = [shard.copy() for shard in _shards]
+        totals = defaultdict(float, _retired)
+    for shard in shards:
+        for key, value in shard.items():
+            totals[key] += value
+    return totals
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = PREFIX + name
+        self.help = help
+
+    def inc(self, amount=1, **labels):
+        _shard()[(self.name, _labels(labels))] += amount
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        shard = _shard()
+        key = _labels(labels)
+        # Non-cumulative bucket counts; a scrape accumulates them
+        shard[(self.name, key, bisect_left(self.buckets, value))] += 1
+        shard[(self.name, key, 'sum')] += value
+
+
+def counter(name, help):
+    """Declare a counter (name without the budget_tracker_ prefix)"""
+    return _metrics.setdefault(PREFIX + name, Counter(name, help))
+
+
+def histogram(name, help, buckets=LATENCY_BUCKETS):
+    """Declare a histogram (name without the budget_tracker_ prefix)"""
+    return _metrics.setdefault(PREFIX + name, Histogram(name, help, buckets))
+
+
+def register_collector(collect):
+    """
+    Add a function called on every scrape that returns
+    [(name, type, help, [(labels dict, value), ...]), ...] for values kept
+    elsewhere, such as cache sizes
+    """
+    _collectors.append(collect)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value is None or math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _bound(bound):
+    return '+Inf' if bound is None else _format_value(bound)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    totals = _totals()
+    samples = defaultdict(list)
+    for key, value in totals.items():
+        samples[key[0]].append((key, value))
+
+    lines = []
+    for name, metric in _metrics.items():
+        kind = 'counter' if isinstance(metric, Counter) else 'histogram'
+        lines += [f'# HELP {name} {metric.help}', f'# TYPE {name} {kind}']
+        if kind == 'counter':
+            for (_, labels), value in sorted(samples[name]):
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            continue
+        series = defaultdict(dict)
+        for (_, labels, slot), value in samples[name]:
+            series[labels][slot] = value
+        for labels, slots in sorted(series.items()):
+            cumulative = 0
+            for index, bound in enumerate(metric.buckets + (None,)):
+                cumulative += slots.get(index, 0)
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", _bound(bound)),))} '
+                             f'{_format_value(cumulative)}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(slots.get("sum", 0.0))}')
+            lines.append(f'{name}_count{_format_labels(labels)} {_format_value(cumulative)}')
+
+    # Collectors may report parts of one family (e.g. the sizes of different caches)
+    families = {}
+    for collect in _collectors:
+        for name, kind, help, values in collect():
+            families.setdefault(PREFIX + name, (kind, help, []))[2].extend(values)
+    for name, (kind, help, values) in families.items():
+        lines += [f'# HELP {name} {help}', f'# TYPE {name} {kind}']
+        for labels, value in values:
+            lines.append(f'{name}{_format_labels(_labels(labels))} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# Shared by the caches of data_manager and merchant_mapper, labelled by cache
+CACHE_HITS = counter('cache_hits_total', 'Cache lookups served from the cache.')
+CACHE_MISSES = counter('cache_misses_total', 'Cache lookups that had to load the value (absent or outdated).')
+CACHE_EVICTIONS = counter('cache_evictions_total', 'Entries evicted to keep a cache within its size.')
@@ -1,7 +1,151 @@
 import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+import database
+import metrics
 from database import get_db
+from currency_converter import eur_rates
+
+TRANSACTION_TABLES = ('incomes', 'expenses')
+
+# Rows of a snapshot are immutable, so one snapshot can be shared by every
+# request (and thread) of the process that reads the same user's data
+TRANSACTION_FIELDS = 'id date description category amount currency fingerprint amount_eur eur_rate'
+Income = namedtuple('Income', TRANSACTION_FIELDS)
+Expense = namedtuple('Expense', TRANSACTION_FIELDS)
+Budget = namedtuple('Budget', 'category limit')
+Snapshot = namedtuple('Snapshot', 'incomes expenses budgets')
+
+# Users whose snapshots are kept in memory (least recently used are dropped)
+SNAPSHOT_CACHE_SIZE = 256
+
+# (database path, user_id) -> (revision, Snapshot)
+_snapshots = OrderedDict()
+_snapshots_lock = threading.Lock()
+
+# SQLite has a single writer anyway; writers of this process queue here
+# instead of retrying on the database lock
+_write_lock = threading.Lock()
+
+
+def eur_columns(entries):
+    """
+    (amount_eur, eur_rate) for each (amount, currency, date) entry, converted
+    at the rate convert_to_eur() applies on that date, with the rates resolved
+    in one batch; (None, None) for a currency without any known rate yet
+    """
+    if not entries:
+        return []
+    keys = [(currency or 'EUR', str(day)[:10] if day else None) for _, currency, day in entries]
+    rates = eur_rates(set(keys))
+    columns = []
+    for (amount, _, _), key in zip(entries, keys):
+        rate = rates[key]
+        columns.append((float(amount) / rate, rate) if rate else (None, None))
+    return columns
+
+
+def recompute_eur_amounts(missing_only=True):
+    """
+    Store the EUR equivalent of transactions at the rate of their date, for
+    rows that have none yet (the backfill of rows written before the column
+    existed or before their currency had a rate) or, with missing_only=False,
+    for all rows. Returns the number of rows updated.
+    """
+    updated = 0
+    with _write_lock, get_db() as conn:
+        cursor = conn.cursor()
+        for table in TRANSACTION_TABLES:
+            where = ' WHERE amount_eur IS NULL' if missing_only else ''
+            cursor.execute(f'SELECT id, amount, currency, date FROM {table}{where}')
+            rows = cursor.fetchall()
+            columns = eur_columns([(row['amount'], row['currency'], row['date']) for row in rows])
+            updates = [(amount_eur, rate, row['id']) for row, (amount_eur, rate) in zip(rows, columns) if rate]
+            cursor.executemany(f'UPDATE {table} SET amount_eur = ?, eur_rate = ? WHERE id = ?', updates)
+            updated += len(updates)
+    return updated
+
+
+def _snapshot_get(key, revision):
+    with _snapshots_lock:
+        cached = _snapshots.get(key)
+        if cached is None or cached[0] != revision:
+            metrics.CACHE_MISSES.inc(cache='snapshots')
+            return None
+        _snapshots.move_to_end(key)
+    metrics.CACHE_HITS.inc(cache='snapshots')
+    return cached[1]
+
+
+def _snapshot_put(key, revision, snapshot):
+    with _snapshots_lock:
+        _snapshots[key] = (revision, snapshot)
+        _snapshots.move_to_end(key)
+        while len(_snapshots) > SNAPSHOT_CACHE_SIZE:
+            _snapshots.popitem(last=False)
+            metrics.CACHE_EVICTIONS.inc(cache='snapshots')
+
+
+def _snapshot_metrics():
+    return [('cache_entries', 'gauge', 'Entries held by a cache.', [({'cache': 'snapshots'}, len(_snapshots))])]
+
+
+metrics.register_collector(_snapshot_metrics)
+
+
+def load_snapshot(user_id):
+    """
+    Immutable Snapshot of a user's incomes, expenses (most recent first) and
+    budgets. Snapshots are cached per process and reused until the user's
+    revision token changes, so most requests cost one primary-key lookup.
+    """
+    key = (database.database_path(), user_id)
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT revision FROM user_data_revisions WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        revision = row['revision'] if row else 0
+        snapshot = _snapshot_get(key, revision)
+        if snapshot is not None:
+            return snapshot
+
+        transactions = {}
+        for table, row_type in (('incomes', Income), ('expenses', Expense)):
+            cursor.execute(
+                f'SELECT {", ".join(row_type._fields)} FROM {table} WHERE user_id = ? ORDER BY date DESC',
+                (user_id,)
+            )
+            transactions[table] = tuple(row_type(*row) for row in cursor.fetchall())
+
+        cursor.execute('SELECT category, limit_amount FROM budgets WHERE user_id = ? ORDER BY id', (user_id,))
+        budgets = tuple(Budget(*row) for row in cursor.fetchall())
+
+    snapshot = Snapshot(transactions['incomes'], transactions['expenses'], budgets)
+    _snapshot_put(key, revision, snapshot)
+    return snapshot
+
+
+def _transaction_params(user_id, transactions):
+    """INSERT parameters of transactions, filling in missing EUR amounts"""
+    missing = [t for t in transactions if getattr(t, 'amount_eur', None) is None]
+    computed = dict(zip(map(id, missing), eur_columns(
+        [(getattr(t, 'amount'), getattr(t, 'currency', 'EUR'), getattr(t, 'date', None)) for t in missing])))
+    return [
+        (user_id, getattr(t, 'date'), getattr(t, 'description', ''), getattr(t, 'category'),
+         getattr(t, 'amount'), getattr(t, 'currency', 'EUR'), getattr(t, 'fingerprint', None),
+         *computed.get(id(t), (getattr(t, 'amount_eur', None), getattr(t, 'eur_rate', None))))
+        for t in transactions
+    ]
+
 
 class DataManager:
+    """
+    One user's data for the duration of a request. Reads come from a shared
+    immutable snapshot (the lists returned are this instance's own copies);
+    writes are single SQL statements, serialized in the process, after which
+    the instance reloads. Instances are not shared between threads.
+    """
+
     def __init__(self, user_id=None):
         self.user_id = user_id
         self._incomes = []
@@ -14,45 +158,24 @@ class DataManager:
         self.load()
 
     def load(self):
-        """Load user data from database"""
+        """Load user data from the (cached) snapshot"""
         if not self.user_id:
             return
         
-        with get_db() as conn:
-            cursor = conn.cursor()
-            
-            # Load incomes
-            cursor.execute(
-                'SELECT date, description, category, amount, currency FROM incomes WHERE user_id = ? ORDER BY date DESC',
-                (self.user_id,)
-            )
-            self._incomes = [type('Income', (), dict(row)) for row in cursor.fetchall()]
-            
-            # Load expenses
-            cursor.execute(
-                'SELECT date, description, category, amount, currency FROM expenses WHERE user_id = ? ORDER BY date DESC',
-                (self.user_id,)
-            )
-            self._expenses = [type('Expense', (), dict(row)) for row in cursor.fetchall()]
-            
-            # Load budgets
-            cursor.execute(
-                'SELECT category, limit_amount FROM budgets WHERE user_id = ?',
-                (self.user_id,)
-            )
-            # Manually map limit_amount to 'limit' attribute for backward compatibility
-            self._budgets = []
-            for row in cursor.fetchall():
-                budget_dict = dict(row)
-                budget_dict['limit'] = budget_dict.pop('limit_amount')
-                self._budgets.append(type('Budget', (), budget_dict))
+        snapshot = load_snapshot(self.user_id)
+        self._incomes = list(snapshot.incomes)
+        self._expenses = list(snapshot.expenses)
+        self._budgets = list(snapshot.budgets)
 
     def save(self):
-        """Save user data to database"""
+        """Replace all of the user's rows in the database with the in-memory lists"""
         if not self.user_id:
             return
         
-        with get_db() as conn:
+        transactions = {table: _transaction_params(self.user_id, rows)
+                        for table, rows in (('incomes', self._incomes), ('expenses', self._expenses))}
+        
+        with _write_lock, get_db() as conn:
             cursor = conn.cursor()
             
             # Clear existing data for this user
@@ -60,20 +183,13 @@ class DataManager:
             cursor.execute('DELETE FROM expenses WHERE user_id = ?', (self.user_id,))
             cursor.execute('DELETE FROM budgets WHERE user_id = ?', (self.user_id,))
             
-            # Save incomes
-            for income in self._incomes:
-                cursor.execute(
-                    'INSERT INTO incomes (user_id, date, description, category, amount, currency) VALUES (?, ?, ?, ?, ?, ?)',
-                    (self.user_id, getattr(income, 'date'), getattr(income, 'description', ''),
-                     getattr(income, 'category'), getattr(income, 'amount'), getattr(income, 'currency', 'EUR'))
-                )
-            
-            # Save expenses
-            for expense in self._expenses:
-                cursor.execute(
-                    'INSERT INTO expenses (user_id, date, description, category, amount, currency) VALUES (?, ?, ?, ?, ?, ?)',
-                    (self.user_id, getattr(expense, 'date'), getattr(expense, 'description', ''),
-                     getattr(expense, 'category'), getattr(expense, 'amount'), getattr(expense, 'currency', 'EUR'))
+            # Save incomes and expenses
+            for table, params in transactions.items():
+                cursor.executemany(
+                    f'''INSERT INTO {table} (user_id, date, description, category, amount, currency, fingerprint,
+                                            amount_eur, eur_rate)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                    params
                 )
             
             # Save budgets
@@ -82,8 +198,80 @@ class DataManager:
                     'INSERT INTO budgets (user_id, category, limit_amount) VALUES (?, ?, ?)',
                     (self.user_id, getattr(budget, 'category'), getattr(budget, 'limit'))
                 )
-            
-            conn.commit()
+        
+        self.load()
+
+    def add_transactions(self, incomes=(), expenses=(), reload=True):
+        """
+        Bulk-insert new transactions without rewriting the user's existing rows.
+        Entries are dicts with date, description, category, amount, currency and
+        an optional fingerprint; entries whose fingerprint the user already has
+        are skipped by SQLite. Returns the number of rows actually inserted.
+        Pass reload=False when inserting several batches and call load() once.
+        """
+        if not self.user_id or not (incomes or expenses):
+            return 0
+
+        rows = {}
+        for table, entries in (('incomes', incomes), ('expenses', expenses)):
+            if entries:
+                columns = eur_columns([(e['amount'], e.get('currency', 'EUR'), e['date']) for e in entries])
+                rows[table] = [(self.user_id, e['date'], e.get('description', ''), e['category'], e['amount'],
+                                e.get('currency', 'EUR'), e.get('fingerprint'), amount_eur, rate)
+                               for e, (amount_eur, rate) in zip(entries, columns)]
+
+        inserted = 0
+        with _write_lock, get_db() as conn:
+            cursor = conn.cursor()
+            for table, params in rows.items():
+                cursor.executemany(
+                    f'''INSERT INTO {table} (user_id, date, description, category, amount, currency, fingerprint,
+                                            amount_eur, eur_rate)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (user_id, fingerprint) DO NOTHING''',
+                    params
+                )
+                inserted += cursor.rowcount
+
+        if reload:
+            self.load()
+        return inserted
+
+    def _write(self, statement, params):
+        """Run one write statement for this user and reload; returns the rows changed"""
+        if not self.user_id:
+            return 0
+        with _write_lock, get_db() as conn:
+            changed = conn.execute(statement, params).rowcount
+        self.load()
+        return changed
+
+    def delete_transaction(self, table, transaction_id):
+        """Delete one of the user's incomes or expenses by id"""
+        if table not in TRANSACTION_TABLES:
+            raise ValueError(f"Unknown transaction table: {table}")
+        return self._write(f'DELETE FROM {table} WHERE user_id = ? AND id = ?', (self.user_id, transaction_id))
+
+    def set_category(self, table, description, category):
+        """Recategorize all of the user's incomes or expenses with this description"""
+        if table not in TRANSACTION_TABLES:
+            raise ValueError(f"Unknown transaction table: {table}")
+        return self._write(
+            f'UPDATE {table} SET category = ? WHERE user_id = ? AND description IS ?',
+            (category, self.user_id, description)
+        )
+
+    def set_budget(self, category, limit):
+        """Create or update the user's budget limit for a category"""
+        return self._write(
+            '''INSERT INTO budgets (user_id, category, limit_amount) VALUES (?, ?, ?)
+               ON CONFLICT (user_id, category) DO UPDATE SET limit_amount = excluded.limit_amount''',
+            (self.user_id, category, limit)
+        )
+
+    def delete_budget(self, category):
+        """Delete the user's budget for a category"""
+        return self._write('DELETE FROM budgets WHERE user_id = ? AND category = ?', (self.user_id, category))
 
     def get_incomes(self):
         return self._incomes
@@ -92,4 +280,4 @@ class DataManager:
         return self._expenses
 
     def get_budgets(self):
-        return getattr(self, '_budgets', [])
\ No newline at end of file
+        return getattr(self, '_budgets', [])
@@ -25,6 +25,12 @@ def remove_file_if_exists(filepath):
         print(f"[ERROR] Error removing {filepath}: {e}")
 
 
+def remove_database_files():
+    """Remove the database together with its write-ahead log files"""
+    for suffix in ('', '-wal', '-shm'):
+        remove_file_if_exists(DATABASE_PATH + suffix)
+
+
 def ensure_data_directory():
     try:
         if not os.path.exists(DATA_DIR):
@@ -64,7 +70,7 @@ def reset_database():
         if os.path.exists(DATABASE_PATH):
             if is_database_corrupted():
                 print("[WARNING] Database appears corrupted, rebuilding...")
-                remove_file_if_exists(DATABASE_PATH)
+                remove_database_files()
             else:
                 # Database is valid, just clear the data
                 try:
@@ -74,7 +80,7 @@ def reset_database():
                 except Exception as e:
                     print(f"[WARNING] Could not clear data cleanly: {e}")
                     print("[WARNING] Rebuilding database instead...")
-                    remove_file_if_exists(DATABASE_PATH)
+                    remove_database_files()
         
         # Initialize fresh database
         database.init_db()
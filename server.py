@@ -0,0 +1,74 @@
+"""
+Production serving with gunicorn: a pre-forking server whose master imports
+the app once (preload), so workers start with the code already loaded.
+gunicorn is only needed for this mode and is imported when it starts.
+"""
+import os
+
+DEFAULT_BIND = '127.0.0.1:5002'
+# Threads per worker; requests mostly wait on SQLite reads and template rendering
+DEFAULT_THREADS = 4
+# Seconds an idle keep-alive connection is held open
+DEFAULT_KEEPALIVE = 5
+# Seconds a worker may spend on one request before it is restarted
+DEFAULT_TIMEOUT = 30
+# Seconds workers get to finish in-flight requests on reload (HUP) or shutdown
+DEFAULT_GRACEFUL_TIMEOUT = 30
+
+
+class ServerUnavailable(RuntimeError):
+    """The production server cannot run in this environment"""
+
+
+def default_workers():
+    """One worker process per CPU core"""
+    return os.cpu_count() or 1
+
+
+def post_fork(server, worker):
+    # Threads do not survive fork(), so each worker starts its own rate
+    # refresher; workers skip the fetch when another one stored fresh rates.
+    # A fetch the master had in flight at the fork is forgotten by the
+    # converter's at-fork hook, so the refresher does not wait on it.
+    from currency_converter import start_rate_refresher
+    start_rate_refresher()
+
+
+def server_options(bind=DEFAULT_BIND, workers=None, threads=DEFAULT_THREADS, keepalive=DEFAULT_KEEPALIVE,
+                   timeout=DEFAULT_TIMEOUT, graceful_timeout=DEFAULT_GRACEFUL_TIMEOUT):
+    """gunicorn settings for serving the app"""
+    return {
+        'bind': bind,
+        'workers': workers or default_workers(),
+        'worker_class': 'gthread',
+        'threads': threads,
+        'keepalive': keepalive,
+        'timeout': timeout,
+        'graceful_timeout': graceful_timeout,
+        'preload_app': True,
+        'post_fork': post_fork,
+    }
+
+
+def run(app, **options):
+    """
+    Serve `app` until the master is stopped. Send HUP to the master to
+    replace the workers gracefully; with the app preloaded, code changes
+    need a restart of the master.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise ServerUnavailable('The production server needs gunicorn: pip install gunicorn') from None
+
+    settings = server_options(**options)
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    Server().run()
@@ -5,7 +5,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app import app as flask_app
+from app import app as flask_app, create_app
 from models.data_manager import DataManager
 import database
 
@@ -54,6 +54,13 @@ def app():
     flask_app.config['SECRET_KEY'] = 'test_secret_key'
     yield flask_app
 
+@pytest.fixture
+def make_app(tmp_path):
+    """Build apps on their own database under tmp_path: make_app('name.db', **config)"""
+    def make(name='app.db', **config):
+        return create_app({'DATABASE_PATH': str(tmp_path / name), 'TESTING': True, **config})
+    return make
+
 @pytest.fixture
 def client(app):
     return app.test_client()
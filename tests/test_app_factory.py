@@ -0,0 +1,41 @@
+import os
+from flask import url_for
+
+
+def test_create_app_does_not_touch_database(make_app):
+    """Test building an app leaves the database alone until the first request."""
+    app = make_app('lazy/budget.db')
+    db_path = app.config['DATABASE_PATH']
+
+    assert not os.path.exists(db_path)
+
+    response = app.test_client().get('/login')
+
+    assert response.status_code == 200
+    assert os.path.exists(db_path)
+
+
+def test_apps_on_separate_databases(make_app):
+    """Test two apps in one process keep their users and data apart."""
+    first = make_app('first.db').test_client()
+    second = make_app('second.db').test_client()
+
+    for client, description in ((first, 'First shop'), (second, 'Second shop')):
+        client.post('/signup', data={'username': 'sameuser', 'password': 'pass1234',
+                                     'confirm_password': 'pass1234'})
+        client.post('/expenses', data={'date': '2025-12-10', 'category': 'Other', 'amount': '5.00',
+                                       'description': description, 'currency': 'EUR'})
+
+    first_page = first.get('/expenses').data.decode()
+    second_page = second.get('/expenses').data.decode()
+    assert 'First shop' in first_page and 'Second shop' not in first_page
+    assert 'Second shop' in second_page and 'First shop' not in second_page
+
+
+def test_endpoint_names_unchanged(make_app):
+    """Test views keep their endpoint names on apps built by the factory."""
+    app = make_app('names.db')
+    with app.test_request_context():
+        assert url_for('dashboard') == '/dashboard'
+        assert url_for('delete_budget', budget_id=2) == '/delete_budget/2'
+        assert url_for('graphs_stats') == '/graphs-stats'
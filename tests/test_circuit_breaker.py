@@ -0,0 +1,90 @@
+# Circuit breaker tests
+import pytest
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(failure_threshold=3, base_delay=10, max_delay=35, clock=clock)
+
+
+def _fail(breaker, times):
+    for _ in range(times):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(breaker):
+    """Test the circuit opens only after the failure threshold is reached."""
+    _fail(breaker, 2)
+    assert breaker.state == CLOSED
+    _fail(breaker, 1)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert not breaker.available()
+
+
+def test_success_resets_failure_count(breaker):
+    """Test a success in between failures keeps the circuit closed."""
+    _fail(breaker, 2)
+    assert breaker.allow()
+    breaker.record_success()
+    _fail(breaker, 2)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_single_probe(breaker, clock):
+    """Test one probe is let through after the open delay."""
+    _fail(breaker, 3)
+    clock.now = 10
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.metrics()['open_delay'] == 10
+
+
+def test_failed_probes_back_off_exponentially(breaker, clock):
+    """Test each failed probe doubles the open delay up to the maximum."""
+    _fail(breaker, 3)
+    delays = []
+    for _ in range(3):
+        clock.now += breaker.metrics()['retry_in']
+        assert breaker.allow()
+        breaker.record_failure()
+        delays.append(breaker.metrics()['open_delay'])
+    assert delays == [20, 35, 35]
+
+
+def test_metrics_count_outcomes(breaker, clock):
+    """Test metrics report state, counters and time until the next probe."""
+    _fail(breaker, 3)
+    breaker.allow()
+    clock.now = 4
+
+    metrics = breaker.metrics()
+    assert metrics['state'] == OPEN
+    assert metrics['failures'] == 3
+    assert metrics['rejected'] == 1
+    assert metrics['trips'] == 1
+    assert metrics['retry_in'] == 6
+
+    breaker.reset()
+    assert breaker.metrics()['state'] == CLOSED
+    assert breaker.metrics()['failures'] == 0
@@ -91,3 +91,396 @@ def test_currency_conversion_precision():
     """Test conversion maintains proper decimal precision."""
     result = convert_to_eur(100.50, 'EUR')
     assert abs(result - 100.50) < 0.01
+
+
+@pytest.fixture
+def rate_cache(tmp_path, monkeypatch):
+    """Empty exchange rate cache on a throwaway database."""
+    import database
+    import currency_converter
+    monkeypatch.setattr(database, 'DATABASE_PATH', str(tmp_path / 'rates.db'))
+    database.init_db()
+    currency_converter.clear_exchange_rate_cache()
+    currency_converter.rate_breaker.reset()
+    yield currency_converter
+    if currency_converter._refresh_thread is not None:
+        currency_converter._refresh_thread.join(timeout=5)
+    currency_converter.clear_exchange_rate_cache()
+    currency_converter.rate_breaker.reset()
+
+
+def _wait_for_refresh(currency_converter):
+    currency_converter._refresh_thread.join(timeout=5)
+    assert not currency_converter._refresh_thread.is_alive()
+
+
+def test_cold_cache_does_not_wait_for_provider(rate_cache, monkeypatch):
+    """Test a cold cache serves identity rates while the fetch runs in the background."""
+    import threading
+    import time
+    release = threading.Event()
+
+    def slow_fetch():
+        release.wait(5)
+        return {'EUR': 1.0, 'GBP': 0.5}
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', slow_fetch)
+
+    start = time.perf_counter()
+    assert convert_to_eur(100.0, 'GBP') == 100.0
+    assert time.perf_counter() - start < 1
+
+    release.set()
+    _wait_for_refresh(rate_cache)
+    assert convert_to_eur(100.0, 'GBP') == 200.0
+
+
+def test_rates_shared_through_disk_cache(rate_cache, monkeypatch):
+    """Test fresh rates stored by one process are used by another without fetching."""
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', lambda: {'EUR': 1.0, 'USD': 2.0})
+    assert rate_cache.refresh_exchange_rates() is True
+
+    def fail():
+        raise AssertionError("fresh rates must not be fetched again")
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', fail)
+    rate_cache.clear_exchange_rate_cache()
+
+    assert get_exchange_rates() == {'EUR': 1.0, 'USD': 2.0}
+    assert rate_cache._refresh_thread is None or not rate_cache._refresh_thread.is_alive()
+
+
+def test_stale_rates_served_while_revalidating(rate_cache, monkeypatch):
+    """Test expired rates are returned immediately and replaced in the background."""
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', lambda: {'EUR': 1.0, 'USD': 2.0})
+    rate_cache.refresh_exchange_rates()
+    monkeypatch.setattr(rate_cache, 'RATES_TTL_SECONDS', 0)
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', lambda: {'EUR': 1.0, 'USD': 4.0})
+
+    assert get_exchange_rates()['USD'] == 2.0
+    _wait_for_refresh(rate_cache)
+    assert get_exchange_rates()['USD'] == 4.0
+
+
+def test_failed_fetch_keeps_last_known_good(rate_cache, monkeypatch):
+    """Test provider failures neither empty the cache nor get retried once the circuit opens."""
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', lambda: {'EUR': 1.0, 'USD': 2.0})
+    rate_cache.refresh_exchange_rates()
+    monkeypatch.setattr(rate_cache, 'RATES_TTL_SECONDS', 0)
+
+    calls = []
+
+    def failing_fetch():
+        calls.append(1)
+        raise ConnectionError("provider down")
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', failing_fetch)
+
+    for _ in range(10):
+        assert convert_to_eur(100.0, 'USD') == 50.0
+        if rate_cache._refresh_thread is not None:
+            _wait_for_refresh(rate_cache)
+    assert len(calls) == rate_cache.RATES_BREAKER_THRESHOLD
+    assert rate_cache.rate_breaker.state == 'open'
+
+
+@pytest.fixture
+def rate_provider(rate_cache, monkeypatch):
+    """Local stub of the exchange rate provider, counting requests."""
+    import json
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Provider:
+        requests = 0
+        delay = 0.0
+        status = 200
+        rates = {'EUR': 1.0, 'USD': 2.0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            Provider.requests += 1
+            time.sleep(Provider.delay)
+            if Provider.status != 200:
+                self.send_error(Provider.status)
+                return
+            body = json.dumps({'base': 'EUR', 'rates': Provider.rates}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(rate_cache, 'EXCHANGE_RATES_URL', f'http://127.0.0.1:{server.server_port}/latest/EUR')
+    yield Provider
+    rate_cache.stop_rate_refresher(timeout=5)
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_refreshes_share_one_fetch(rate_cache, rate_provider):
+    """Test refreshes started while a fetch is in flight wait for it instead of fetching."""
+    from concurrent.futures import ThreadPoolExecutor
+    rate_provider.delay = 0.3
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: rate_cache.refresh_exchange_rates(), range(8)))
+
+    assert results == [True] * 8
+    assert rate_provider.requests == 1
+    assert get_exchange_rates() == {'EUR': 1.0, 'USD': 2.0}
+
+
+def test_background_refresher_keeps_rates_fresh(rate_cache, rate_provider, monkeypatch):
+    """Test the scheduled refresher fetches expired rates without any request asking."""
+    import time
+    monkeypatch.setattr(rate_cache, 'RATES_TTL_SECONDS', 0.2)
+    rate_cache.start_rate_refresher(interval=0.05)
+    assert rate_cache.start_rate_refresher() is rate_cache._refresher_thread
+
+    deadline = time.time() + 5
+    while rate_provider.requests < 2 and time.time() < deadline:
+        time.sleep(0.05)
+    rate_provider.rates = {'EUR': 1.0, 'USD': 4.0}
+    while rate_cache._rates is None or rate_cache._rates[0]['USD'] != 4.0:
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+    rate_cache.stop_rate_refresher(timeout=5)
+    assert rate_cache._refresher_thread is None
+
+
+def test_open_circuit_fails_fast_on_hanging_provider(rate_cache, rate_provider, monkeypatch):
+    """Test a hanging provider opens the circuit, after which nothing reaches it."""
+    import time
+    from circuit_breaker import CircuitBreaker
+    monkeypatch.setattr(rate_cache, 'RATES_FETCH_TIMEOUT', 0.1)
+    monkeypatch.setattr(rate_cache, 'rate_breaker', CircuitBreaker(failure_threshold=2, base_delay=60))
+    rate_provider.delay = 0.5
+
+    assert rate_cache.refresh_exchange_rates() is False
+    assert rate_cache.refresh_exchange_rates() is False
+    assert rate_cache.rate_breaker.state == 'open'
+
+    start = time.perf_counter()
+    assert rate_cache.refresh_exchange_rates() is False
+    assert time.perf_counter() - start < 0.05
+    assert rate_provider.requests == 2
+    assert get_exchange_rates() == rate_cache.IDENTITY_RATES
+
+    metrics = rate_cache.exchange_rate_metrics()['breaker']
+    assert metrics['state'] == 'open'
+    assert metrics['failures'] == 2
+    assert metrics['rejected'] == 1
+    assert metrics['trips'] == 1
+
+
+def test_half_open_probe_recovers_provider(rate_cache, rate_provider, monkeypatch):
+    """Test a provider returning errors is probed again after the open delay and recovers."""
+    import time
+    from circuit_breaker import CircuitBreaker
+    monkeypatch.setattr(rate_cache, 'rate_breaker', CircuitBreaker(failure_threshold=1, base_delay=0.2))
+    rate_provider.status = 503
+
+    assert rate_cache.refresh_exchange_rates() is False
+    assert rate_cache.rate_breaker.state == 'open'
+    assert rate_cache.refresh_exchange_rates() is False
+    assert rate_provider.requests == 1
+
+    rate_provider.status = 200
+    time.sleep(0.25)
+    assert rate_cache.refresh_exchange_rates() is True
+    assert rate_cache.rate_breaker.state == 'closed'
+    assert convert_to_eur(100.0, 'USD') == 50.0
+
+
+def test_conversion_uses_rate_of_transaction_date(rate_cache):
+    """Test amounts convert at the latest rate on or before the transaction date."""
+    rate_cache.store_dated_rates({'GBP': 0.8, 'USD': 1.25}, '2023-01-02')
+    rate_cache.store_dated_rates({'GBP': 0.5}, '2024-06-01')
+
+    assert convert_to_eur(100.0, 'GBP', '2023-01-02') == 125.0
+    assert convert_to_eur(100.0, 'GBP', '2024-05-31 10:30:00') == 125.0
+    assert convert_to_eur(100.0, 'GBP', '2024-06-01') == 200.0
+    assert convert_to_eur(100.0, 'USD', '2025-01-01') == 80.0
+    # Before the recorded history, the current rates are used
+    assert convert_to_eur(100.0, 'GBP', '2022-12-31') == 100.0
+    assert format_amount_with_conversion(100.0, 'GBP', '2024-06-01') == '(£100.00) €200.00'
+
+
+def test_dated_lookup_uses_primary_key(rate_cache):
+    """Test the nearest-earlier lookup is an index search, not a table scan."""
+    import database
+    with database.get_db() as conn:
+        plan = conn.execute(
+            '''EXPLAIN QUERY PLAN SELECT rate FROM exchange_rates
+               WHERE currency = ? AND date <= ? ORDER BY date DESC LIMIT 1''',
+            ('GBP', '2024-01-01')
+        ).fetchall()
+    details = ' '.join(row['detail'] for row in plan)
+    assert 'SEARCH' in details
+    assert 'TEMP B-TREE' not in details
+
+
+def test_background_fetches_use_the_apps_database(rate_cache, make_app, monkeypatch):
+    """Test rates fetched by background threads are stored in the database of the app that started them."""
+    import sqlite3
+    import time
+    import database
+    from app import initialize_app
+    app = make_app()
+    initialize_app(app)
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', lambda: {'EUR': 1.0, 'USD': 2.0})
+
+    def stored_rates(path):
+        with sqlite3.connect(path) as conn:
+            return conn.execute('SELECT COUNT(*) FROM exchange_rates').fetchone()[0]
+
+    with database.use_database(app.config['DATABASE_PATH']):
+        rate_cache._revalidate_in_background()
+        rate_cache._refresh_thread.join(timeout=5)
+    assert stored_rates(app.config['DATABASE_PATH']) == 2
+    assert stored_rates(database.DATABASE_PATH) == 0
+
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', lambda: {'EUR': 1.0, 'USD': 2.0, 'GBP': 0.5})
+    rate_cache.clear_exchange_rate_cache()
+    monkeypatch.setattr(rate_cache, 'RATES_TTL_SECONDS', 0)
+    with database.use_database(app.config['DATABASE_PATH']):
+        rate_cache.start_rate_refresher(interval=0.05)
+    deadline = time.time() + 5
+    while stored_rates(app.config['DATABASE_PATH']) < 3:
+        assert time.time() < deadline
+        time.sleep(0.05)
+    rate_cache.stop_rate_refresher(timeout=5)
+    assert stored_rates(database.DATABASE_PATH) == 0
+
+
+def test_fetched_rates_recorded_for_today(rate_cache, monkeypatch):
+    """Test each successful fetch adds today's rates to the history."""
+    from datetime import date
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', lambda: {'EUR': 1.0, 'USD': 2.0})
+    rate_cache.refresh_exchange_rates()
+
+    assert rate_cache.get_rate_on('USD', date.today().isoformat()) == 2.0
+
+
+def test_load_rates_file_formats(rate_cache, tmp_path):
+    """Test bulk loading of long and ECB-style wide rate files."""
+    long_file = tmp_path / 'rates.csv'
+    long_file.write_text('date,currency,rate\n2023-03-01,GBP,0.88\n2023-03-01,USD,bad\n')
+    wide_file = tmp_path / 'eurofxref-hist.csv'
+    wide_file.write_text('Date,USD,JPY,CYP,\n2023-03-02,1.06,145.1,N/A,\n2023-03-01,1.07,144.9,N/A,\n')
+
+    assert rate_cache.load_rates_file(str(long_file)) == 1
+    assert rate_cache.load_rates_file(str(wide_file)) == 4
+
+    assert rate_cache.get_rate_on('GBP', '2023-03-05') == 0.88
+    assert rate_cache.get_rate_on('USD', '2023-03-01') == 1.07
+    assert rate_cache.get_rate_on('USD', '2023-03-02') == 1.06
+    assert rate_cache.get_rate_on('CYP', '2023-03-02') is None
+
+
+def test_dated_rates_written_by_another_process(rate_cache, monkeypatch):
+    """Test cached dated lookups see rates another process stores once its revision is re-checked."""
+    import sqlite3
+    import database
+    rate_cache.store_dated_rates({'USD': 1.05}, '2023-03-01')
+    assert rate_cache.get_rate_on('USD', '2023-03-03') == 1.05
+    assert rate_cache.get_rate_on('GBP', '2023-03-03') is None
+
+    # Like the load-rates command run next to the server: no in-process hook sees it
+    conn = sqlite3.connect(database.DATABASE_PATH)
+    with conn:
+        conn.executemany('INSERT INTO exchange_rates (date, currency, rate) VALUES (?, ?, ?)',
+                         [('2023-03-02', 'USD', 1.06), ('2023-03-02', 'GBP', 0.88)])
+    conn.close()
+    assert rate_cache.get_rate_on('USD', '2023-03-03') == 1.05
+
+    monkeypatch.setattr(rate_cache, 'DATED_RATE_CHECK_SECONDS', 0)
+    assert rate_cache.get_rate_on('USD', '2023-03-03') == 1.06
+    assert rate_cache.get_rate_on('GBP', '2023-03-03') == 0.88
+    assert rate_cache.get_rate_on('USD', '2023-03-01') == 1.05
+
+
+def test_load_rates_cli_command(rate_cache, runner, tmp_path):
+    """Test the load-rates CLI command stores the file's rates."""
+    rates_file = tmp_path / 'rates.csv'
+    rates_file.write_text('date,currency,rate\n2023-03-01,GBP,0.88\n')
+
+    result = runner.invoke(args=['load-rates', str(rates_file)])
+
+    assert 'Loaded 1 exchange rates' in result.output
+    assert rate_cache.get_rate_on('GBP', '2023-03-01') == 0.88
+
+
+def test_convert_many_matches_convert_to_eur(rate_cache, monkeypatch):
+    """Test batch conversion agrees with row-by-row conversion, with and without dates."""
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', lambda: {'EUR': 1.0, 'GBP': 0.5, 'USD': 2.0})
+    rate_cache.refresh_exchange_rates()
+    rate_cache.store_dated_rates({'GBP': 0.8, 'USD': 1.25}, '2023-01-02')
+
+    amounts = [100.0, 10.0, 40.0, 7.0, 0.0]
+    currencies = ['GBP', 'EUR', 'USD', 'XYZ', 'GBP']
+    dates = ['2023-06-01', '2023-06-01', '2022-01-01', '2023-06-01', None]
+
+    assert rate_cache.convert_many(amounts, currencies) == \
+        [convert_to_eur(a, c) for a, c in zip(amounts, currencies)]
+    assert rate_cache.convert_many(amounts, currencies, dates=dates) == \
+        [convert_to_eur(a, c, d) for a, c, d in zip(amounts, currencies, dates)]
+    assert rate_cache.convert_many([], []) == []
+
+
+def test_convert_many_to_other_target(rate_cache, monkeypatch):
+    """Test conversion into a non-EUR target goes through EUR at the same date."""
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', lambda: {'EUR': 1.0, 'GBP': 0.5, 'USD': 2.0})
+    rate_cache.refresh_exchange_rates()
+    rate_cache.store_dated_rates({'GBP': 0.8, 'USD': 1.6}, '2023-01-02')
+
+    assert rate_cache.convert_many([10.0, 10.0, 10.0], ['EUR', 'USD', 'GBP'], 'GBP') == [5.0, 2.5, 10.0]
+    assert rate_cache.convert_many([10.0, 16.0], ['EUR', 'USD'], 'GBP', dates=['2023-02-01', '2023-02-01']) == \
+        pytest.approx([8.0, 8.0])
+
+
+def test_currency_sums_convert_partial_sums(rate_cache, monkeypatch):
+    """Test sums are kept per currency and day and converted once per distinct pair."""
+    monkeypatch.setattr(rate_cache, 'fetch_exchange_rates', lambda: {'EUR': 1.0, 'GBP': 0.5})
+    rate_cache.refresh_exchange_rates()
+    rate_cache.store_dated_rates({'GBP': 0.8}, '2023-01-02')
+
+    requested = []
+
+    def factors(pairs, target):
+        requested.append(set(pairs))
+        return rate_cache.conversion_factors(pairs, target)
+
+    sums = rate_cache.CurrencySums('EUR', factors)
+    for _ in range(100):
+        sums.add('food', 4.0, 'GBP', '2023-01-05')
+        sums.add('food', 1.0, 'EUR', '2023-01-05')
+    sums.add('rent', 10.0, 'GBP')
+
+    totals = sums.totals()
+
+    assert totals == {'food': pytest.approx(600.0), 'rent': 20.0}
+    assert requested == [{('GBP', '2023-01-05'), ('EUR', None), ('GBP', None)}]
+    assert rate_cache.CurrencySums('GBP').totals() == {}
+
+
+def test_format_converted_is_memoized():
+    """Test pre-formatted amounts match the filter output and come from a bounded memo."""
+    import currency_converter
+    currency_converter.format_converted.cache_clear()
+
+    assert currency_converter.format_converted(50.0, 'GBP', 100.0) == '(£50.00) €100.00'
+    assert currency_converter.format_converted(50.0, 'GBP', 100.0) == \
+        format_amount_with_conversion(50.0, 'GBP', eur_amount=100.0)
+    assert currency_converter.format_converted(7.5, 'EUR', 7.5) == '€7.50'
+    assert currency_converter.format_converted(10.0, 'EUR', 8.6, 'GBP') == '(€10.00) £8.60'
+
+    info = currency_converter.format_converted.cache_info()
+    assert info.hits == 1
+    assert info.maxsize == currency_converter.FORMAT_CACHE_SIZE
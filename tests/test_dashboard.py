@@ -180,4 +180,32 @@ def test_dashboard_handles_current_month_zero_data(authenticated_client):
     
     response = authenticated_client.get('/dashboard')
     
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+
+def test_dashboard_totals_in_display_currency(authenticated_client, monkeypatch):
+    import currency_converter
+    from datetime import datetime
+    monkeypatch.setattr(currency_converter, 'get_exchange_rates', lambda: {'EUR': 1.0, 'GBP': 0.5, 'USD': 2.0})
+    monkeypatch.setattr(currency_converter, '_dated_rate_vectors', lambda days_by_currency: {})
+    today = datetime.now().strftime('%Y-%m-%d')
+    for amount, currency in (('100.00', 'EUR'), ('50.00', 'GBP'), ('200.00', 'USD')):
+        authenticated_client.post('/expenses', data={
+            'date': today,
+            'category': 'Shopping',
+            'amount': amount,
+            'description': 'Mixed shop',
+            'currency': currency
+        })
+
+    response = authenticated_client.get('/dashboard')
+    assert '€300.00' in response.data.decode()
+
+    authenticated_client.post('/set_currency/GBP')
+    response = authenticated_client.get('/dashboard')
+    assert '£150.00' in response.data.decode()
+
+    response = authenticated_client.get('/budgets')
+    assert response.status_code == 200
+    response = authenticated_client.get('/reports')
+    assert '£150.00' in response.data.decode()
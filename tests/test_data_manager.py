@@ -195,3 +195,109 @@ def test_data_consistency(dm):
     incomes2 = dm2.get_incomes()
     
     assert len(incomes1) == len(incomes2)
+
+
+@pytest.fixture
+def rated_dm(tmp_path, monkeypatch):
+    """DataManager on a throwaway database with a GBP rate history."""
+    import currency_converter
+    monkeypatch.setattr(database, 'DATABASE_PATH', str(tmp_path / 'amounts.db'))
+    database.init_db()
+    currency_converter.clear_exchange_rate_cache()
+    monkeypatch.setattr(currency_converter, 'get_exchange_rates', lambda: {'EUR': 1.0, 'GBP': 0.5})
+    currency_converter.store_dated_rates({'GBP': 0.8}, '2025-01-01')
+    dm = DataManager()
+    dm.set_user(database.create_user('testuser', 'password'))
+    yield dm
+    currency_converter.clear_exchange_rate_cache()
+
+
+def _stored_amounts(table):
+    with database.get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT amount, currency, amount_eur, eur_rate FROM {table} ORDER BY id')
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def test_eur_amount_stored_at_write_time(rated_dm):
+    """Test saved and imported transactions store their EUR amount and rate."""
+    rated_dm._incomes.append(type('Income', (), {
+        'date': '2025-06-01', 'category': 'Salary', 'amount': 80.0,
+        'description': 'Pay', 'currency': 'GBP'})())
+    rated_dm.save()
+    rated_dm.add_transactions(expenses=[
+        {'date': '2024-06-01', 'category': 'Food', 'amount': 10.0, 'currency': 'GBP', 'fingerprint': 'a'},
+        {'date': '2025-06-01', 'category': 'Food', 'amount': 12.0, 'currency': 'EUR', 'fingerprint': 'b'},
+        {'date': '2025-06-01', 'category': 'Food', 'amount': 5.0, 'currency': 'XYZ', 'fingerprint': 'c'},
+    ])
+
+    assert _stored_amounts('incomes') == [(80.0, 'GBP', 100.0, 0.8)]
+    # Before the rate history starts the current rate applies; unknown
+    # currencies are left for a later recompute
+    assert _stored_amounts('expenses') == [
+        (10.0, 'GBP', 20.0, 0.5),
+        (12.0, 'EUR', 12.0, 1.0),
+        (5.0, 'XYZ', None, None),
+    ]
+    assert rated_dm.get_incomes()[0].amount_eur == 100.0
+
+
+def test_recompute_eur_amounts(rated_dm, runner, monkeypatch):
+    """Test the backfill fills missing amounts and --all recomputes every row."""
+    import currency_converter
+    from models.data_manager import recompute_eur_amounts
+    rated_dm.add_transactions(expenses=[
+        {'date': '2025-06-01', 'category': 'Food', 'amount': 8.0, 'currency': 'GBP', 'fingerprint': 'a'},
+        {'date': '2025-06-01', 'category': 'Food', 'amount': 5.0, 'currency': 'XYZ', 'fingerprint': 'b'},
+    ])
+    with database.get_db() as conn:
+        conn.execute('UPDATE expenses SET amount_eur = NULL, eur_rate = NULL WHERE currency = ?', ('GBP',))
+
+    monkeypatch.setattr(currency_converter, 'get_exchange_rates', lambda: {'EUR': 1.0, 'GBP': 0.5, 'XYZ': 2.0})
+    assert recompute_eur_amounts() == 2
+    assert _stored_amounts('expenses') == [(8.0, 'GBP', 10.0, 0.8), (5.0, 'XYZ', 2.5, 2.0)]
+
+    currency_converter.store_dated_rates({'GBP': 0.4}, '2025-05-01')
+    result = runner.invoke(args=['recompute-amounts'])
+    assert 'Recomputed the EUR amount of 0 transactions' in result.output
+
+    result = runner.invoke(args=['recompute-amounts', '--all'])
+    assert 'Recomputed the EUR amount of 2 transactions' in result.output
+    assert _stored_amounts('expenses')[0] == (8.0, 'GBP', 20.0, 0.4)
+
+
+def test_snapshot_shared_until_data_changes(dm):
+    """Test managers of one user share an immutable snapshot that a write replaces."""
+    from models.data_manager import load_snapshot
+    first = load_snapshot(dm.user_id)
+    assert load_snapshot(dm.user_id) is first
+    assert isinstance(first.incomes, tuple)
+
+    dm.add_transactions(incomes=[{'date': '2025-12-10', 'category': 'Salary', 'amount': 10.0}])
+
+    second = load_snapshot(dm.user_id)
+    assert second is not first
+    assert [income.amount for income in second.incomes] == [10.0]
+    with pytest.raises(AttributeError):
+        second.incomes[0].category = 'Other'
+
+
+def test_concurrent_writes_are_not_lost(dm):
+    """Test writes from managers on parallel threads all end up in the database."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def add_and_recategorize(n):
+        manager = DataManager(dm.user_id)
+        manager.load()
+        manager.add_transactions(expenses=[{'date': '2025-12-10', 'category': 'Food', 'amount': float(n),
+                                            'description': f'Shop {n}'}])
+        manager.set_category('expenses', f'Shop {n}', 'Shopping')
+        manager.set_budget(f'Category {n % 3}', float(n))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(add_and_recategorize, range(40)))
+
+    dm.load()
+    assert len(dm.get_expenses()) == 40
+    assert {expense.category for expense in dm.get_expenses()} == {'Shopping'}
+    assert sorted(budget.category for budget in dm.get_budgets()) == ['Category 0', 'Category 1', 'Category 2']
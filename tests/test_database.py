@@ -113,3 +113,52 @@ def test_transaction_rollback(setup_database):
         cursor.execute('SELECT COUNT(*) FROM expenses')
         count = cursor.fetchone()[0]
         assert count == 0
+
+
+def test_fingerprint_unique_per_user(setup_database):
+    """Test imported transaction fingerprints are unique per user."""
+    import sqlite3
+    user_a = database.create_user('user_a', 'password123')
+    user_b = database.create_user('user_b', 'password123')
+    insert = 'INSERT INTO expenses (user_id, date, description, category, amount, fingerprint) VALUES (?, ?, ?, ?, ?, ?)'
+    with database.get_db() as conn:
+        conn.execute(insert, (user_a, '2025-12-01', 'Shop', 'Other', 5.0, 'abc'))
+        conn.execute(insert, (user_b, '2025-12-01', 'Shop', 'Other', 5.0, 'abc'))
+        conn.execute(insert, (user_a, '2025-12-01', 'Shop', 'Other', 5.0, None))
+        conn.execute(insert, (user_a, '2025-12-01', 'Shop', 'Other', 5.0, None))
+    with pytest.raises(sqlite3.IntegrityError):
+        with database.get_db() as conn:
+            conn.execute(insert, (user_a, '2025-12-02', 'Other shop', 'Other', 9.0, 'abc'))
+
+
+def test_write_ahead_log_enabled(setup_database):
+    """Test commits go to the write-ahead log and a checkpoint folds them back."""
+    with database.get_db() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        database.create_user('waluser', 'password123')
+        # A second connection sees the committed row while the log is unmerged
+        assert conn.execute("SELECT COUNT(*) FROM users WHERE username = 'waluser'").fetchone()[0] == 1
+
+    busy, _, _ = database.checkpoint()
+    assert busy == 0
+    wal_path = database.DATABASE_PATH + '-wal'
+    assert not os.path.exists(wal_path) or os.path.getsize(wal_path) == 0
+
+
+def test_stored_eur_amount_columns_added(tmp_path, monkeypatch):
+    """Test init_db adds the stored EUR amount columns to existing tables."""
+    import sqlite3
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE expenses (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                    date TEXT NOT NULL, description TEXT, category TEXT NOT NULL, amount REAL NOT NULL)''')
+    conn.execute("INSERT INTO expenses (user_id, date, category, amount) VALUES (1, '2025-12-01', 'Other', 5.0)")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(database, 'DATABASE_PATH', path)
+    database.init_db()
+
+    with database.get_db() as conn:
+        row = conn.execute('SELECT amount, currency, amount_eur, eur_rate FROM expenses').fetchone()
+    assert tuple(row) == (5.0, 'EUR', None, None)
@@ -132,11 +132,12 @@ def test_missing_required_files(authenticated_client):
 
 def test_corrupted_json_files(cleanup_merchant_files, authenticated_client):
     import os
-    from merchant_mapper import MERCHANT_CATEGORY_FILE_EXPENSES
+    from merchant_mapper import MERCHANT_CATEGORY_FILE_EXPENSES, init_merchant_store
     
     os.makedirs(os.path.dirname(MERCHANT_CATEGORY_FILE_EXPENSES), exist_ok=True)
     with open(MERCHANT_CATEGORY_FILE_EXPENSES, 'w') as f:
         f.write("{invalid json content}")
+    init_merchant_store()
     
     response = authenticated_client.post('/expenses', data={
         'date': '2025-12-10',
@@ -154,10 +155,10 @@ def cleanup_merchant_files():
     import os
     from merchant_mapper import MERCHANT_CATEGORY_FILE_EXPENSES, MERCHANT_CATEGORY_FILE_INCOME
     
-    if os.path.exists(MERCHANT_CATEGORY_FILE_EXPENSES):
-        os.remove(MERCHANT_CATEGORY_FILE_EXPENSES)
-    if os.path.exists(MERCHANT_CATEGORY_FILE_INCOME):
-        os.remove(MERCHANT_CATEGORY_FILE_INCOME)
+    for path in (MERCHANT_CATEGORY_FILE_EXPENSES, MERCHANT_CATEGORY_FILE_INCOME):
+        for suffix in ('', '.invalid'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
 
 def test_unicode_characters_in_description(authenticated_client):
     unicode_text = "Café 咖啡 ☕ 🍕"
@@ -221,4 +221,59 @@ def test_expense_auto_categorization(authenticated_client):
         'currency': 'EUR'
     }, follow_redirects=True)
     
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+
+def test_category_change_only_trains_own_mappings(authenticated_client):
+    from merchant_mapper import get_category_for_merchant
+    authenticated_client.post('/expenses', data={
+        'date': '2025-12-10',
+        'category': 'Other',
+        'amount': '50.00',
+        'description': 'Corner Shop',
+        'currency': 'EUR'
+    })
+    authenticated_client.post('/change_expense_category/2025-12-10/50.0/Corner%20Shop', data={
+        'new_category': 'Shopping'
+    })
+
+    with authenticated_client.session_transaction() as sess:
+        user_id = sess['user_id']
+    assert get_category_for_merchant('Corner Shop', 'expenses', user_id=user_id) == 'Shopping'
+    assert get_category_for_merchant('Corner Shop', 'expenses', user_id=user_id + 1) is None
+
+
+def test_expense_listing_shows_stored_eur_amount(authenticated_client, monkeypatch):
+    """Test listing rows show the amount with the EUR equivalent stored when it was added."""
+    import currency_converter
+    monkeypatch.setattr(currency_converter, 'get_exchange_rates', lambda: {'EUR': 1.0, 'GBP': 0.5})
+    monkeypatch.setattr(currency_converter, '_dated_rate_vectors', lambda days_by_currency: {})
+    authenticated_client.post('/expenses', data={
+        'date': '2025-12-10', 'category': 'Shopping', 'amount': '50.00',
+        'description': 'Bookshop', 'currency': 'GBP'
+    })
+
+    # Later rate changes do not change the amount it was recorded at
+    monkeypatch.setattr(currency_converter, 'get_exchange_rates', lambda: {'EUR': 1.0, 'GBP': 0.8})
+    html = authenticated_client.get('/expenses').data.decode()
+    assert '-(£50.00) €100.00' in html
+
+
+def test_expense_listing_in_display_currency(authenticated_client, monkeypatch):
+    """Test listing and dashboard rows are converted to the selected display currency."""
+    import currency_converter
+    from datetime import datetime
+    monkeypatch.setattr(currency_converter, 'get_exchange_rates', lambda: {'EUR': 1.0, 'GBP': 0.5})
+    monkeypatch.setattr(currency_converter, '_dated_rate_vectors', lambda days_by_currency: {})
+    today = datetime.now().strftime('%Y-%m-%d')
+    for amount, currency in (('50.00', 'GBP'), ('100.00', 'EUR')):
+        authenticated_client.post('/expenses', data={
+            'date': today, 'category': 'Shopping', 'amount': amount,
+            'description': 'Bookshop', 'currency': currency
+        })
+
+    authenticated_client.post('/set_currency/GBP')
+    html = authenticated_client.get('/expenses').data.decode()
+    assert '-£50.00' in html
+    assert '-(€100.00) £50.00' in html
+    assert '(€100.00) £50.00' in authenticated_client.get('/dashboard').data.decode()
@@ -261,4 +261,26 @@ def test_days_until_low_balance(authenticated_client):
 def test_stats_with_no_data(authenticated_client):
     response = authenticated_client.get('/graphs-stats')
     
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+
+def test_category_prediction_in_display_currency(authenticated_client, monkeypatch):
+    import currency_converter
+    from datetime import datetime
+    monkeypatch.setattr(currency_converter, 'get_exchange_rates', lambda: {'EUR': 1.0, 'GBP': 0.5})
+    monkeypatch.setattr(currency_converter, '_dated_rate_vectors', lambda days_by_currency: {})
+    today = datetime.now().strftime('%Y-%m-%d')
+    for amount, currency in (('100.00', 'EUR'), ('10.00', 'GBP'), ('20.00', 'GBP')):
+        authenticated_client.post('/expenses', data={
+            'date': today,
+            'category': 'Shopping',
+            'amount': amount,
+            'description': 'Mixed shop',
+            'currency': currency
+        })
+
+    authenticated_client.post('/set_currency/GBP')
+    response = authenticated_client.get('/graphs-stats')
+
+    # (£50 + £10 + £20) / 3 per expense, times 12
+    assert '£320.00' in response.data.decode()
@@ -0,0 +1,203 @@
+import io
+import pytest
+from datetime import date
+from api.importers import (
+    detect_importer,
+    get_importer,
+    iter_batches,
+    GenericCSVImporter,
+    OFXImporter,
+    QIFImporter,
+    TransactionRecord
+)
+from api.revolut_importer import RevolutImporter
+
+OFX_CONTENT = """OFXHEADER:100
+DATA:OFXSGML
+
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<CURDEF>GBP
+<BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20251207103000.000[-5:EST]
+<TRNAMT>-12.50
+<NAME>TESCO STORES 2231
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20251201<TRNAMT>2500.00<NAME>ACME PAYROLL</STMTTRN>
+</BANKTRANLIST>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1>
+</OFX>
+"""
+
+QIF_CONTENT = """!Type:Bank
+D12/07/2025
+T-45.00
+PAlbert Heijn
+^
+D12/01'25
+T1,500.00
+PAcme Corp
+MSalary
+^
+"""
+
+
+def test_detect_revolut_csv():
+    head = "Type,Product,Started Date,Completed Date,Description,Amount,Fee,Currency,State,Balance\n"
+    assert detect_importer('statement.csv', head) is RevolutImporter
+
+
+def test_detect_generic_csv():
+    head = "Booking Date;Payee;Amount;Currency\n"
+    assert detect_importer('export.CSV', head) is GenericCSVImporter
+
+
+def test_detect_ofx_and_qif():
+    assert detect_importer('bank.ofx', OFX_CONTENT[:200]) is OFXImporter
+    assert detect_importer('bank.qif', QIF_CONTENT[:200]) is QIFImporter
+
+
+def test_detect_unsupported_extension():
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        detect_importer('statement.xlsx', 'whatever')
+
+
+def test_get_importer_by_name():
+    assert get_importer('revolut') is RevolutImporter
+    with pytest.raises(ValueError):
+        get_importer('nope')
+
+
+def test_generic_csv_comma_delimited():
+    content = """Date,Description,Amount,Currency
+2025-12-07,Albert Heijn,-50.50,EUR
+07/12/2025,Jumbo,-10,EUR"""
+
+    records = list(GenericCSVImporter().iter_records(io.StringIO(content)))
+
+    assert records == [
+        TransactionRecord(date=date(2025, 12, 7), amount=-50.50, description='Albert Heijn', currency='EUR'),
+        TransactionRecord(date=date(2025, 12, 7), amount=-10.0, description='Jumbo', currency='EUR'),
+    ]
+
+
+def test_generic_csv_semicolon_decimal_comma_and_default_currency():
+    content = """Boekingsdatum;Naam;Bedrag
+2025-12-07;Albert Heijn;-1.234,56"""
+
+    # Unknown headers are not recognised
+    assert not GenericCSVImporter.sniff(content)
+
+    content = """Date;Payee;Amount
+2025-12-07;Albert Heijn;-1.234,56"""
+    records = list(GenericCSVImporter(default_currency='GBP').iter_records(io.StringIO(content)))
+
+    assert len(records) == 1
+    assert records[0].amount == -1234.56
+    assert records[0].currency == 'GBP'
+
+
+def test_generic_csv_debit_credit_columns():
+    content = """Transaction Date,Description,Debit,Credit
+2025-12-07,Rent,800.00,
+2025-12-01,Salary,,3000.00"""
+
+    records = list(GenericCSVImporter().iter_records(io.StringIO(content)))
+
+    assert [r.amount for r in records] == [-800.0, 3000.0]
+
+
+def test_generic_csv_skips_malformed_rows():
+    content = """Date,Description,Amount
+not-a-date,Shop,-5
+2025-12-07,Shop,abc
+2025-12-07,Shop,-5"""
+
+    records = list(GenericCSVImporter().iter_records(io.StringIO(content)))
+
+    assert len(records) == 1
+
+
+def test_ofx_records():
+    records = list(OFXImporter().iter_records(io.StringIO(OFX_CONTENT)))
+
+    assert records == [
+        TransactionRecord(date=date(2025, 12, 7), amount=-12.50, description='TESCO STORES 2231', currency='GBP'),
+        TransactionRecord(date=date(2025, 12, 1), amount=2500.0, description='ACME PAYROLL', currency='GBP'),
+    ]
+
+
+def test_ofx_tags_split_across_chunks():
+    importer = OFXImporter()
+    importer.CHUNK_SIZE = 7
+
+    records = list(importer.iter_records(io.StringIO(OFX_CONTENT)))
+
+    assert [r.description for r in records] == ['TESCO STORES 2231', 'ACME PAYROLL']
+
+
+def test_qif_records():
+    records = list(QIFImporter().iter_records(io.StringIO(QIF_CONTENT)))
+
+    assert records[0] == TransactionRecord(date=date(2025, 12, 7), amount=-45.0, description='Albert Heijn')
+    assert records[1].date == date(2025, 12, 1)
+    assert records[1].amount == 1500.0
+    assert records[1].description == 'Acme Corp'
+
+
+def test_iter_batches_sizes():
+    records = [TransactionRecord(date=date(2025, 12, 1), amount=float(i), description='x') for i in range(7)]
+
+    batches = list(iter_batches(records, batch_size=3))
+
+    assert [len(b) for b in batches] == [3, 3, 1]
+
+
+def test_revolut_importer_streams_batches():
+    content = "Started Date,Description,Amount,Currency\n" + "\n".join(
+        f"2025-12-0{i % 9 + 1} 10:30:00,Shop {i},-{i + 1}.00,EUR" for i in range(5))
+
+    batches = list(RevolutImporter().iter_batches(io.StringIO(content), batch_size=2))
+
+    assert [len(b) for b in batches] == [2, 2, 1]
+
+
+def test_import_ofx_statement(authenticated_client):
+    data = {
+        'revolut_csv': (io.BytesIO(OFX_CONTENT.encode()), 'statement.ofx')
+    }
+
+    response = authenticated_client.post('/revolut_import', data=data, content_type='multipart/form-data', follow_redirects=True)
+
+    assert b'Successfully imported 2 OFX transactions' in response.data
+
+
+def test_import_qif_statement_skips_duplicates(authenticated_client):
+    for _ in range(2):
+        data = {
+            'revolut_csv': (io.BytesIO(QIF_CONTENT.encode()), 'statement.qif')
+        }
+        response = authenticated_client.post('/revolut_import', data=data, content_type='multipart/form-data', follow_redirects=True)
+
+    assert b'Successfully imported 0 QIF transactions! Skipped 2' in response.data
+
+
+def test_import_rejects_unsupported_file(authenticated_client):
+    data = {
+        'revolut_csv': (io.BytesIO(b'data'), 'statement.pdf')
+    }
+
+    response = authenticated_client.post('/revolut_import', data=data, content_type='multipart/form-data', follow_redirects=True)
+
+    assert b'Invalid file type' in response.data
+
+
+def test_transaction_fingerprint_is_stable_and_distinguishes_occurrences():
+    from api.importers import transaction_fingerprint
+    record = TransactionRecord(date=date(2025, 12, 1), amount=-3.5, description='Coffee Bar')
+
+    assert transaction_fingerprint('revolut', record) == transaction_fingerprint('revolut', record, 0)
+    assert transaction_fingerprint('revolut', record, 0) != transaction_fingerprint('revolut', record, 1)
+    assert transaction_fingerprint('revolut', record) != transaction_fingerprint('ofx', record)
@@ -7,17 +7,31 @@ from merchant_mapper import (
     update_merchant_category,
     get_category_for_merchant,
     auto_categorize_transaction,
+    categorize_many,
+    add_keyword_rule,
+    remove_keyword_rule,
+    load_keyword_rules,
+    init_merchant_store,
     MERCHANT_CATEGORY_FILE_EXPENSES,
     MERCHANT_CATEGORY_FILE_INCOME
 )
 
+def _clear_merchant_store():
+    import database
+    init_merchant_store()
+    with database.get_db() as conn:
+        conn.execute('DELETE FROM merchant_categories')
+        conn.execute('DELETE FROM merchant_rules')
+
 @pytest.fixture
 def cleanup_merchant_files():
+    _clear_merchant_store()
     yield
-    if os.path.exists(MERCHANT_CATEGORY_FILE_EXPENSES):
-        os.remove(MERCHANT_CATEGORY_FILE_EXPENSES)
-    if os.path.exists(MERCHANT_CATEGORY_FILE_INCOME):
-        os.remove(MERCHANT_CATEGORY_FILE_INCOME)
+    _clear_merchant_store()
+    for path in (MERCHANT_CATEGORY_FILE_EXPENSES, MERCHANT_CATEGORY_FILE_INCOME):
+        for suffix in ('', '.migrated', '.invalid'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
 
 def test_load_merchant_categories_expenses(cleanup_merchant_files):
     test_data = {"Jumbo Supermarkt": "Shopping", "Albert Heijn": "Food & Dining"}
@@ -25,9 +39,12 @@ def test_load_merchant_categories_expenses(cleanup_merchant_files):
     with open(MERCHANT_CATEGORY_FILE_EXPENSES, 'w') as f:
         json.dump(test_data, f)
     
+    init_merchant_store()
     result = load_merchant_categories('expenses')
     
     assert result == test_data
+    assert not os.path.exists(MERCHANT_CATEGORY_FILE_EXPENSES)
+    assert os.path.exists(MERCHANT_CATEGORY_FILE_EXPENSES + '.migrated')
 
 def test_load_merchant_categories_income(cleanup_merchant_files):
     test_data = {"Acme Corp": "Salary", "Freelance Client": "Freelance"}
@@ -35,6 +52,7 @@ def test_load_merchant_categories_income(cleanup_merchant_files):
     with open(MERCHANT_CATEGORY_FILE_INCOME, 'w') as f:
         json.dump(test_data, f)
     
+    init_merchant_store()
     result = load_merchant_categories('income')
     
     assert result == test_data
@@ -52,39 +70,42 @@ def test_load_merchant_categories_invalid_json(cleanup_merchant_files):
     with open(MERCHANT_CATEGORY_FILE_EXPENSES, 'w') as f:
         f.write("invalid json content")
     
+    init_merchant_store()
     result = load_merchant_categories('expenses')
     
     assert result == {}
+    assert os.path.exists(MERCHANT_CATEGORY_FILE_EXPENSES + '.invalid')
+
+def test_json_import_keeps_existing_mappings(cleanup_merchant_files):
+    update_merchant_category("Jumbo Supermarkt", "Food & Dining", 'expenses')
+    with open(MERCHANT_CATEGORY_FILE_EXPENSES, 'w') as f:
+        json.dump({"Jumbo Supermarkt": "Shopping", "Hema": "Shopping"}, f)
+    
+    init_merchant_store()
+    
+    assert load_merchant_categories('expenses') == {"Jumbo Supermarkt": "Food & Dining", "Hema": "Shopping"}
 
 def test_save_merchant_categories_expenses(cleanup_merchant_files):
     test_data = {"Dirk": "Shopping", "Kruidvat": "Food & Dining"}
     
     save_merchant_categories(test_data, 'expenses')
     
-    assert os.path.exists(MERCHANT_CATEGORY_FILE_EXPENSES)
-    with open(MERCHANT_CATEGORY_FILE_EXPENSES, 'r') as f:
-        saved_data = json.load(f)
-    assert saved_data == test_data
+    assert load_merchant_categories('expenses') == test_data
 
 def test_save_merchant_categories_income(cleanup_merchant_files):
     test_data = {"Company A": "Salary", "Side Gig": "Side Hustle"}
     
     save_merchant_categories(test_data, 'income')
     
-    assert os.path.exists(MERCHANT_CATEGORY_FILE_INCOME)
-    with open(MERCHANT_CATEGORY_FILE_INCOME, 'r') as f:
-        saved_data = json.load(f)
-    assert saved_data == test_data
+    assert load_merchant_categories('income') == test_data
 
-def test_save_merchant_categories_creates_directory(cleanup_merchant_files):
-    if os.path.exists('data'):
-        import shutil
-        shutil.rmtree('data')
+def test_save_merchant_categories_replaces_mappings(cleanup_merchant_files):
+    save_merchant_categories({"Old": "Category"}, 'expenses')
     
     test_data = {"Test": "Category"}
     save_merchant_categories(test_data, 'expenses')
     
-    assert os.path.exists(os.path.dirname(MERCHANT_CATEGORY_FILE_EXPENSES))
+    assert load_merchant_categories('expenses') == test_data
 
 def test_update_merchant_category_new_merchant(cleanup_merchant_files):
     update_merchant_category("New Store", "Shopping", 'expenses')
@@ -143,4 +164,162 @@ def test_auto_categorize_transaction_found(cleanup_merchant_files):
 def test_auto_categorize_transaction_not_found(cleanup_merchant_files):
     category = auto_categorize_transaction("Random Merchant", 'expenses')
     
-    assert category is None
\ No newline at end of file
+    assert category is None
+def test_merchant_mappings_cached_while_unchanged(cleanup_merchant_files):
+    import merchant_mapper
+    update_merchant_category("Lidl", "Food & Dining", 'expenses')
+
+    first = merchant_mapper._get_cached_merchants('expenses')
+    for _ in range(50):
+        assert auto_categorize_transaction("Lidl", 'expenses') == "Food & Dining"
+
+    assert merchant_mapper._get_cached_merchants('expenses') is first
+
+def test_merchant_cache_picks_up_external_changes(cleanup_merchant_files, monkeypatch):
+    import database
+    import merchant_mapper
+    update_merchant_category("Lidl", "Food & Dining", 'expenses')
+    assert get_category_for_merchant("Lidl", 'expenses') == "Food & Dining"
+
+    # Another process writes to the database
+    with database.get_db() as conn:
+        conn.execute("UPDATE merchant_categories SET category = 'Groceries' WHERE merchant = 'Lidl'")
+        conn.execute("INSERT INTO merchant_categories (transaction_type, merchant, category) VALUES ('expenses', 'Aldi', 'Groceries')")
+    # Seen once the revision tokens are re-read
+    assert get_category_for_merchant("Lidl", 'expenses') == "Food & Dining"
+
+    monkeypatch.setattr(merchant_mapper, 'MERCHANT_REVISION_CHECK_SECONDS', 0)
+    assert get_category_for_merchant("Lidl", 'expenses') == "Groceries"
+    assert get_category_for_merchant("Aldi", 'expenses') == "Groceries"
+
+def test_income_and_expense_mappings_are_separate(cleanup_merchant_files):
+    update_merchant_category("Acme", "Salary", 'income')
+    update_merchant_category("Acme", "Shopping", 'expenses')
+
+    assert get_category_for_merchant("Acme", 'income') == "Salary"
+    assert get_category_for_merchant("Acme", 'expenses') == "Shopping"
+
+def test_load_merchant_categories_returns_copy(cleanup_merchant_files):
+    update_merchant_category("Lidl", "Food & Dining", 'expenses')
+
+    merchants = load_merchant_categories('expenses')
+    merchants["Lidl"] = "Changed"
+
+    assert get_category_for_merchant("Lidl", 'expenses') == "Food & Dining"
+
+def test_categorize_many_preserves_order_and_misses(cleanup_merchant_files):
+    update_merchant_category("Lidl", "Food & Dining", 'expenses')
+    update_merchant_category("Shell", "Transportation", 'expenses')
+
+    result = categorize_many(["Shell", "Unknown", "Lidl", "", "Shell"], 'expenses')
+
+    assert result == ["Transportation", None, "Food & Dining", None, "Transportation"]
+
+def test_categorize_many_empty_batch(cleanup_merchant_files):
+    assert categorize_many([], 'income') == []
+
+def test_auto_categorize_matches_store_number_variants(cleanup_merchant_files):
+    update_merchant_category("TESCO STORES 2231", "Groceries", 'expenses')
+
+    assert auto_categorize_transaction("TESCO STORES 4410", 'expenses') == "Groceries"
+    assert categorize_many(["Tesco Stores #9", "Unrelated"], 'expenses') == ["Groceries", None]
+    # Exact lookups stay exact
+    assert get_category_for_merchant("TESCO STORES 4410", 'expenses') is None
+
+def test_keyword_rules_categorize_descriptions(cleanup_merchant_files):
+    add_keyword_rule("UBER", "Transportation", 'expenses')
+    add_keyword_rule("uber eats", "Food & Dining", 'expenses', priority=1)
+
+    assert auto_categorize_transaction("UBER *TRIP 1234", 'expenses') == "Transportation"
+    assert categorize_many(["UBER EATS NL", "Lidl"], 'expenses') == ["Food & Dining", None]
+    assert auto_categorize_transaction("UBER *TRIP 1234", 'income') is None
+
+def test_exact_mapping_beats_keyword_rule(cleanup_merchant_files):
+    add_keyword_rule("uber", "Transportation", 'expenses')
+    update_merchant_category("UBER BV", "Salary", 'expenses')
+
+    assert auto_categorize_transaction("UBER BV", 'expenses') == "Salary"
+
+def test_keyword_rule_update_and_remove(cleanup_merchant_files):
+    add_keyword_rule("Shell", "Transportation", 'expenses')
+    add_keyword_rule("shell", "Fuel", 'expenses', priority=2)
+
+    assert load_keyword_rules('expenses') == [{'keyword': 'shell', 'category': 'Fuel', 'priority': 2}]
+    assert auto_categorize_transaction("SHELL 0231", 'expenses') == "Fuel"
+
+    assert remove_keyword_rule("SHELL", 'expenses') is True
+    assert remove_keyword_rule("SHELL", 'expenses') is False
+    assert auto_categorize_transaction("SHELL 0231", 'expenses') is None
+
+def test_user_mappings_are_private(cleanup_merchant_files):
+    update_merchant_category("Lidl", "Groceries", 'expenses', user_id=1)
+    update_merchant_category("Lidl", "Food & Dining", 'expenses', user_id=2)
+
+    assert get_category_for_merchant("Lidl", 'expenses', user_id=1) == "Groceries"
+    assert get_category_for_merchant("Lidl", 'expenses', user_id=2) == "Food & Dining"
+    assert get_category_for_merchant("Lidl", 'expenses', user_id=3) is None
+    assert get_category_for_merchant("Lidl", 'expenses') is None
+    assert load_merchant_categories('expenses', user_id=1) == {"Lidl": "Groceries"}
+
+def test_shared_layer_is_fallback(cleanup_merchant_files):
+    update_merchant_category("Lidl", "Shopping", 'expenses')
+    add_keyword_rule("uber", "Transportation", 'expenses')
+    update_merchant_category("Lidl", "Groceries", 'expenses', user_id=1)
+    add_keyword_rule("uber", "Business", 'expenses', user_id=1)
+
+    assert categorize_many(["Lidl", "UBER TRIP"], 'expenses', user_id=1) == ["Groceries", "Business"]
+    assert categorize_many(["Lidl", "UBER TRIP"], 'expenses', user_id=2) == ["Shopping", "Transportation"]
+    # A user's rule or fuzzy match wins over a shared exact mapping
+    update_merchant_category("UBER BV", "Salary", 'expenses')
+    assert auto_categorize_transaction("UBER BV", 'expenses', user_id=1) == "Business"
+    assert load_keyword_rules('expenses', user_id=2) == []
+
+def test_user_write_keeps_other_cached_layers(cleanup_merchant_files):
+    import merchant_mapper
+    update_merchant_category("Lidl", "Shopping", 'expenses')
+    update_merchant_category("Aldi", "Groceries", 'expenses', user_id=1)
+    shared = merchant_mapper._get_cached_merchants('expenses')
+
+    update_merchant_category("Aldi", "Food & Dining", 'expenses', user_id=2)
+
+    assert merchant_mapper._get_cached_merchants('expenses') is shared
+    assert get_category_for_merchant("Aldi", 'expenses', user_id=2) == "Food & Dining"
+
+def test_merchant_cache_is_bounded(cleanup_merchant_files, monkeypatch):
+    import merchant_mapper
+    monkeypatch.setattr(merchant_mapper, 'MERCHANT_CACHE_SIZE', 6)
+    for user_id in range(1, 10):
+        update_merchant_category("Lidl", "Groceries", 'expenses', user_id=user_id)
+        assert auto_categorize_transaction("LIDL 1234", 'expenses', user_id=user_id) == "Groceries"
+
+    assert len(merchant_mapper._merchant_cache) <= 6
+    assert set(merchant_mapper._index_cache) <= set(merchant_mapper._merchant_cache)
+
+def test_unscoped_tables_migrate_to_shared_layer(tmp_path, monkeypatch):
+    import sqlite3
+    import database
+    import merchant_mapper
+    db_path = str(tmp_path / 'old.db')
+    monkeypatch.setattr(database, 'DATABASE_PATH', db_path)
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE merchant_categories (
+            transaction_type TEXT NOT NULL, merchant TEXT NOT NULL, category TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (transaction_type, merchant));
+        CREATE TABLE merchant_category_revisions (transaction_type TEXT PRIMARY KEY, revision INTEGER NOT NULL);
+        CREATE TRIGGER merchant_categories_insert AFTER INSERT ON merchant_categories BEGIN
+            UPDATE merchant_category_revisions SET revision = random() WHERE transaction_type = NEW.transaction_type;
+        END;
+        INSERT INTO merchant_categories (transaction_type, merchant, category) VALUES ('expenses', 'Lidl', 'Groceries');
+    ''')
+    conn.commit()
+    conn.close()
+
+    database.init_db()
+    merchant_mapper.clear_merchant_cache()
+
+    assert load_merchant_categories('expenses') == {"Lidl": "Groceries"}
+    assert get_category_for_merchant("Lidl", 'expenses', user_id=5) == "Groceries"
+    update_merchant_category("Lidl", "Food & Dining", 'expenses', user_id=5)
+    assert get_category_for_merchant("Lidl", 'expenses', user_id=5) == "Food & Dining"
+    merchant_mapper.clear_merchant_cache()
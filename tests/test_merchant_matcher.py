@@ -0,0 +1,86 @@
+import pytest
+from merchant_matcher import normalize_merchant, MerchantIndex
+
+
+@pytest.mark.parametrize('description, expected', [
+    ('TESCO STORES 2231', 'tesco stores'),
+    ('Tesco Stores #4410', 'tesco stores'),
+    ('SQ *BLUE BOTTLE 12/03', 'blue bottle'),
+    ('PAYPAL *SPOTIFY', 'spotify'),
+    ('Uber *Trip 2025-12-01', 'uber trip'),
+    ('CARD 1234 ALBERT HEIJN 1021', 'albert heijn'),
+    ('7-ELEVEN 123', '7 eleven'),
+    ('12345', '12345'),
+    ('', ''),
+])
+def test_normalize_merchant(description, expected):
+    assert normalize_merchant(description) == expected
+
+
+def test_index_exact_normalized_match():
+    index = MerchantIndex({'TESCO STORES 2231': 'Groceries'})
+
+    assert index.best_match('TESCO STORES 4410') == ('tesco stores', 'Groceries', 1.0)
+
+
+def test_index_fuzzy_match_above_threshold():
+    index = MerchantIndex({'Albert Heijn 1021': 'Groceries', 'Shell': 'Transportation'})
+
+    assert index.match('ALBERT HEIJN 2032 UTRECHT') == 'Groceries'
+    assert index.match('Totally different shop') is None
+
+
+def test_index_threshold_is_configurable():
+    merchants = {'Albert Heijn': 'Groceries'}
+
+    assert MerchantIndex(merchants, threshold=0.99).match('Albert Heijn Utrecht') is None
+    assert MerchantIndex(merchants, threshold=0.5).match('Albert Heijn Utrecht') == 'Groceries'
+
+
+def test_index_prefers_closest_merchant():
+    index = MerchantIndex({'Jumbo Supermarkt': 'Groceries', 'Jumbo Foodmarkt': 'Food & Dining'})
+
+    assert index.match('JUMBO FOODMARKT 12') == 'Food & Dining'
+    assert len(index) == 2
+
+
+def test_empty_index():
+    assert MerchantIndex({}).match('Anything') is None
+
+
+def test_automaton_substring_match_is_case_insensitive():
+    from merchant_matcher import KeywordAutomaton
+    automaton = KeywordAutomaton([('uber', 'Transportation', 0), ('netflix', 'Subscriptions', 0)])
+
+    assert automaton.match('UBER *TRIP HELP.UBER.COM') == 'Transportation'
+    assert automaton.match('Netflix.com') == 'Subscriptions'
+    assert automaton.match('Albert Heijn') is None
+
+
+def test_automaton_priority_then_longest_keyword():
+    from merchant_matcher import KeywordAutomaton
+    automaton = KeywordAutomaton([
+        ('uber', 'Transportation', 0),
+        ('uber eats', 'Food & Dining', 0),
+        ('amsterdam', 'Travel', 5),
+    ])
+
+    assert automaton.match('UBER EATS Utrecht') == 'Food & Dining'
+    assert automaton.match('UBER EATS Amsterdam') == 'Travel'
+
+
+def test_automaton_overlapping_keywords_via_failure_links():
+    from merchant_matcher import KeywordAutomaton
+    automaton = KeywordAutomaton([('he', 'A', 0), ('she', 'B', 0), ('hers', 'C', 0)])
+
+    assert automaton.match('ushers') == 'C'
+    assert automaton.match('ushe') == 'B'
+    assert automaton.match('sh') is None
+
+
+def test_empty_automaton():
+    from merchant_matcher import KeywordAutomaton
+    automaton = KeywordAutomaton()
+
+    assert not automaton
+    assert automaton.match('anything') is None
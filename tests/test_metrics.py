@@ -0,0 +1,116 @@
+import gc
+import io
+import re
+import threading
+
+import pytest
+
+import currency_converter
+import metrics
+from circuit_breaker import CircuitBreaker
+
+SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+
+
+def _scrape(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith('#'):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        labels = frozenset(re.findall(r'(\w+)="([^"]*)"', labels or ''))
+        samples[(name, labels)] = float(value)
+    return samples
+
+
+def _value(samples, name, **labels):
+    return samples.get((metrics.PREFIX + name, frozenset((k, str(v)) for k, v in labels.items())), 0.0)
+
+
+@pytest.fixture
+def metrics_client(make_app):
+    client = make_app('metrics.db').test_client()
+    client.post('/signup', data={'username': 'scraped', 'password': 'pass1234', 'confirm_password': 'pass1234'})
+    return client
+
+
+def test_request_counts_and_latency(metrics_client):
+    """Test requests are counted by status and observed in the latency histogram."""
+    before = _scrape(metrics_client)
+    metrics_client.get('/dashboard')
+    metrics_client.get('/dashboard')
+    metrics_client.get('/no-such-page')
+    after = _scrape(metrics_client)
+
+    def delta(name, **labels):
+        return _value(after, name, **labels) - _value(before, name, **labels)
+
+    assert delta('http_requests_total', endpoint='dashboard', method='GET', status=200) == 2
+    assert delta('http_requests_total', endpoint='unmatched', method='GET', status=404) == 1
+    assert delta('http_request_duration_seconds_count', endpoint='dashboard', method='GET') == 2
+    assert delta('http_request_duration_seconds_bucket', endpoint='dashboard', method='GET', le='+Inf') == 2
+    assert delta('sqlite_connections_total') > 0
+    assert delta('sqlite_queries_total') >= delta('sqlite_connections_total')
+    # The second dashboard reuses the snapshot loaded by the first
+    assert delta('cache_hits_total', cache='snapshots') >= 1
+    assert _value(after, 'cache_entries', cache='snapshots') >= 1
+    assert ('budget_tracker_cache_entries', frozenset({('cache', 'merchant_mappings')})) in after
+
+
+def test_import_metrics(metrics_client):
+    """Test statement imports count jobs and imported/skipped transactions."""
+    statement = b'Started Date,Description,Amount,Currency\n2025-01-05 10:00:00,Shop,-12.50,EUR\n'
+    before = _scrape(metrics_client)
+    for _ in range(2):
+        metrics_client.post('/revolut_import', data={'revolut_csv': (io.BytesIO(statement), 'statement.csv')},
+                            content_type='multipart/form-data')
+    after = _scrape(metrics_client)
+
+    def delta(name, **labels):
+        return _value(after, name, **labels) - _value(before, name, **labels)
+
+    assert delta('import_jobs_total', source='revolut', outcome='success') == 2
+    assert delta('import_transactions_total', source='revolut', result='imported') == 1
+    assert delta('import_transactions_total', source='revolut', result='skipped') == 1
+    assert delta('import_duration_seconds_count', source='revolut') == 2
+
+
+def test_exchange_rate_fetch_outcomes(metrics_client, monkeypatch):
+    """Test rate fetches are counted by outcome next to the breaker state."""
+    monkeypatch.setattr(currency_converter, 'rate_breaker', CircuitBreaker(failure_threshold=1, base_delay=60))
+
+    def failing_fetch():
+        raise OSError('provider down')
+
+    before = _scrape(metrics_client)
+    monkeypatch.setattr(currency_converter, 'fetch_exchange_rates', failing_fetch)
+    currency_converter.refresh_exchange_rates()
+    currency_converter.refresh_exchange_rates()
+    after = _scrape(metrics_client)
+
+    assert _value(after, 'exchange_rate_fetches_total', outcome='failure') - \
+        _value(before, 'exchange_rate_fetches_total', outcome='failure') == 1
+    assert _value(after, 'exchange_rate_fetches_total', outcome='rejected') - \
+        _value(before, 'exchange_rate_fetches_total', outcome='rejected') == 1
+    assert _value(after, 'exchange_rate_breaker_state', state='open') == 1
+    assert _value(after, 'exchange_rate_breaker_state', state='closed') == 0
+
+
+def test_counts_of_finished_threads_are_kept():
+    """Test counts made by a thread survive the thread."""
+    counter = metrics.CACHE_EVICTIONS
+
+    def count():
+        for _ in range(5):
+            counter.inc(cache='test-thread')
+
+    thread = threading.Thread(target=count)
+    thread.start()
+    thread.join()
+    del thread
+    gc.collect()
+
+    assert 'budget_tracker_cache_evictions_total{cache="test-thread"} 5' in metrics.render().splitlines()
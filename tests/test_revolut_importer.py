@@ -173,4 +173,45 @@ def test_import_counts_imported_and_skipped(authenticated_client):
     
     response = authenticated_client.post('/revolut_import', data=data, content_type='multipart/form-data', follow_redirects=True)
     
-    assert b'imported' in response.data
\ No newline at end of file
+    assert b'imported' in response.data
+
+
+def test_reimport_overlapping_statement_is_idempotent(authenticated_client):
+    from io import BytesIO
+    first = """Started Date,Description,Amount,Currency
+2025-12-01 08:00:00,Coffee Bar,-3.50,EUR
+2025-12-01 09:00:00,Coffee Bar,-3.50,EUR
+2025-12-02 10:30:00,Albert Heijn,-40.00,EUR"""
+    overlapping = first + """
+2025-12-03 10:30:00,Jumbo Supermarkt,-12.00,EUR"""
+
+    response = authenticated_client.post('/revolut_import', data={
+        'revolut_csv': (BytesIO(first.encode()), 'test.csv')
+    }, content_type='multipart/form-data', follow_redirects=True)
+    assert b'Successfully imported 3 Revolut transactions! Skipped 0' in response.data
+
+    response = authenticated_client.post('/revolut_import', data={
+        'revolut_csv': (BytesIO(overlapping.encode()), 'test.csv')
+    }, content_type='multipart/form-data', follow_redirects=True)
+    assert b'Successfully imported 1 Revolut transactions! Skipped 3' in response.data
+
+
+def test_manual_transaction_absorbs_one_imported_duplicate(authenticated_client):
+    from io import BytesIO
+    authenticated_client.post('/expenses', data={
+        'date': '2025-12-07',
+        'category': 'Shopping',
+        'amount': '50.00',
+        'description': 'Dirk',
+        'currency': 'EUR'
+    })
+
+    csv_content = """Started Date,Description,Amount,Currency
+2025-12-07 10:30:00,Dirk,-50.00,EUR
+2025-12-07 18:30:00,Dirk,-50.00,EUR"""
+
+    response = authenticated_client.post('/revolut_import', data={
+        'revolut_csv': (BytesIO(csv_content.encode()), 'test.csv')
+    }, content_type='multipart/form-data', follow_redirects=True)
+
+    assert b'Successfully imported 1 Revolut transactions! Skipped 1' in response.data
@@ -122,4 +122,32 @@ def test_protected_routes_require_login(client):
     
     for route in protected_routes:
         response = client.get(route, follow_redirects=True)
-        assert b'Please log in' in response.data or b'login' in response.request.path.lower()
\ No newline at end of file
+        assert b'Please log in' in response.data or b'login' in response.request.path.lower()
+
+
+def test_concurrent_users_see_only_their_own_data(app, init_database):
+    """Test requests from several users served on parallel threads do not mix their data."""
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime
+
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    def session_for(user):
+        client = app.test_client()
+        client.post('/signup', data={'username': user, 'password': 'pass1234', 'confirm_password': 'pass1234'})
+        for i in range(10):
+            client.post('/expenses', data={'date': today, 'category': 'Other', 'amount': '1.00',
+                                           'description': f'{user}-shop-{i}', 'currency': 'EUR'})
+            client.get('/dashboard')
+        return client.get('/expenses').data.decode()
+
+    users = [f'user{n}' for n in range(4)]
+    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+        pages = dict(zip(users, pool.map(session_for, users)))
+
+    for user, html in pages.items():
+        for i in range(10):
+            assert f'<span class="transaction-name">{user}-shop-{i}</span>' in html
+        for other in users:
+            if other != user:
+                assert f'{other}-shop-' not in html
@@ -0,0 +1,132 @@
+import http.client
+import importlib.util
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.parse
+from pathlib import Path
+
+import pytest
+
+import currency_converter
+import server
+
+
+def test_server_options_defaults(monkeypatch):
+    """Test the production server preloads the app and defaults to one worker per core."""
+    monkeypatch.setattr(os, 'cpu_count', lambda: 6)
+
+    options = server.server_options()
+
+    assert options['workers'] == 6
+    assert options['threads'] == server.DEFAULT_THREADS
+    assert options['worker_class'] == 'gthread'
+    assert options['preload_app'] is True
+    assert options['post_fork'] is server.post_fork
+    assert server.server_options(workers=2)['workers'] == 2
+
+
+def test_serve_command_initializes_database_before_forking(make_app, monkeypatch):
+    """Test the serve command sets up the database once and passes its options to the server."""
+    app = make_app('serve.db')
+    db_path = app.config['DATABASE_PATH']
+    calls = []
+    monkeypatch.setattr(server, 'run', lambda served_app, **options: calls.append((served_app, options)))
+
+    result = app.test_cli_runner().invoke(args=['serve', '--workers', '3', '--threads', '8', '--bind', '0.0.0.0:8000'])
+
+    assert result.exit_code == 0, result.output
+    assert os.path.exists(db_path)
+    served_app, options = calls[0]
+    assert served_app is app
+    assert options['workers'] == 3 and options['threads'] == 8 and options['bind'] == '0.0.0.0:8000'
+
+
+def test_serve_command_without_gunicorn(make_app, monkeypatch):
+    """Test the serve command explains how to install the production server when it is missing."""
+    monkeypatch.setitem(sys.modules, 'gunicorn.app.base', None)
+    app = make_app('serve.db')
+
+    result = app.test_cli_runner().invoke(args=['serve'])
+
+    assert result.exit_code != 0
+    assert 'pip install gunicorn' in result.output
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork()')
+def test_forked_worker_does_not_wait_on_masters_fetch(tmp_path, monkeypatch):
+    """Test a worker forked while the master had a rate fetch in flight can still refresh rates."""
+    import database
+    monkeypatch.setattr(database, 'DATABASE_PATH', str(tmp_path / 'fork.db'))
+    database.init_db()
+    monkeypatch.setattr(currency_converter, 'fetch_exchange_rates', lambda: {'EUR': 1.0, 'GBP': 0.5})
+    currency_converter.rate_breaker.reset()
+    # As left by a background fetch the master started during initialize_app()
+    monkeypatch.setattr(currency_converter, '_flight', currency_converter._Flight())
+
+    with currency_converter._rates_lock:
+        pid = os.fork()
+        if pid == 0:
+            # Worker: a hang fails the test through the alarm instead of blocking it
+            signal.alarm(5)
+            try:
+                server.post_fork(None, None)
+                refreshed = currency_converter.refresh_exchange_rates()
+                currency_converter.stop_rate_refresher(timeout=5)
+                os._exit(0 if refreshed else 1)
+            finally:
+                os._exit(2)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.skipif(importlib.util.find_spec('gunicorn') is None, reason='needs gunicorn')
+def test_serve_command_runs_gunicorn(tmp_path):
+    """Test the serve command boots gunicorn workers that serve signed-in users and stop on TERM."""
+    port = _free_port()
+    factory = f"app:create_app({{'DATABASE_PATH': {str(tmp_path / 'serve.db')!r}}})"
+    # No real provider: the workers' rate refreshers fail fast instead
+    env = dict(os.environ, EXCHANGE_RATES_URL='http://127.0.0.1:9/')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'flask', '--app', factory, 'serve', '--bind', f'127.0.0.1:{port}',
+         '--workers', '2', '--threads', '2'],
+        cwd=Path(__file__).parent.parent, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        deadline = time.time() + 30
+        while True:
+            assert process.poll() is None, process.communicate()[0]
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                assert time.time() < deadline, 'server did not start listening'
+                time.sleep(0.1)
+
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        body = urllib.parse.urlencode({'username': 'served', 'password': 'pass1234', 'confirm_password': 'pass1234'})
+        conn.request('POST', '/signup', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 302
+        cookie = response.getheader('Set-Cookie').split(';', 1)[0]
+        for _ in range(4):
+            conn.request('GET', '/dashboard', headers={'Cookie': cookie})
+            response = conn.getresponse()
+            assert response.status == 200 and b'served' in response.read()
+        conn.close()
+    finally:
+        process.terminate()
+        output = process.communicate(timeout=30)[0]
+
+    assert process.returncode == 0, output
+    assert output.count('Booting worker') == 2
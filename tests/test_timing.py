@@ -0,0 +1,74 @@
+import json
+import logging
+import time
+
+import pytest
+
+import timing
+
+
+@pytest.fixture
+def timed_client(make_app):
+    yield make_app('timing.db', REQUEST_TIMING=True).test_client()
+    timing.disable()
+
+
+def _sign_up(client):
+    client.post('/signup', data={'username': 'timed', 'password': 'pass1234', 'confirm_password': 'pass1234'})
+    client.post('/expenses', data={'date': '2025-12-10', 'category': 'Other', 'amount': '5.00',
+                                   'description': 'Shop', 'currency': 'GBP'})
+
+
+def _header_spans(response):
+    entries = dict(entry.split(';dur=') for entry in response.headers['Server-Timing'].split(', '))
+    return {name: float(ms) for name, ms in entries.items()}
+
+
+def test_server_timing_header(timed_client):
+    """Test timed requests report every span, adding up to the total."""
+    _sign_up(timed_client)
+    response = timed_client.get('/expenses')
+
+    spans = _header_spans(response)
+    assert set(spans) == {'db', 'conversion', 'template', 'compute', 'total'}
+    assert spans['db'] > 0 and spans['template'] > 0
+    parts = spans['db'] + spans['conversion'] + spans['template'] + spans['compute']
+    assert parts == pytest.approx(spans['total'], abs=0.05)
+
+
+def test_timing_log_line(timed_client, caplog):
+    """Test each timed request logs one JSON line with its route."""
+    _sign_up(timed_client)
+    with caplog.at_level(logging.INFO, logger='budget_tracker.timing'):
+        timed_client.get('/dashboard')
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['endpoint'] == 'dashboard'
+    assert record['status'] == 200
+    assert set(record['spans']) == {'db', 'conversion', 'template', 'compute'}
+
+
+def test_timing_toggles_at_runtime(timed_client):
+    """Test switching timing off drops the header, and on again restores it."""
+    assert 'Server-Timing' in timed_client.get('/login').headers
+    timing.disable()
+    assert 'Server-Timing' not in timed_client.get('/login').headers
+    timing.enable()
+    assert 'Server-Timing' in timed_client.get('/login').headers
+
+
+def test_nested_spans_count_self_time():
+    """Test time inside a nested span is not counted for the outer one too."""
+    token = timing._current.set(timing.RequestTimer())
+    try:
+        with timing.span('conversion'):
+            time.sleep(0.01)
+            with timing.span('db'):
+                time.sleep(0.02)
+        total, spans = timing.current().result()
+    finally:
+        timing.end(token)
+
+    assert 0.01 <= spans['conversion'] < 0.02
+    assert spans['db'] >= 0.02
+    assert sum(spans.values()) == pytest.approx(total)
@@ -0,0 +1,90 @@
+from datetime import date
+
+import pytest
+
+import currency_converter
+import database
+import workload
+from api.revolut_importer import RevolutImporter
+from models.data_manager import DataManager
+
+
+@pytest.fixture
+def workload_app(make_app, monkeypatch):
+    monkeypatch.setattr(currency_converter, 'get_exchange_rates', lambda: {'EUR': 1.0, 'GBP': 0.5, 'USD': 1.25})
+    return make_app('workload.db')
+
+
+def _spec(**overrides):
+    return workload.WorkloadSpec(**{'users': 3, 'months': 2, 'end': date(2025, 6, 30), **overrides})
+
+
+def test_same_seed_same_workload():
+    """Test the generator is reproducible for a seed and varies across seeds."""
+    first = list(workload.generate(_spec(), seed=7))
+    again = list(workload.generate(_spec(), seed=7))
+    other = list(workload.generate(_spec(), seed=8))
+
+    assert first == again
+    assert first != other
+    assert [user.username for user in first] == ['loaduser0', 'loaduser1', 'loaduser2']
+
+
+def test_distributions_follow_spec():
+    """Test transactions stay inside the history and the configured categories and currencies."""
+    spec = _spec(users=1, months=3, expenses_per_day=5, categories={'Shopping': 1}, currencies={'GBP': 1})
+    user, = workload.generate(spec, seed=1)
+
+    assert all(spec.start.isoformat() <= t.date <= '2025-06-30' for t in user.expenses + user.incomes)
+    assert {t.category for t in user.expenses} == {'Shopping', 'Rent/Mortgage'}
+    assert {t.currency for t in user.expenses + user.incomes} == {'GBP'}
+    # About 5 card payments a day over ~91 days, plus the rent
+    assert 350 < len(user.expenses) < 560
+    assert sum(t.category == 'Salary' for t in user.incomes) == 3
+
+
+def test_unknown_category_rejected():
+    with pytest.raises(ValueError, match='Unknown expense categories'):
+        list(workload.generate(_spec(categories={'Gardening': 1})))
+
+
+def test_generate_workload_command(workload_app):
+    """Test the CLI inserts users that can sign in and see their data."""
+    result = workload_app.test_cli_runner().invoke(
+        args=['generate-workload', '--users', '2', '--months', '1', '--seed', '3', '--end', '2025-06-30'])
+    assert result.exit_code == 0, result.output
+    assert 'Generated 2 users' in result.output
+
+    expected = list(workload.generate(_spec(users=2, months=1), seed=3))
+    with database.use_database(workload_app.config['DATABASE_PATH']):
+        user_id = database.authenticate_user('loaduser1', 'loadtest')
+        assert user_id
+        dm = DataManager(user_id)
+        dm.load()
+        assert len(dm.get_expenses()) == len(expected[1].expenses)
+        assert {b.category: b.limit for b in dm.get_budgets()} == expected[1].budgets
+        assert all(e.amount_eur is not None for e in dm.get_expenses())
+
+    client = workload_app.test_client()
+    client.post('/login', data={'username': 'loaduser1', 'password': 'loadtest'})
+    assert client.get('/dashboard').status_code == 200
+
+    again = workload_app.test_cli_runner().invoke(args=['generate-workload', '--users', '1'])
+    assert again.exit_code != 0
+    assert 'already exist' in again.output
+
+
+def test_revolut_csv_imports(workload_app, tmp_path):
+    """Test the emitted statements parse with the Revolut importer."""
+    csv_dir = tmp_path / 'statements'
+    result = workload_app.test_cli_runner().invoke(
+        args=['generate-workload', '--users', '1', '--months', '1', '--csv-dir', str(csv_dir), '--csv-only'])
+    assert result.exit_code == 0, result.output
+
+    with database.use_database(workload_app.config['DATABASE_PATH']):
+        assert database.authenticate_user('loaduser0', 'loadtest') is None
+
+    records = RevolutImporter.parse_csv((csv_dir / 'loaduser0.csv').read_text())
+    user, = workload.generate(workload.WorkloadSpec(users=1, months=1), seed=0)
+    assert len(records) == len(user.incomes) + len(user.expenses)
+    assert sum(record.amount > 0 for record in records) == len(user.incomes)
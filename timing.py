@@ -0,0 +1,138 @@
+"""
+Request timing: the wall time of a request split into spans (db,
+conversion, template; compute is whatever remains, mostly the views' own
+Python), sent back as a Server-Timing header and logged as one JSON line
+per request. Off by default and switchable at runtime with enable(); while
+off, an instrumented call costs a single ContextVar lookup.
+"""
+import json
+import logging
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import wraps
+
+# Spans measured directly; 'compute' is the rest of the request
+SPANS = ('db', 'conversion', 'template')
+
+logger = logging.getLogger('budget_tracker.timing')
+
+_enabled = False
+_current = ContextVar('request_timer', default=None)
+_NO_SPAN = nullcontext()
+
+
+def enable(on=True):
+    """Switch request timing on (or off) for this process"""
+    global _enabled
+    _enabled = bool(on)
+    if _enabled and not logger.hasHandlers():
+        # Like Flask's default handler: the log line shows up without any setup
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def disable():
+    enable(False)
+
+
+def is_enabled():
+    return _enabled
+
+
+class RequestTimer:
+    """
+    Self time per span name: time spent in a span nested inside another
+    counts for the inner one only, so the spans add up to at most the total.
+    """
+    __slots__ = ('started', 'totals', '_stack')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = dict.fromkeys(SPANS, 0.0)
+        self._stack = []
+
+    def start(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def stop(self):
+        name, started, nested = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        self.totals[name] = self.totals.get(name, 0.0) + elapsed - nested
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def result(self):
+        """(total, {span: seconds}) so far, with 'compute' as the remainder"""
+        total = time.perf_counter() - self.started
+        spans = dict(self.totals)
+        spans['compute'] = max(total - sum(spans.values()), 0.0)
+        return total, spans
+
+
+class _Span:
+    __slots__ = ('timer', 'name')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer.start(self.name)
+
+    def __exit__(self, *exc):
+        self.timer.stop()
+
+
+def begin():
+    """Start timing the current request if timing is on; returns a token for end()"""
+    return _current.set(RequestTimer()) if _enabled else None
+
+
+def end(token):
+    if token is not None:
+        _current.reset(token)
+
+
+def current():
+    """The timer of the current request, or None when it is not timed"""
+    return _current.get()
+
+
+def span(name):
+    """Context manager timing a block of the current request as `name`"""
+    timer = _current.get()
+    return _NO_SPAN if timer is None else _Span(timer, name)
+
+
+def timed(name):
+    """Decorator timing every call of a function as span `name`"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            timer = _current.get()
+            if timer is None:
+                return fn(*args, **kwargs)
+            timer.start(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timer.stop()
+        return wrapper
+    return decorator
+
+
+def server_timing(total, spans):
+    """Server-Timing header value, durations in milliseconds"""
+    entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in spans.items()]
+    entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
+
+
+def log_request(total, spans, **fields):
+    """Log one JSON line for a timed request"""
+    record = dict(fields, total_ms=round(total * 1000, 2),
+                  spans={name: round(seconds * 1000, 2) for name, seconds in spans.items()})
+    logger.info(json.dumps(record))
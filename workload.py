@@ -0,0 +1,244 @@
+"""
+Synthetic workload: users with months of transactions, budgets and merchant
+mappings, written straight to the database with bulk inserts (or emitted as
+Revolut statements), to drive benchmarks and capacity planning at sizes the
+tests never reach. Everything is drawn from one seeded generator, so the
+same spec and seed produce the same data.
+"""
+import csv
+import math
+import os
+import random
+from collections import namedtuple
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+import database
+from database import get_db
+from models.data_manager import eur_columns
+
+# Merchants of each expense category, the most popular first, and the
+# (median, spread) of a purchase there in EUR (log-normal)
+EXPENSE_MERCHANTS = {
+    'Food & Dining': (['Tesco', 'Lidl', 'Starbucks', 'Aldi', 'Pret A Manger', 'Deliveroo', "McDonald's",
+                       'Uber Eats', 'Sainsbury', 'Subway'], (18.0, 0.8)),
+    'Transportation': (['Uber', 'Shell', 'Trainline', 'Bolt', 'BP', 'Ryanair'], (25.0, 0.9)),
+    'Shopping': (['Amazon', 'Zara', 'IKEA', 'H&M', 'Decathlon', 'eBay', 'Primark'], (45.0, 1.0)),
+    'Entertainment': (['Netflix', 'Spotify', 'Cinema City', 'Steam', 'Ticketmaster'], (15.0, 0.7)),
+    'Utilities': (['Vodafone', 'British Gas', 'EDF Energy', 'Thames Water'], (60.0, 0.5)),
+    'Healthcare': (['Boots', 'Pharmacy Plus', 'Dental Care'], (35.0, 0.8)),
+    'Education': (['Udemy', 'Coursera', 'Waterstones'], (30.0, 0.7)),
+    'Insurance': (['Aviva', 'AXA'], (40.0, 0.4)),
+    'Other': (['Post Office', 'Revolut Fee', 'Vending'], (10.0, 1.0)),
+}
+# Share of card payments per category
+DEFAULT_CATEGORY_WEIGHTS = {
+    'Food & Dining': 40, 'Transportation': 15, 'Shopping': 15, 'Entertainment': 8, 'Utilities': 4,
+    'Healthcare': 4, 'Education': 2, 'Insurance': 2, 'Other': 10,
+}
+DEFAULT_CURRENCY_WEIGHTS = {'EUR': 80, 'GBP': 12, 'USD': 8}
+RENT_MERCHANT = 'Landlord Rent'
+SALARY_MERCHANT = 'Acme Corp Payroll'
+FREELANCE_MERCHANTS = ['Upwork', 'Fiverr', 'Client Transfer']
+# Chance that a card payment carries a terminal/store number ("TESCO 4821"),
+# which only the fuzzy merchant index resolves
+DESCRIPTION_NOISE = 0.3
+# Share of a user's merchants they have mapped to a category themselves
+MAPPED_MERCHANT_SHARE = 0.2
+
+REVOLUT_COLUMNS = ['Type', 'Product', 'Started Date', 'Completed Date', 'Description', 'Amount', 'Fee',
+                   'Currency', 'State', 'Balance']
+
+Transaction = namedtuple('Transaction', 'date description category amount currency')
+UserWorkload = namedtuple('UserWorkload', 'username incomes expenses budgets merchants')
+
+
+@dataclass
+class WorkloadSpec:
+    """What to generate; every distribution is a {value: weight} mapping"""
+    users: int = 10
+    months: int = 12
+    # Average card payments per user and day (Poisson)
+    expenses_per_day: float = 2.0
+    # Zipf exponent of merchant popularity within a category; 0 is uniform
+    merchant_skew: float = 1.1
+    categories: dict = field(default_factory=lambda: dict(DEFAULT_CATEGORY_WEIGHTS))
+    currencies: dict = field(default_factory=lambda: dict(DEFAULT_CURRENCY_WEIGHTS))
+    budgets: bool = True
+    merchant_mappings: bool = True
+    end: date = field(default_factory=date.today)
+    username_prefix: str = 'loaduser'
+    password: str = 'loadtest'
+
+    @property
+    def start(self):
+        return self.end - timedelta(days=round(self.months * 30.44))
+
+
+def parse_weights(text):
+    """'EUR=80,GBP=20' -> {'EUR': 80.0, 'GBP': 20.0}"""
+    weights = {}
+    for part in filter(None, (part.strip() for part in text.split(','))):
+        name, _, weight = part.partition('=')
+        weights[name.strip()] = float(weight) if weight else 1.0
+    return weights
+
+
+def _poisson(rng, mean):
+    # Knuth's method; means here are small (transactions per day)
+    limit, count, product = math.exp(-mean), 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def _zipf_weights(count, skew):
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def _days(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def generate_user(spec, rng, index):
+    """One user's transactions, budgets and merchant mappings (not yet stored)"""
+    unknown = set(spec.categories) - set(EXPENSE_MERCHANTS)
+    if unknown:
+        raise ValueError(f"Unknown expense categories: {', '.join(sorted(unknown))}")
+    categories = list(spec.categories)
+    category_weights = list(spec.categories.values())
+    currencies = list(spec.currencies)
+    currency_weights = list(spec.currencies.values())
+    merchant_weights = {category: _zipf_weights(len(EXPENSE_MERCHANTS[category][0]), spec.merchant_skew)
+                        for category in categories}
+    # Users differ in how much they earn and spend
+    scale = rng.lognormvariate(0, 0.3)
+    home_currency = rng.choices(currencies, currency_weights)[0]
+
+    expenses, incomes = [], []
+    for day in _days(spec.start, spec.end):
+        when = day.isoformat()
+        if day.day == 1:
+            expenses.append(Transaction(when, RENT_MERCHANT, 'Rent/Mortgage', round(900 * scale, 2), home_currency))
+        if day.day == 25:
+            incomes.append(Transaction(when, SALARY_MERCHANT, 'Salary', round(3200 * scale, 2), home_currency))
+        if rng.random() < 1 / 45:
+            incomes.append(Transaction(when, rng.choice(FREELANCE_MERCHANTS), 'Freelance',
+                                       round(rng.lognormvariate(math.log(400 * scale), 0.5), 2), home_currency))
+        for _ in range(_poisson(rng, spec.expenses_per_day)):
+            category = rng.choices(categories, category_weights)[0]
+            names, (median, spread) = EXPENSE_MERCHANTS[category]
+            merchant = rng.choices(names, merchant_weights[category])[0]
+            description = f'{merchant} {rng.randrange(1000, 10000)}' if rng.random() < DESCRIPTION_NOISE else merchant
+            amount = round(max(rng.lognormvariate(math.log(median * scale), spread), 0.5), 2)
+            expenses.append(Transaction(when, description, category, amount,
+                                        rng.choices(currencies, currency_weights)[0]))
+
+    budgets = {}
+    if spec.budgets:
+        monthly = {}
+        for expense in expenses:
+            monthly[expense.category] = monthly.get(expense.category, 0.0) + expense.amount
+        # Budgets near the average monthly spend, some of them tight enough to be exceeded
+        for category, total in sorted(monthly.items(), key=lambda item: -item[1])[:5]:
+            budgets[category] = round(total / max(spec.months, 1) * rng.uniform(0.8, 1.3), -1) or 10.0
+
+    merchants = {}
+    if spec.merchant_mappings:
+        for category in categories:
+            for name in EXPENSE_MERCHANTS[category][0]:
+                if rng.random() < MAPPED_MERCHANT_SHARE:
+                    merchants[name] = category
+
+    return UserWorkload(f'{spec.username_prefix}{index}', incomes, expenses, budgets, merchants)
+
+
+def generate(spec, seed=0):
+    """Yield the workload of every user in the spec, reproducibly for a given seed"""
+    rng = random.Random(seed)
+    for index in range(spec.users):
+        yield generate_user(spec, rng, index)
+
+
+def _create_user(cursor, username, password):
+    cursor.execute('INSERT INTO users (username, password_hash) VALUES (?, ?)',
+                   (username, database.hash_password(password)))
+    return cursor.lastrowid
+
+
+def store(workload, password):
+    """Insert one user's workload in a single transaction; returns the user id"""
+    rows = {}
+    for table, transactions in (('incomes', workload.incomes), ('expenses', workload.expenses)):
+        columns = eur_columns([(t.amount, t.currency, t.date) for t in transactions])
+        rows[table] = [(t.date, t.description, t.category, t.amount, t.currency, amount_eur, rate)
+                       for t, (amount_eur, rate) in zip(transactions, columns)]
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        user_id = _create_user(cursor, workload.username, password)
+        for table, params in rows.items():
+            cursor.executemany(
+                f'''INSERT INTO {table} (user_id, date, description, category, amount, currency, amount_eur, eur_rate)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                [(user_id,) + row for row in params]
+            )
+        cursor.executemany(
+            'INSERT INTO budgets (user_id, category, limit_amount) VALUES (?, ?, ?)',
+            [(user_id, category, limit) for category, limit in workload.budgets.items()]
+        )
+        cursor.executemany(
+            'INSERT INTO merchant_categories (user_id, transaction_type, merchant, category) VALUES (?, ?, ?, ?)',
+            [(user_id, 'expenses', merchant, category) for merchant, category in workload.merchants.items()]
+        )
+    return user_id
+
+
+def revolut_rows(workload):
+    """A user's transactions as Revolut statement rows, oldest first"""
+    entries = [(t, t.amount) for t in workload.incomes] + [(t, -t.amount) for t in workload.expenses]
+    entries.sort(key=lambda entry: entry[0].date)
+    for number, (transaction, amount) in enumerate(entries):
+        # Spread the day's transactions over the day, so the statement reads like a real one
+        started = datetime.fromisoformat(transaction.date) + timedelta(minutes=(number * 37) % 1440)
+        stamp = started.strftime('%Y-%m-%d %H:%M:%S')
+        kind = 'TOPUP' if amount > 0 else 'CARD_PAYMENT'
+        yield [kind, 'Current', stamp, stamp, transaction.description, f'{amount:.2f}', '0.00',
+               transaction.currency, 'COMPLETED', '']
+
+
+def write_revolut_csv(path, workload):
+    """Write a user's transactions as a Revolut CSV statement; returns the row count"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(REVOLUT_COLUMNS)
+        for row in revolut_rows(workload):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def run(spec, seed=0, csv_dir=None, insert=True):
+    """
+    Generate the workload: insert it into the current database and/or write
+    one Revolut statement per user into `csv_dir`. Returns the totals.
+    """
+    totals = {'users': 0, 'incomes': 0, 'expenses': 0, 'budgets': 0, 'merchants': 0, 'csv_rows': 0}
+    if csv_dir:
+        os.makedirs(csv_dir, exist_ok=True)
+    for workload in generate(spec, seed):
+        if insert:
+            store(workload, spec.password)
+        if csv_dir:
+            totals['csv_rows'] += write_revolut_csv(os.path.join(csv_dir, f'{workload.username}.csv'), workload)
+        totals['users'] += 1
+        totals['incomes'] += len(workload.incomes)
+        totals['expenses'] += len(workload.expenses)
+        totals['budgets'] += len(workload.budgets)
+        totals['merchants'] += len(workload.merchants)
+    return totals